@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compare the torch and ONNX Runtime inference backends of ClipInference.
+
+Reports image-tower throughput (images/sec) for each backend and how far the
+ONNX embeddings drift from torch (cosine similarity and top-1 agreement
+over the default category prompts).
+
+Usage:
+    python bench_backends.py [directory] [--precision int8|fp32] [--batch-size 16] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import torch
+
+from core.categories import CategoryManager
+from core.inference import ClipInference
+
+
+def load_batches(inference: ClipInference, images: list[Path], batch_size: int) -> list[torch.Tensor]:
+    inference._ensure_model_loaded()
+    batches = []
+    for i in range(0, len(images), batch_size):
+        tensors = [inference._image_decoder(p) for p in images[i:i + batch_size]]
+        batches.append(torch.stack(tensors))
+    return batches
+
+
+def run_backend(inference: ClipInference, batches: list[torch.Tensor], repeat: int) -> tuple[np.ndarray, float]:
+    inference._encode_image_batch(batches[0].to(inference.device))  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        features = [inference._encode_image_batch(b.to(inference.device)).cpu() for b in batches]
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(b) for b in batches) * repeat
+    return torch.cat(features).numpy(), total / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="./test_images")
+    parser.add_argument("--precision", choices=["int8", "fp32"], default="int8")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pretrained", default="laion2b_s34b_b79k")
+    args = parser.parse_args()
+
+    images = sorted(p for p in Path(args.directory).iterdir() if p.suffix.lower() in ClipInference.IMAGE_EXTENSIONS)
+    if not images:
+        print(f"No images found in {args.directory}")
+        return
+
+    manager = CategoryManager()
+    prompts = manager.get_clip_prompts()
+
+    torch_inference = ClipInference(pretrained=args.pretrained, device="cpu", num_workers=0)
+    onnx_inference = ClipInference(
+        pretrained=args.pretrained, num_workers=0, backend="onnx", onnx_precision=args.precision
+    )
+
+    batches = load_batches(torch_inference, images, args.batch_size)
+    onnx_inference._ensure_model_loaded()
+
+    print(f"{len(images)} images, batch size {args.batch_size}, {torch.get_num_threads()} torch threads\n")
+
+    torch_features, torch_rate = run_backend(torch_inference, batches, args.repeat)
+    onnx_features, onnx_rate = run_backend(onnx_inference, batches, args.repeat)
+
+    print(f"  torch fp32 : {torch_rate:8.1f} images/sec")
+    print(f"  onnx {args.precision:<5} : {onnx_rate:8.1f} images/sec ({onnx_rate / torch_rate:.2f}x)")
+
+    cosine = (torch_features * onnx_features).sum(axis=1)
+    torch_top = (torch_features @ torch_inference._encode_prompts(prompts).numpy().T).argmax(axis=1)
+    onnx_top = (onnx_features @ onnx_inference._encode_prompts(prompts).numpy().T).argmax(axis=1)
+
+    print(f"\nImage embedding cosine vs torch: mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+    print(f"Top-1 category agreement: {(torch_top == onnx_top).sum()}/{len(images)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-resolution decoding against the reduced-resolution path
+used by ClipInference (JPEG draft mode + integer reduce).
+
+Reports per-image decode time and peak RSS for each mode (each mode runs in
+its own subprocess so peak RSS is not shared; Linux only), then the accuracy impact:
+cosine similarity between the two embeddings and top-1 category agreement.
+
+Usage:
+    python bench_decode.py [directory] [--synthetic N] [--skip-accuracy]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff", ".tif"}
+
+
+def list_images(directory: Path) -> list[Path]:
+    return sorted(p for p in directory.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def make_synthetic_jpegs(directory: Path, count: int) -> None:
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        # 6000x4000 (24 MP) gradient + noise, roughly what a camera produces
+        y, x = np.mgrid[0:4000, 0:6000]
+        base = np.stack([(x * 255 // 6000), (y * 255 // 4000), ((x + y) * 255 // 10000)], axis=-1)
+        noise = rng.integers(0, 32, size=base.shape)
+        Image.fromarray((base + noise).clip(0, 255).astype("uint8")).save(directory / f"synthetic_{i}.jpg", quality=92)
+
+
+def full_decode(path: Path):
+    from PIL import Image
+    return Image.open(path).convert("RGB")
+
+
+def reduced_decode(path: Path):
+    from core.image_loader import open_image
+    return open_image(path, target_size=224, max_pixels=None)
+
+
+def resize_and_crop(image, size: int = 224):
+    from PIL import Image
+
+    # Same geometry as the open_clip ViT-B-32 preprocess, without importing torch
+    scale = size / min(image.size)
+    resized = image.resize((max(size, round(image.width * scale)), max(size, round(image.height * scale))), Image.BICUBIC)
+    left = (resized.width - size) // 2
+    top = (resized.height - size) // 2
+    return resized.crop((left, top, left + size, top + size))
+
+
+def run_mode(mode: str, directory: Path) -> None:
+    # Import everything up front so import time and memory are not attributed to one mode
+    import core.image_loader  # noqa: F401
+
+    decode = full_decode if mode == "full" else reduced_decode
+
+    images = list_images(directory)
+    start = time.perf_counter()
+    for path in images:
+        resize_and_crop(decode(path))
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"images": len(images), "seconds": elapsed, "peak_rss_mb": peak_kb / 1024}))
+
+
+def measure(mode: str, directory: Path) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, str(directory), "--mode", mode],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def accuracy(directory: Path) -> None:
+    import numpy as np
+    import torch
+
+    from core.categories import CategoryManager
+    from core.inference import ClipInference
+
+    inference = ClipInference(num_workers=0)
+    inference._ensure_model_loaded()
+    preprocess = inference._preprocess
+
+    manager = CategoryManager()
+    text_features = inference._encode_prompts(manager.get_clip_prompts())
+    names = manager.get_category_names()
+
+    similarities = []
+    agree = 0
+    images = list_images(directory)
+    for path in images:
+        batch = torch.stack([preprocess(full_decode(path)), preprocess(reduced_decode(path))]).to(inference.device)
+        features = inference._encode_image_batch(batch)
+        similarities.append(float(features[0] @ features[1]))
+        top = (features @ text_features.T).argmax(dim=1).tolist()
+        agree += top[0] == top[1]
+        print(f"  {path.name}: cosine={similarities[-1]:.4f} full={names[top[0]]} reduced={names[top[1]]}")
+
+    print(f"\nMean cosine similarity: {np.mean(similarities):.4f} (min {np.min(similarities):.4f})")
+    print(f"Top-1 agreement: {agree}/{len(images)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="./test_images")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N synthetic 24 MP JPEGs")
+    parser.add_argument("--skip-accuracy", action="store_true")
+    parser.add_argument("--mode", choices=["full", "reduced"], help=argparse.SUPPRESS)
+    parser.add_argument("--generate", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    directory = Path(args.directory).resolve()
+
+    if args.generate:
+        make_synthetic_jpegs(directory, args.generate)
+        return
+
+    if args.mode:
+        run_mode(args.mode, directory)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            work_dir = Path(tmp)
+            for path in list_images(directory):
+                (work_dir / path.name).symlink_to(path)
+            # Generated in a child so its arrays do not inflate the parent's (inherited) peak RSS
+            subprocess.run([sys.executable, __file__, str(work_dir), "--generate", str(args.synthetic)], check=True)
+            directory = work_dir
+
+        print(f"Decoding {len(list_images(directory))} images from {directory}\n")
+        for mode in ("full", "reduced"):
+            result = measure(mode, directory)
+            per_image = 1000 * result["seconds"] / max(result["images"], 1)
+            print(f"{mode:>8}: {per_image:8.1f} ms/image   peak RSS {result['peak_rss_mb']:8.1f} MB")
+
+        if not args.skip_accuracy:
+            print("\nAccuracy impact (CLIP embeddings, full vs reduced decode):")
+            accuracy(directory)
+
+
+if __name__ == "__main__":
+    main()
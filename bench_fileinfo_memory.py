@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Compare the memory footprint of the previous FileInfo dataclass (Path, two
+datetimes, per-file metadata dict with a hex hash) against the slotted
+FileInfo, for N synthetic scan entries (1M by default).
+
+Each representation is built in its own subprocess and measured with
+tracemalloc, so one does not skew the other.
+
+Usage:
+    python bench_fileinfo_memory.py [--count 1000000]
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+EXTENSIONS = [".jpg", ".png", ".pdf", ".txt", ".mp4", ".zip", ".py", ".docx"]
+
+
+@dataclass
+class LegacyFileInfo:
+    path: Path
+    name: str
+    extension: str
+    size_bytes: int
+    created_at: Optional[datetime] = None
+    modified_at: Optional[datetime] = None
+    is_image: bool = False
+    is_document: bool = False
+    metadata: dict = field(default_factory=dict)
+
+
+def synthetic_entry(i: int) -> tuple[str, str, int, float, str]:
+    extension = EXTENSIONS[i % len(EXTENSIONS)]
+    filepath = f"/data/share/project_{i // 10000}/folder_{i // 100}/file_{i}{extension}"
+    digest = hashlib.sha256(filepath.encode()).hexdigest()
+    return filepath, extension, 1000 + i, 1_700_000_000.0 + i, digest
+
+
+def build_legacy(count: int) -> list:
+    entries = []
+    for i in range(count):
+        filepath, extension, size, timestamp, digest = synthetic_entry(i)
+        path = Path(filepath)
+        entries.append(LegacyFileInfo(
+            path=path,
+            name=path.name,
+            extension=path.suffix.lower(),
+            size_bytes=size,
+            created_at=datetime.fromtimestamp(timestamp),
+            modified_at=datetime.fromtimestamp(timestamp),
+            is_image=extension in {".jpg", ".png"},
+            is_document=extension in {".pdf", ".txt", ".docx"},
+            metadata={"extension": extension, "size_bytes": size, "hash": digest}
+        ))
+    return entries
+
+
+def build_slotted(count: int) -> list:
+    from core.scanner import FileInfo
+
+    entries = []
+    for i in range(count):
+        filepath, extension, size, timestamp, digest = synthetic_entry(i)
+        file_info = FileInfo(
+            filepath=filepath,
+            extension=extension,
+            size_bytes=size,
+            created_at=timestamp,
+            modified_at=timestamp,
+            is_image=extension in {".jpg", ".png"},
+            is_document=extension in {".pdf", ".txt", ".docx"}
+        )
+        file_info.content_hash = digest
+        entries.append(file_info)
+    return entries
+
+
+def measure(kind: str, count: int) -> None:
+    build = build_legacy if kind == "legacy" else build_slotted
+    # Import and warm up outside the measured window
+    build(10)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    entries = build(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({"entries": len(entries), "bytes": current, "seconds": elapsed}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--kind", choices=["legacy", "slotted"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.kind:
+        measure(args.kind, args.count)
+        return
+
+    print(f"{args.count:,} FileInfo entries (tracemalloc, build time includes tracing overhead)\n")
+    results = {}
+    for kind in ("legacy", "slotted"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--kind", kind, "--count", str(args.count)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[kind] = json.loads(output.strip().splitlines()[-1])
+        mb = results[kind]["bytes"] / 1024 / 1024
+        per_entry = results[kind]["bytes"] / max(args.count, 1)
+        print(f"  {kind:>8}: {mb:9.1f} MB  ({per_entry:6.0f} bytes/entry, built in {results[kind]['seconds']:.1f}s)")
+
+    print(f"\n  reduction: {results['legacy']['bytes'] / results['slotted']['bytes']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark file hashing throughput (MB/s) per algorithm and worker count.
+
+Point it at a directory on each device you care about (e.g. one on an SSD,
+one on a spinning disk). With --cold each file's pages are dropped from the
+page cache before every run (posix_fadvise, Linux), so the numbers reflect
+the disk rather than RAM; without it the first run warms the cache.
+
+Usage:
+    python bench_hashing.py DIR [DIR ...] [--algorithms sha256 blake2b] [--workers 1 4 8] [--cold]
+    python bench_hashing.py --synthetic 2000 [--cold]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.hashing import HASH_ALGORITHMS, FileHasher
+
+
+def list_files(directory: Path) -> list[Path]:
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = Path(root) / name
+            if path.is_file() and not path.is_symlink():
+                files.append(path)
+    return files
+
+
+def make_synthetic_files(directory: Path, total_mb: int) -> None:
+    # Photo-sized files: 2-8 MB each
+    remaining = total_mb * 1024 * 1024
+    i = 0
+    while remaining > 0:
+        size = min(remaining, (2 + i % 7) * 1024 * 1024)
+        (directory / f"synthetic_{i}.bin").write_bytes(os.urandom(size))
+        remaining -= size
+        i += 1
+
+
+def drop_from_page_cache(files: list[Path]) -> None:
+    for path in files:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def legacy_hash(path: Path, block_size: int = 65536) -> str:
+    # The scanner's previous implementation, for reference
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def run(label: str, files: list[Path], total_bytes: int, hash_all, cold: bool) -> None:
+    if cold:
+        drop_from_page_cache(files)
+    start = time.perf_counter()
+    hash_all(files)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {total_bytes / elapsed / 1024 / 1024:9.1f} MB/s  ({elapsed:.2f}s)")
+
+
+def bench_directory(directory: Path, algorithms: list[str], workers: list[int], cold: bool) -> None:
+    files = list_files(directory)
+    total_bytes = sum(p.stat().st_size for p in files)
+    print(f"\n{directory}: {len(files)} files, {total_bytes / 1024 / 1024:.1f} MB{' (cold cache)' if cold else ''}")
+
+    if not cold:
+        # Warm the page cache so the first configuration is not penalised
+        FileHasher(num_workers=1).hash_files(files)
+
+    run("legacy sha256 x1", files, total_bytes, lambda fs: [legacy_hash(p) for p in fs], cold)
+    for algorithm in algorithms:
+        for num_workers in workers:
+            hasher = FileHasher(algorithm=algorithm, num_workers=num_workers)
+            run(f"{algorithm} x{num_workers}", files, total_bytes, hasher.hash_files, cold)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directories", nargs="*", type=Path)
+    parser.add_argument("--algorithms", nargs="+", default=["sha256", "blake2b"], choices=sorted(HASH_ALGORITHMS))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--cold", action="store_true", help="Drop files from the page cache before each run")
+    parser.add_argument("--synthetic", type=int, default=0, help="Also benchmark N MB of generated files in a temp dir")
+    args = parser.parse_args()
+
+    if not args.directories and not args.synthetic:
+        parser.error("give at least one directory or --synthetic N")
+
+    for directory in args.directories:
+        bench_directory(directory.resolve(), args.algorithms, args.workers, args.cold)
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_synthetic_files(Path(tmp), args.synthetic)
+            bench_directory(Path(tmp), args.algorithms, args.workers, args.cold)
+
+
+if __name__ == "__main__":
+    main()
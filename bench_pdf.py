@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF handling in the scanner: the previous two-open path (pypdf
+PdfReader by path for the metadata, then fitz.open again for the text of the
+first pages when there is no title) against the single-pass
+extract_document_metadata.
+
+Without a directory, a folder of large image-only ("scanned") PDFs without a
+title is generated. When PyMuPDF is not installed only the pypdf metadata
+read is compared (by-path copy into memory vs memory-mapped).
+
+The OCR text cache is disabled so both paths do the same extraction work.
+
+Usage:
+    python bench_pdf.py [directory] [--files 20] [--pages 20] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.doc_metadata import extract_document_metadata
+from core.ocr import OCRManager
+
+
+def make_pdfs(directory: Path, count: int, pages: int) -> None:
+    from PIL import Image
+
+    for i in range(count):
+        # Noise compresses badly, like a real scan
+        images = [Image.effect_noise((1240, 1754), 64 + (i + p) % 32).convert("RGB") for p in range(pages)]
+        images[0].save(directory / f"scan_{i}.pdf", save_all=True, append_images=images[1:], resolution=150)
+
+
+def legacy_extract(file_path: Path, ocr) -> dict:
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    meta = reader.metadata or {}
+    metadata = {"title": str(meta.get("/Title") or ""), "pages": len(reader.pages)}
+    if ocr is not None and not metadata["title"]:
+        metadata["ocr_content"] = ocr.extract_text_from_pdf(file_path)[:1000]
+    return metadata
+
+
+def single_pass_extract(file_path: Path, ocr) -> dict:
+    return extract_document_metadata(file_path, ocr)[0]
+
+
+def timed(fn, files: list[Path], ocr, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    peak = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file_path in files:
+            fn(file_path, ocr)
+        best = min(best, time.perf_counter() - start)
+
+    # Peak Python allocations for one file at a time, measured outside the timed runs
+    for file_path in files:
+        tracemalloc.start()
+        fn(file_path, ocr)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return best, peak
+
+
+def bench(directory: Path, repeat: int) -> None:
+    files = sorted(directory.rglob("*.pdf"))
+    if not files:
+        print(f"No PDFs in {directory}")
+        return
+
+    total_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
+    ocr = OCRManager(use_cache=False) if OCRManager.is_available() else None
+    mode = "metadata + first-pages text" if ocr else "metadata only (PyMuPDF not installed)"
+
+    print(f"{directory}: {len(files)} PDFs, {total_mb:.1f} MB, {mode}, best of {repeat}")
+    results = {}
+    for label, fn in (("two opens", legacy_extract), ("single pass", single_pass_extract)):
+        elapsed, peak = timed(fn, files, ocr, repeat)
+        results[label] = elapsed
+        print(f"  {label:<12}: {elapsed:7.3f}s  ({elapsed / len(files) * 1000:7.1f} ms/file, peak {peak / 1024 / 1024:6.1f} MB)")
+
+    print(f"  speedup     : {results['two opens'] / results['single pass']:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", type=Path)
+    parser.add_argument("--files", type=int, default=20, help="Number of generated PDFs when no directory is given")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per generated PDF")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.directory:
+        bench(args.directory.resolve(), args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Generating {args.files} scanned PDFs of {args.pages} pages...")
+        make_pdfs(Path(tmp), args.files, args.pages)
+        bench(Path(tmp), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Measure CPU image-encoding throughput (images/sec) of sharded inference
+against the number of forked workers.
+
+The in-process pipeline (one process, every core as torch threads, thread
+pool decoding) is the baseline. Each sharded plan splits the cores into
+workers x threads; the fastest plan is what --shards should be set to.
+The embedding cache is not used, so every run decodes and encodes all images.
+
+Usage:
+    python bench_sharding.py [directory] [--images 256] [--batch-size 16] [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.inference import ClipInference
+from core.sharding import available_cpus, candidate_plans, plan_shards, tune_shards
+
+
+def make_images(directory: Path, count: int) -> list[Path]:
+    from PIL import Image
+
+    paths = []
+    for i in range(count):
+        path = directory / f"photo_{i}.jpg"
+        Image.effect_noise((1600, 1200), 32 + i % 64).convert("RGB").save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def in_process(inference: ClipInference, images: list[Path], batch_size: int) -> float:
+    start = time.perf_counter()
+    for _ in inference._encode_batches(images, batch_size):
+        pass
+    return len(images) / (time.perf_counter() - start)
+
+
+def bench(images: list[Path], args: argparse.Namespace) -> None:
+    import torch
+
+    cpus = available_cpus()
+    inference = ClipInference(pretrained=args.pretrained, device="cpu")
+    inference.load_model()
+
+    if args.workers:
+        plans = [plan_shards(int(w), cpus=cpus) for w in args.workers.split(",")]
+    else:
+        plans = candidate_plans(cpus)
+
+    print(f"{len(images)} images, batch size {args.batch_size}, {cpus} CPUs\n")
+
+    # Warm-up, so the first measurement doesn't pay for lazy initialization
+    in_process(inference, images[:args.batch_size], args.batch_size)
+    baseline = in_process(inference, images, args.batch_size)
+    print(f"  {'in-process':<24} {baseline:8.1f} images/s  ({torch.get_num_threads()} threads)")
+
+    measured = tune_shards(inference, images, args.batch_size, plans)
+    for plan, throughput in sorted(measured, key=lambda m: m[0].workers):
+        print(f"  {str(plan):<24} {throughput:8.1f} images/s  ({throughput / baseline:.2f}x)")
+
+    best, throughput = measured[0]
+    print(f"\n  best: {best} ({throughput:.1f} images/s) -> --shards {best.workers}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", type=Path)
+    parser.add_argument("--images", type=int, default=256, help="Number of generated images when no directory is given")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", help="Comma-separated worker counts (default: every power-of-two thread split)")
+    parser.add_argument("--pretrained", default="laion2b_s34b_b79k")
+    args = parser.parse_args()
+
+    if args.directory:
+        images = sorted(p for p in args.directory.rglob("*") if p.suffix.lower() in ClipInference.IMAGE_EXTENSIONS)
+        if not images:
+            print(f"No images found in {args.directory}")
+            return
+        bench(images, args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Generating {args.images} images...")
+        bench(make_images(Path(tmp), args.images), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,25 @@
+import importlib
 
-from .inference import ClipInference
-from .file_ops import FileOperations
-from .scanner import FileScanner
-from .categories import CategoryManager
+# Submodules are imported on first attribute access (PEP 562), so `import core`
+# doesn't pull in torch for commands that never use CLIP
+_EXPORTS = {
+    "ClipInference": "inference",
+    "FileOperations": "file_ops",
+    "FileScanner": "scanner",
+    "CategoryManager": "categories",
+}
 
 __all__ = ["ClipInference", "FileOperations", "FileScanner", "CategoryManager"]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,438 @@
+import json
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from core.cache import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# (path, size, mtime, normalized embedding)
+IndexEntry = tuple[str, int, float, np.ndarray]
+
+# Journal records: (op, path length) + path, then for an add (size, mtime, list) + the vector
+_RECORD = struct.Struct("<BI")
+_ADD_FIELDS = struct.Struct("<qdi")
+_GENERATION = struct.Struct("<Q")
+_ADD, _REMOVE = 1, 2
+
+
+def image_index_dir(model_name: str, pretrained: str) -> Path:
+    return get_cache_dir() / "ann" / f"{model_name}-{pretrained or 'random'}"
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index over normalized
+    CLIP image embeddings, keyed by file path.
+
+    Vectors are clustered with spherical k-means into ~2*sqrt(N) lists; a
+    query is scored against the centroids and only the rows of the `n_probe`
+    closest lists are compared exactly. Below `MIN_TRAIN_SIZE` vectors the
+    index is not trained and every search is exact. Entries are added,
+    replaced and removed in place; the clustering is retrained once the index
+    has grown `RETRAIN_GROWTH` times past the size it was trained on.
+
+    On disk, `save` appends the entries changed since the last save to a
+    journal replayed by `load`. The full arrays are only rewritten after a
+    retrain, or to compact a journal grown past `COMPACT_FRACTION` of the
+    index.
+    """
+
+    VERSION = 2
+    MIN_TRAIN_SIZE = 10_000
+    # Candidate sets up to this size are scored exactly instead of probing lists
+    EXACT_SEARCH_SIZE = 20_000
+    RETRAIN_GROWTH = 4.0
+    # Training sample per list and k-means iterations
+    TRAIN_SAMPLES_PER_LIST = 32
+    TRAIN_ITERATIONS = 8
+    # Journal records allowed before save rewrites the whole index: this fraction of it, and at least the minimum
+    COMPACT_FRACTION = 0.25
+    COMPACT_MIN_RECORDS = 4096
+
+    def __init__(self, dim: Optional[int] = None, n_probe: int = 16, directory: Optional[Path] = None):
+        # Without `dim`, the dimension is taken from the first vector added
+        self.dim = dim
+        self.n_probe = n_probe
+        self.directory = directory
+        self._lock = threading.RLock()
+
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._sizes = np.empty(0, dtype=np.int64)
+        self._mtimes = np.empty(0, dtype=np.float64)
+        self._paths: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._count = 0
+
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        # Rows grouped by list (CSR), rebuilt lazily after changes
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+        # Paths added, replaced or removed since the last save; a full rewrite is due when nothing is on disk
+        # yet or after a retrain
+        self._changed: dict[str, None] = {}
+        self._rewrite = True
+        self._generation = 0
+        self._journal_records = 0
+        self._journal_bytes = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._rows
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def n_lists(self) -> int:
+        return 0 if self._centroids is None else len(self._centroids)
+
+    def get_stat(self, path: str) -> Optional[tuple[int, float]]:
+        row = self._rows.get(path)
+        if row is None:
+            return None
+        return int(self._sizes[row]), float(self._mtimes[row])
+
+    def paths_under(self, directory: str) -> list[str]:
+        prefix = directory if directory.endswith(os.sep) else directory + os.sep
+        with self._lock:
+            return [path for path in self._paths if path.startswith(prefix)]
+
+    def add(self, entries: Iterable[IndexEntry]) -> None:
+        # New paths are appended, known paths are replaced in place
+        with self._lock:
+            rows = []
+            for path, size, mtime, vector in entries:
+                if self.dim is None:
+                    self.dim = len(vector)
+                    self._vectors = np.empty((0, self.dim), dtype=np.float32)
+                row = self._rows.get(path)
+                if row is None:
+                    row = self._append_row(path)
+                self._vectors[row] = vector
+                self._sizes[row] = size
+                self._mtimes[row] = mtime
+                self._changed[path] = None
+                rows.append(row)
+
+            if not rows:
+                return
+            self._invalidate()
+
+            if self._needs_training():
+                self.train()
+            else:
+                self._lists[rows] = self._assign_chunked(self._vectors[rows])
+
+    def remove(self, paths: Iterable[str]) -> None:
+        with self._lock:
+            for path in paths:
+                row = self._rows.pop(path, None)
+                if row is None:
+                    continue
+                self._changed[path] = None
+                # Move the last row into the hole
+                last = self._count - 1
+                if row != last:
+                    last_path = self._paths[last]
+                    self._vectors[row] = self._vectors[last]
+                    self._lists[row] = self._lists[last]
+                    self._sizes[row] = self._sizes[last]
+                    self._mtimes[row] = self._mtimes[last]
+                    self._paths[row] = last_path
+                    self._rows[last_path] = row
+                self._paths.pop()
+                self._count -= 1
+                self._invalidate()
+
+    def train(self, seed: int = 0) -> None:
+        with self._lock:
+            vectors = self._vectors[:self._count]
+            n_lists = max(1, int(2 * np.sqrt(self._count)))
+            rng = np.random.default_rng(seed)
+
+            sample_size = min(self._count, n_lists * self.TRAIN_SAMPLES_PER_LIST)
+            sample = vectors[rng.choice(self._count, sample_size, replace=False)]
+            centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+
+            for _ in range(self.TRAIN_ITERATIONS):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty lists keep their previous centroid
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+            self._centroids = centroids.astype(np.float32)
+            self._trained_size = self._count
+            # Every row's list may have changed
+            self._rewrite = True
+            self._lists[:self._count] = self._assign_chunked(vectors)
+            self._invalidate()
+            logger.info(f"Trained image index: {self._count} vectors in {n_lists} lists")
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 50,
+        min_similarity: float = -1.0,
+        paths: Optional[set[str]] = None,
+        n_probe: Optional[int] = None
+    ) -> list[tuple[str, float]]:
+        # Up to k (path, cosine similarity) pairs, best first. With `paths`, only those entries are
+        # candidates; more lists are probed until k of them are found or every list has been visited.
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if self._count == 0:
+                return []
+
+            rows = None
+            allowed = None
+            if paths is not None:
+                allowed_rows = np.fromiter((self._rows[p] for p in paths if p in self._rows), dtype=np.int64)
+                if len(allowed_rows) <= self.EXACT_SEARCH_SIZE:
+                    rows = allowed_rows
+                else:
+                    allowed = np.zeros(self._count, dtype=bool)
+                    allowed[allowed_rows] = True
+
+            if rows is None:
+                if self._centroids is None or self._count <= self.EXACT_SEARCH_SIZE:
+                    rows = np.arange(self._count)
+                else:
+                    rows = self._probe(query, k, n_probe or self.n_probe, allowed)
+                if allowed is not None:
+                    rows = rows[allowed[rows]]
+
+            if len(rows) == 0:
+                return []
+
+            scores = self._vectors[rows] @ query
+            keep = np.flatnonzero(scores >= min_similarity)
+            if len(keep) > k:
+                keep = keep[np.argpartition(scores[keep], -k)[-k:]]
+            keep = keep[np.argsort(-scores[keep], kind="stable")]
+            return [(self._paths[rows[i]], float(scores[i])) for i in keep]
+
+    def save(self, directory: Optional[Path] = None) -> None:
+        directory = Path(directory or self.directory)
+        with self._lock:
+            rewrite = self._rewrite or directory != self.directory or not (directory / "manifest.json").exists()
+            if not rewrite and not self._changed:
+                return
+            directory.mkdir(parents=True, exist_ok=True)
+
+            journal_limit = max(self.COMPACT_MIN_RECORDS, self.COMPACT_FRACTION * self._count)
+            if rewrite or self._journal_records + len(self._changed) > journal_limit:
+                self._write_full(directory)
+            else:
+                self._append_journal(directory)
+            self._changed = {}
+
+    def _write_full(self, directory: Path) -> None:
+        arrays = {
+            "vectors": self._vectors[:self._count],
+            "lists": self._lists[:self._count],
+            "sizes": self._sizes[:self._count],
+            "mtimes": self._mtimes[:self._count],
+        }
+        if self._centroids is not None:
+            arrays["centroids"] = self._centroids
+        for name, array in arrays.items():
+            self._write(directory / f"{name}.npy", lambda f, a=array: np.save(f, a))
+        self._write(directory / "paths.json", lambda f: f.write(json.dumps(self._paths[:self._count]).encode()))
+
+        # Written last: a crash before this leaves the previous manifest, whose counts then no longer match.
+        # A journal left from the previous generation is ignored by load and replaced by the next append.
+        manifest = {
+            "version": self.VERSION,
+            "dim": self.dim,
+            "count": self._count,
+            "trained_size": self._trained_size,
+            "trained": self._centroids is not None,
+            "generation": self._generation + 1,
+        }
+        self._write(directory / "manifest.json", lambda f: f.write(json.dumps(manifest).encode()))
+        (directory / "journal.bin").unlink(missing_ok=True)
+
+        self.directory = directory
+        self._generation += 1
+        self._journal_records = 0
+        self._journal_bytes = 0
+        self._rewrite = False
+        logger.debug(f"Image index written: {self._count} vectors to {directory}")
+
+    def _append_journal(self, directory: Path) -> None:
+        records = []
+        for path in self._changed:
+            encoded = path.encode()
+            row = self._rows.get(path)
+            if row is None:
+                records.append(_RECORD.pack(_REMOVE, len(encoded)) + encoded)
+            else:
+                records.append(
+                    _RECORD.pack(_ADD, len(encoded)) + encoded
+                    + _ADD_FIELDS.pack(int(self._sizes[row]), float(self._mtimes[row]), int(self._lists[row]))
+                    + self._vectors[row].astype(np.float32).tobytes()
+                )
+
+        journal_path = directory / "journal.bin"
+        with open(journal_path, "ab") as f:
+            # Drops a torn record from an interrupted append, or a journal from an earlier generation
+            f.truncate(self._journal_bytes)
+            if self._journal_bytes == 0:
+                f.write(_GENERATION.pack(self._generation))
+            f.write(b"".join(records))
+            self._journal_bytes = f.tell()
+        self._journal_records += len(records)
+
+    def _replay_journal(self, journal: bytes) -> None:
+        # Applies the journal records after the base arrays; a torn last record is dropped
+        if len(journal) < _GENERATION.size or _GENERATION.unpack_from(journal)[0] != self._generation:
+            return
+        offset = _GENERATION.size
+        vector_bytes = self.dim * 4
+        while offset + _RECORD.size <= len(journal):
+            op, path_length = _RECORD.unpack_from(journal, offset)
+            end = offset + _RECORD.size + path_length
+            if op == _ADD:
+                end += _ADD_FIELDS.size + vector_bytes
+            if end > len(journal):
+                break
+            path = journal[offset + _RECORD.size:offset + _RECORD.size + path_length].decode()
+            if op == _ADD:
+                fields_at = offset + _RECORD.size + path_length
+                size, mtime, list_id = _ADD_FIELDS.unpack_from(journal, fields_at)
+                row = self._rows.get(path)
+                if row is None:
+                    row = self._append_row(path)
+                self._vectors[row] = np.frombuffer(journal, np.float32, self.dim, fields_at + _ADD_FIELDS.size)
+                self._sizes[row] = size
+                self._mtimes[row] = mtime
+                self._lists[row] = list_id
+            else:
+                self.remove([path])
+            offset = end
+            self._journal_records += 1
+        self._journal_bytes = offset
+        self._changed = {}
+
+    @classmethod
+    def load(cls, directory: Path, n_probe: int = 16) -> "IVFIndex":
+        # A missing, stale or inconsistent index loads as an empty one, to be rebuilt from the embedding cache
+        directory = Path(directory)
+        try:
+            manifest = json.loads((directory / "manifest.json").read_text())
+            if manifest["version"] != cls.VERSION:
+                raise ValueError(f"index format {manifest['version']} is not {cls.VERSION}")
+
+            index = cls(manifest["dim"], n_probe, directory)
+            count = manifest["count"]
+            index._vectors = np.load(directory / "vectors.npy")
+            index._lists = np.load(directory / "lists.npy")
+            index._sizes = np.load(directory / "sizes.npy")
+            index._mtimes = np.load(directory / "mtimes.npy")
+            index._paths = json.loads((directory / "paths.json").read_text())
+            if manifest["trained"]:
+                index._centroids = np.load(directory / "centroids.npy")
+                index._trained_size = manifest["trained_size"]
+
+            lengths = {len(index._vectors), len(index._lists), len(index._sizes), len(index._mtimes), len(index._paths)}
+            if lengths != {count} or index._vectors.shape[1:] != (manifest["dim"],):
+                raise ValueError("index files are out of sync")
+
+            index._count = count
+            index._rows = {path: row for row, path in enumerate(index._paths)}
+            index._generation = manifest["generation"]
+            # Without a dimension there is nothing to size journal vectors by; the next save rewrites everything
+            index._rewrite = index.dim is None
+            if index.dim is not None:
+                try:
+                    index._replay_journal((directory / "journal.bin").read_bytes())
+                except FileNotFoundError:
+                    pass
+            logger.debug(
+                f"Image index loaded: {index._count} vectors from {directory} "
+                f"({index._journal_records} journal records)"
+            )
+            return index
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Image index at {directory} is unusable, rebuilding it: {e}")
+
+        return cls(None, n_probe, directory)
+
+    def _append_row(self, path: str) -> int:
+        if self._count == len(self._vectors):
+            capacity = max(1024, 2 * self._count)
+            self._vectors = self._grow(self._vectors, capacity)
+            self._lists = self._grow(self._lists, capacity)
+            self._sizes = self._grow(self._sizes, capacity)
+            self._mtimes = self._grow(self._mtimes, capacity)
+
+        row = self._count
+        self._count += 1
+        self._paths.append(path)
+        self._rows[path] = row
+        return row
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _invalidate(self) -> None:
+        self._order = None
+        self._offsets = None
+
+    def _needs_training(self) -> bool:
+        if self._count < self.MIN_TRAIN_SIZE:
+            return False
+        return self._centroids is None or self._count > self.RETRAIN_GROWTH * self._trained_size
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _assign_chunked(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            self._assign(vectors[i:i + chunk_size])
+            for i in range(0, len(vectors), chunk_size)
+        ])
+
+    def _probe(self, query: np.ndarray, k: int, n_probe: int, allowed: Optional[np.ndarray]) -> np.ndarray:
+        if self._order is None:
+            lists = self._lists[:self._count]
+            self._order = np.argsort(lists, kind="stable")
+            self._offsets = np.searchsorted(lists[self._order], np.arange(self.n_lists + 1))
+
+        ranked_lists = np.argsort(-(self._centroids @ query))
+        probed = min(n_probe, len(ranked_lists))
+        while True:
+            rows = np.concatenate([self._order[self._offsets[i]:self._offsets[i + 1]] for i in ranked_lists[:probed]])
+            found = len(rows) if allowed is None else int(np.count_nonzero(allowed[rows]))
+            if found >= k or probed == len(ranked_lists):
+                return rows
+            probed = min(2 * probed, len(ranked_lists))
+
+    @staticmethod
+    def _write(path: Path, write) -> None:
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
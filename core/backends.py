@@ -0,0 +1,179 @@
+import inspect
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import torch
+
+from core.cache import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model: torch.nn.Module):
+        self.model = model
+
+    def encode_image(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model.encode_image(pixel_values)
+
+    def encode_text(self, input_ids: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model.encode_text(input_ids)
+
+
+class _VisualTower(torch.nn.Module):
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model.encode_image(pixel_values)
+
+
+class _TextTower(torch.nn.Module):
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor) -> torch.Tensor:
+        return self.model.encode_text(input_ids)
+
+
+class OnnxBackend:
+    """
+    Runs the CLIP visual and text towers with ONNX Runtime on the CPU.
+
+    Both towers are exported from the loaded open_clip model once and stored
+    under the cache directory, optionally with int8 dynamic quantization.
+    Freshly exported graphs are validated against the torch outputs and
+    rejected if any embedding drifts past `min_cosine`.
+    """
+
+    name = "onnx"
+    PRECISIONS = {"fp32", "int8"}
+    OPSET_VERSION = 17
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        tokenizer,
+        model_name: str,
+        pretrained: str,
+        precision: str = "int8",
+        num_threads: Optional[int] = None,
+        min_cosine: float = 0.98,
+        export_dir: Optional[Path] = None
+    ):
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown ONNX precision: {precision} (expected one of {sorted(self.PRECISIONS)})")
+
+        import onnxruntime as ort
+
+        self.precision = precision
+        self.min_cosine = min_cosine
+        self.export_dir = export_dir or get_cache_dir() / "onnx" / f"{model_name}-{pretrained or 'random'}"
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+
+        visual_path, text_path = self._ensure_exported(model, tokenizer)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+
+        providers = ["CPUExecutionProvider"]
+        self._visual = ort.InferenceSession(str(visual_path), options, providers=providers)
+        self._text = ort.InferenceSession(str(text_path), options, providers=providers)
+
+        logger.info(f"ONNX Runtime backend ready ({precision}, {options.intra_op_num_threads} threads)")
+
+    def encode_image(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        outputs = self._visual.run(None, {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)})
+        return torch.from_numpy(outputs[0])
+
+    def encode_text(self, input_ids: torch.Tensor) -> torch.Tensor:
+        outputs = self._text.run(None, {"input_ids": input_ids.cpu().numpy().astype(np.int64)})
+        return torch.from_numpy(outputs[0])
+
+    def _ensure_exported(self, model: torch.nn.Module, tokenizer) -> tuple[Path, Path]:
+        suffix = "" if self.precision == "fp32" else f".{self.precision}"
+        visual_path = self.export_dir / f"visual{suffix}.onnx"
+        text_path = self.export_dir / f"text{suffix}.onnx"
+
+        if visual_path.exists() and text_path.exists():
+            return visual_path, text_path
+
+        model = model.to("cpu").eval()
+        image_size = getattr(model.visual, "image_size", 224)
+        if isinstance(image_size, int):
+            image_size = (image_size, image_size)
+
+        sample_pixels = torch.randn(2, 3, *image_size, generator=torch.Generator().manual_seed(0))
+        sample_tokens = tokenizer(["a photo of a cat", "a screenshot of a computer program"])
+
+        fp32_visual = self.export_dir / "visual.onnx"
+        fp32_text = self.export_dir / "text.onnx"
+
+        logger.info(f"Exporting CLIP towers to ONNX in {self.export_dir}...")
+        self._export(_VisualTower(model), sample_pixels, "pixel_values", "image_features", fp32_visual)
+        self._export(_TextTower(model), sample_tokens, "input_ids", "text_features", fp32_text)
+
+        if self.precision == "int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info("Quantizing ONNX towers to int8...")
+            quantize_dynamic(str(fp32_visual), str(visual_path), weight_type=QuantType.QInt8)
+            quantize_dynamic(str(fp32_text), str(text_path), weight_type=QuantType.QInt8)
+
+        try:
+            with torch.no_grad():
+                self._validate(visual_path, "pixel_values", sample_pixels, model.encode_image(sample_pixels))
+                self._validate(text_path, "input_ids", sample_tokens, model.encode_text(sample_tokens))
+        except Exception:
+            for path in (visual_path, text_path):
+                path.unlink(missing_ok=True)
+            raise
+
+        return visual_path, text_path
+
+    def _export(self, module: torch.nn.Module, sample: torch.Tensor, input_name: str, output_name: str, path: Path) -> None:
+        kwargs = {}
+        # Newer torch defaults to the dynamo exporter; the TorchScript one handles open_clip as is
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            kwargs["dynamo"] = False
+
+        torch.onnx.export(
+            module,
+            (sample,),
+            str(path),
+            input_names=[input_name],
+            output_names=[output_name],
+            dynamic_axes={input_name: {0: "batch"}, output_name: {0: "batch"}},
+            opset_version=self.OPSET_VERSION,
+            **kwargs
+        )
+
+    def _validate(self, path: Path, input_name: str, sample: torch.Tensor, expected: torch.Tensor) -> None:
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+        actual = session.run(None, {input_name: sample.numpy()})[0]
+        expected = expected.numpy()
+
+        cosine = (actual * expected).sum(axis=1) / (
+            np.linalg.norm(actual, axis=1) * np.linalg.norm(expected, axis=1)
+        )
+        worst = float(cosine.min())
+        if worst < self.min_cosine:
+            raise RuntimeError(
+                f"ONNX export {path.name} deviates from torch (cosine {worst:.4f} < {self.min_cosine})"
+            )
+        logger.info(f"Validated {path.name} against torch (min cosine {worst:.4f})")
+
+
+BACKENDS = {TorchBackend.name, OnnxBackend.name}
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+from core.cache import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss() -> Optional[int]:
+    # Resident set size of this process in bytes, None when it can't be read
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # Peak rather than current, but still an upper bound to compare against the ceiling
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class BatchSizeTuner:
+    """
+    Picks the image batch size with the best measured encode throughput.
+
+    Candidate sizes are probed in increasing order on the real batches of a
+    run: each one is timed for `PROBE_BATCHES` full batches, and probing stops
+    at the first size that doesn't beat the best so far by `MIN_GAIN`. A CUDA
+    out-of-memory error or the process RSS crossing `max_rss_bytes` caps the
+    size at half of the batch that caused it. The chosen size is stored per
+    device key and reused without probing by the next run, unless `persist`
+    is off.
+    """
+
+    CPU_CANDIDATES = (4, 8, 16, 32, 64)
+    CUDA_CANDIDATES = (8, 16, 32, 64, 128, 256)
+    PROBE_BATCHES = 2
+    MIN_GAIN = 1.05
+
+    def __init__(
+        self,
+        device_key: str,
+        candidates: tuple[int, ...] = CPU_CANDIDATES,
+        max_rss_bytes: Optional[int] = None,
+        path: Optional[Path] = None,
+        persist: bool = True
+    ):
+        self.device_key = device_key
+        self.candidates = sorted(candidates)
+        self.max_rss_bytes = max_rss_bytes
+        self.path = (path or get_cache_dir() / "batch_sizes.json") if persist else None
+        self._lock = threading.Lock()
+
+        self._results: dict[int, float] = {}
+        self._samples: list[float] = []
+        # The first batch pays for lazy initialization and is not timed
+        self._warmed_up = False
+
+        saved = self._load().get(device_key)
+        self.settled = bool(saved)
+        self.batch_size = int(saved) if saved else self.candidates[0]
+        if saved:
+            logger.debug(f"Batch size {self.batch_size} for {device_key} (tuned on an earlier run)")
+
+    def record(self, images: int, seconds: float) -> None:
+        # Called after each encoded batch with its size and how long the encode took
+        with self._lock:
+            rss = current_rss() if self.max_rss_bytes else None
+            if rss is not None and rss > self.max_rss_bytes:
+                # Batches loaded before an earlier back-off are still at the old size; they don't count again
+                if 1 < images <= self.batch_size:
+                    self._back_off(images, f"RSS {rss / 1024**2:.0f} MB is over the {self.max_rss_bytes / 1024**2:.0f} MB ceiling")
+                return
+
+            # Partial batches (the tail of a window) don't say anything about the size being probed
+            if self.settled or images != self.batch_size or seconds <= 0:
+                return
+            if not self._warmed_up:
+                self._warmed_up = True
+                return
+
+            self._samples.append(images / seconds)
+            if len(self._samples) < self.PROBE_BATCHES:
+                return
+
+            throughput = sorted(self._samples)[len(self._samples) // 2]
+            best = max(self._results.values(), default=0.0)
+            self._results[self.batch_size] = throughput
+            self._samples = []
+
+            larger = [size for size in self.candidates if size > self.batch_size]
+            if throughput >= best * self.MIN_GAIN and larger:
+                self.batch_size = larger[0]
+            else:
+                self._settle(max(self._results, key=self._results.get))
+
+    def record_oom(self, images: int) -> None:
+        with self._lock:
+            self._back_off(images, "CUDA out of memory")
+
+    def _back_off(self, images: int, reason: str) -> None:
+        limit = max(1, images // 2)
+        self.candidates = [size for size in self.candidates if size <= limit] or [limit]
+        fitting = {size: value for size, value in self._results.items() if size <= limit}
+        size = max(fitting, key=fitting.get) if fitting else self.candidates[-1]
+        logger.warning(f"{reason} at batch size {images}, using batch size {size}")
+        self._settle(size)
+
+    def _settle(self, size: int) -> None:
+        self.batch_size = size
+        self.settled = True
+        logger.info(f"Image batch size for {self.device_key}: {size}")
+        if self.path is None:
+            return
+        try:
+            saved = self._load()
+            saved[self.device_key] = size
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            tmp_path.write_text(json.dumps(saved, indent=2, sort_keys=True))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save the tuned batch size: {e}")
+
+    def _load(self) -> dict[str, int]:
+        if self.path is None:
+            return {}
+        try:
+            saved = json.loads(self.path.read_text())
+            return saved if isinstance(saved, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ignoring unreadable batch size file {self.path}: {e}")
+            return {}
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir() -> Path:
+    override = os.environ.get("FILE_ORGANIZER_CACHE_DIR")
+    if override:
+        base = Path(override).expanduser()
+    elif sys.platform == "win32":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "file-organizer"
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches" / "file-organizer"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "file-organizer"
+
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+class _SqliteStore:
+    """
+    One SQLite database in the cache directory: a single WAL-mode connection
+    shared by every thread, with its use serialized by a lock. Subclasses pass
+    their file name and the statement creating their table.
+    """
+
+    def __init__(self, db_path: Optional[Path], filename: str, schema: str, timeout: float = 5.0):
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / filename
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.db_path), timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(schema)
+        self._conn.commit()
+
+        logger.debug(f"{type(self).__name__} opened: {self.db_path}")
+
+    def get_stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache(_SqliteStore):
+    """
+    Persistent store of normalized CLIP image embeddings.
+
+    Entries are keyed by (path, model_name, pretrained) and are only
+    returned while the file's size and mtime still match the stored ones,
+    so edited or replaced files are transparently re-encoded.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS image_embeddings (
+        path TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        pretrained TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (path, model_name, pretrained)
+    )
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        super().__init__(db_path, "embeddings.sqlite3", self.SCHEMA)
+
+    @staticmethod
+    def _file_key(path: Path) -> Optional[tuple[str, int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return str(path), stat.st_size, stat.st_mtime_ns
+
+    def get_many(
+        self,
+        paths: list[Path],
+        model_name: str,
+        pretrained: str
+    ) -> dict[Path, np.ndarray]:
+        import numpy as np
+
+        found: dict[Path, np.ndarray] = {}
+
+        with self._lock:
+            for path in paths:
+                vector = self._lookup(path, model_name, pretrained)
+                if vector is not None:
+                    found[path] = np.frombuffer(vector, dtype=np.float32)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        return found
+
+    def contains_many(self, paths: list[Path], model_name: str, pretrained: str) -> set[Path]:
+        # Paths with a valid entry, without loading the vectors or counting hits
+        with self._lock:
+            return {path for path in paths if self._lookup(path, model_name, pretrained) is not None}
+
+    def _lookup(self, path: Path, model_name: str, pretrained: str) -> Optional[bytes]:
+        key = self._file_key(path)
+        if key is None:
+            return None
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, vector FROM image_embeddings "
+            "WHERE path = ? AND model_name = ? AND pretrained = ?",
+            (key[0], model_name, pretrained)
+        ).fetchone()
+        if row is None or row[0] != key[1] or row[1] != key[2]:
+            return None
+        return row[2]
+
+    def put_many(
+        self,
+        items: dict[Path, np.ndarray],
+        model_name: str,
+        pretrained: str
+    ) -> None:
+        import numpy as np
+
+        rows = []
+        for path, vector in items.items():
+            key = self._file_key(path)
+            if key is None:
+                continue
+            rows.append((
+                key[0], model_name, pretrained, key[1], key[2],
+                np.asarray(vector, dtype=np.float32).tobytes()
+            ))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_embeddings "
+                "(path, model_name, pretrained, size, mtime_ns, vector) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+
+class TextEmbeddingCache(_SqliteStore):
+    """
+    Persistent store of normalized CLIP text features, keyed by
+    (model_name, pretrained, prompt), so category prompts and repeated
+    search queries are only run through the text tower once.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS text_embeddings (
+        prompt TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        pretrained TEXT NOT NULL,
+        vector BLOB NOT NULL,
+        PRIMARY KEY (model_name, pretrained, prompt)
+    )
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        super().__init__(db_path, "text_embeddings.sqlite3", self.SCHEMA)
+
+    def get_many(self, prompts: list[str], model_name: str, pretrained: str) -> dict[str, np.ndarray]:
+        import numpy as np
+
+        found: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for prompt in prompts:
+                row = self._conn.execute(
+                    "SELECT vector FROM text_embeddings WHERE model_name = ? AND pretrained = ? AND prompt = ?",
+                    (model_name, pretrained, prompt)
+                ).fetchone()
+
+                if row is not None:
+                    found[prompt] = np.frombuffer(row[0], dtype=np.float32)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray], model_name: str, pretrained: str) -> None:
+        import numpy as np
+
+        rows = [
+            (prompt, model_name, pretrained, np.asarray(vector, dtype=np.float32).tobytes())
+            for prompt, vector in items.items()
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO text_embeddings (prompt, model_name, pretrained, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+
+class ClassificationCache(_SqliteStore):
+    """
+    Persistent store of CLIP classification scores, keyed by the file's
+    content hash, the model and a fingerprint of the categories and prompts,
+    so a copy or a moved file is never decoded or encoded again and any
+    change to the category set invalidates the stored decisions. Content
+    hashes are stored as "<algorithm>:<digest>".
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS classifications (
+        content_hash TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        pretrained TEXT NOT NULL,
+        categories TEXT NOT NULL,
+        scores TEXT NOT NULL,
+        PRIMARY KEY (content_hash, model_name, pretrained, categories)
+    )
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        super().__init__(db_path, "classifications.sqlite3", self.SCHEMA)
+
+    def has_entries(self, model_name: str, pretrained: str, categories: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM classifications WHERE model_name = ? AND pretrained = ? AND categories = ? LIMIT 1",
+                (model_name, pretrained, categories)
+            ).fetchone()
+        return row is not None
+
+    def get_many(
+        self,
+        content_hashes: Iterable[str],
+        model_name: str,
+        pretrained: str,
+        categories: str
+    ) -> dict[str, dict[str, float]]:
+        found: dict[str, dict[str, float]] = {}
+
+        with self._lock:
+            for content_hash in content_hashes:
+                row = self._conn.execute(
+                    "SELECT scores FROM classifications "
+                    "WHERE content_hash = ? AND model_name = ? AND pretrained = ? AND categories = ?",
+                    (content_hash, model_name, pretrained, categories)
+                ).fetchone()
+
+                if row is not None:
+                    found[content_hash] = json.loads(row[0])
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        return found
+
+    def put_many(self, items: dict[str, dict[str, float]], model_name: str, pretrained: str, categories: str) -> None:
+        rows = [
+            (content_hash, model_name, pretrained, categories, json.dumps(scores))
+            for content_hash, scores in items.items()
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications (content_hash, model_name, pretrained, categories, scores) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+
+class OCRCache(_SqliteStore):
+    """
+    Persistent store of text extracted by OCRManager, keyed by the file's
+    content hash and the page limit used, so identical documents are only
+    processed once across runs and locations.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ocr_text (
+        content_hash TEXT NOT NULL,
+        max_pages INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (content_hash, max_pages)
+    )
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        # Several metadata worker processes may write at once; WAL plus a busy timeout serializes them
+        super().__init__(db_path, "ocr.sqlite3", self.SCHEMA, timeout=30)
+
+    def get(self, content_hash: str, max_pages: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM ocr_text WHERE content_hash = ? AND max_pages = ?",
+                (content_hash, max_pages)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, content_hash: str, max_pages: int, text: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_text (content_hash, max_pages, text) VALUES (?, ?, ?)",
+                (content_hash, max_pages, text)
+            )
+            self._conn.commit()
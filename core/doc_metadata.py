@@ -0,0 +1,250 @@
+import logging
+import mmap
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Optional, Union
+
+from core.workers import WorkerProcess
+
+logger = logging.getLogger(__name__)
+
+# Result of one extraction: (metadata, seconds spent in OCR), or the error message when it failed or timed out
+MetadataResult = Union[tuple[dict, float], str]
+
+
+def extract_document_metadata(file_path: Path, ocr=None) -> tuple[dict, float]:
+    metadata = {}
+    ocr_seconds = 0.0
+    extension = file_path.suffix.lower()
+
+    try:
+        if extension == ".pdf":
+            # Metadata and OCR text come from a single open of the document
+            return _extract_pdf(file_path, ocr)
+        elif extension in {".doc", ".docx"}:
+            metadata = _get_docx_metadata(file_path)
+    except Exception as e:
+        logger.debug(f"Could not extract metadata from {file_path}: {e}")
+
+    if ocr is not None and not metadata.get("title"):
+        start_time = time.perf_counter()
+        content = ocr.get_document_content(file_path)
+        ocr_seconds = time.perf_counter() - start_time
+        _apply_ocr_content(metadata, content)
+
+    return metadata, ocr_seconds
+
+
+def _apply_ocr_content(metadata: dict, content: str) -> None:
+    if content:
+        metadata["ocr_content"] = content[:1000]
+        if not metadata.get("title"):
+            first_line = content.split('\n')[0].strip()
+            if 3 < len(first_line) < 50:
+                metadata["title"] = first_line
+
+
+def _extract_pdf(file_path: Path, ocr=None) -> tuple[dict, float]:
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        # OCR needs PyMuPDF as well, so there is no text to extract here
+        return _get_pdf_metadata(file_path), 0.0
+
+    try:
+        # MuPDF reads the file on demand, only the xref and the pages that are touched
+        doc = fitz.open(str(file_path))
+    except Exception as e:
+        logger.debug(f"PDF metadata extraction failed: {e}")
+        return {}, 0.0
+
+    with doc:
+        meta = doc.metadata or {}
+        metadata = {
+            "title": meta.get("title") or "",
+            "author": meta.get("author") or "",
+            "subject": meta.get("subject") or "",
+            "pages": doc.page_count,
+            "creator": meta.get("creator") or "",
+        }
+
+        ocr_seconds = 0.0
+        if ocr is not None and not metadata["title"]:
+            start_time = time.perf_counter()
+            content = ocr.get_document_content(file_path, pdf=doc)
+            ocr_seconds = time.perf_counter() - start_time
+            _apply_ocr_content(metadata, content)
+
+    return metadata, ocr_seconds
+
+
+def _get_pdf_metadata(file_path: Path) -> dict:
+    try:
+        from pypdf import PdfReader
+
+        # pypdf copies a file it opens by path into memory; a memory map is read in place
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            reader = PdfReader(data)
+            meta = reader.metadata or {}
+
+            # Plain str so the values can be pickled back from a worker process
+            return {
+                "title": str(meta.get("/Title") or ""),
+                "author": str(meta.get("/Author") or ""),
+                "subject": str(meta.get("/Subject") or ""),
+                "pages": len(reader.pages),
+                "creator": str(meta.get("/Creator") or ""),
+            }
+    except ImportError:
+        logger.debug("pypdf not installed, skipping PDF metadata extraction")
+        return {}
+    except Exception as e:
+        logger.debug(f"PDF metadata extraction failed: {e}")
+        return {}
+
+
+def _get_docx_metadata(file_path: Path) -> dict:
+    try:
+        from docx import Document
+
+        doc = Document(file_path)
+        props = doc.core_properties
+
+        return {
+            "title": props.title or "",
+            "author": props.author or "",
+            "subject": props.subject or "",
+            "keywords": props.keywords or "",
+            "created": str(props.created) if props.created else "",
+        }
+    except ImportError:
+        logger.debug("python-docx not installed, skipping DOCX metadata extraction")
+        return {}
+    except Exception as e:
+        logger.debug(f"DOCX metadata extraction failed: {e}")
+        return {}
+
+
+def ocr_available() -> bool:
+    from core.ocr import OCRManager
+
+    if OCRManager.is_available():
+        return True
+    logger.warning("OCRManager dependencies not met, disabling OCR")
+    return False
+
+
+def create_ocr_manager(use_cache: bool = True):
+    # Cheap: OCRManager imports PyMuPDF/pytesseract on first use
+    from core.ocr import OCRManager
+    return OCRManager(use_cache=use_cache)
+
+
+def _worker_main(conn: Connection, use_ocr: bool, ocr_cache: bool) -> None:
+    ocr = create_ocr_manager(ocr_cache) if use_ocr else None
+    while True:
+        try:
+            file_path = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if file_path is None:
+            return
+
+        try:
+            conn.send((file_path, extract_document_metadata(Path(file_path), ocr)))
+        except Exception as e:
+            conn.send((file_path, f"Metadata extraction failed: {e}"))
+
+
+class _Worker(WorkerProcess):
+    def __init__(self, context, use_ocr: bool, ocr_cache: bool):
+        super().__init__(context, _worker_main, (use_ocr, ocr_cache))
+        self.task: Optional[str] = None
+        self.deadline = 0.0
+
+
+class DocumentMetadataPool:
+    """
+    Extracts PDF/DOCX metadata (and OCR content) in a bounded set of worker processes.
+
+    Each worker handles one file at a time. A worker that exceeds `timeout`
+    seconds on a file is killed and replaced, as is one that crashes; the
+    file's result is then an error message instead of a metadata dict.
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        timeout: float = 30.0,
+        use_ocr: bool = True,
+        ocr_cache: bool = True
+    ):
+        self.num_workers = max(1, num_workers or min(4, os.cpu_count() or 1))
+        self.timeout = timeout
+        self.use_ocr = use_ocr
+        self.ocr_cache = ocr_cache
+        self._context = multiprocessing.get_context()
+        self._workers: list[_Worker] = []
+        self._queue: deque[str] = deque()
+        self._results: dict[str, MetadataResult] = {}
+
+    def submit(self, file_path: str) -> None:
+        self._queue.append(file_path)
+        self._dispatch()
+
+    def collect(self, file_paths: list[str]) -> dict[str, MetadataResult]:
+        # Blocks until every given path has a result
+        waiting = set(file_paths)
+        while waiting - self._results.keys():
+            self._pump()
+        return {file_path: self._results.pop(file_path) for file_path in file_paths}
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.stop(kill=worker.task is not None)
+        self._workers = []
+        self._queue.clear()
+
+    def _dispatch(self) -> None:
+        while len(self._workers) < self.num_workers and self._queue:
+            self._workers.append(_Worker(self._context, self.use_ocr, self.ocr_cache))
+
+        for worker in self._workers:
+            if worker.task is None and self._queue:
+                worker.task = self._queue.popleft()
+                worker.deadline = time.monotonic() + self.timeout
+                worker.send(worker.task)
+
+    def _pump(self) -> None:
+        busy = [w for w in self._workers if w.task is not None]
+        if not busy:
+            self._dispatch()
+            return
+
+        wait_for = max(0.0, min(w.deadline for w in busy) - time.monotonic())
+        ready = wait([w.conn for w in busy], timeout=wait_for)
+
+        for worker in busy:
+            if worker.conn in ready:
+                try:
+                    file_path, result = worker.conn.recv()
+                    self._results[file_path] = result
+                    worker.task = None
+                except (EOFError, OSError):
+                    self._replace(worker, f"Metadata worker crashed (exit code {worker.exitcode})")
+            elif time.monotonic() >= worker.deadline:
+                self._replace(worker, f"Metadata extraction timed out after {self.timeout:.0f}s")
+
+        self._dispatch()
+
+    def _replace(self, worker: _Worker, error: str) -> None:
+        logger.warning(f"{error}: {worker.task}")
+        self._results[worker.task] = error
+        worker.task = None
+        worker.stop(kill=True)
+        # A fresh worker is started by _dispatch if there is more work
+        self._workers.remove(worker)
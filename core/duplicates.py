@@ -0,0 +1,149 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, NamedTuple, Optional, Union
+
+from core.hashing import FileHasher
+from core.scanner import FileInfo, FileScanner
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from each end of a file for the partial hash
+PARTIAL_BLOCK_SIZE = 64 * 1024
+
+# Same limit the scanner applies to its per-file hash: larger files are never compared
+MAX_HASH_BYTES = FileScanner.MAX_HASH_BYTES
+
+
+class SizedFile(NamedTuple):
+    # All find_duplicates reads from a file; callers streaming a large walk keep this instead of the FileInfo
+    filepath: str
+    size_bytes: int
+
+
+@dataclass
+class DuplicateReport:
+    # duplicate filepath -> filepath of the first file (in input order) with identical content
+    duplicate_of: dict[str, str] = field(default_factory=dict)
+    # filepath -> digest of the whole content, for every file the pass ended up hashing in full
+    digests: dict[str, str] = field(default_factory=dict)
+    algorithm: str = ""
+    files: int = 0
+    partial_hashed: int = 0
+    full_hashed: int = 0
+
+    @property
+    def total_duplicates(self) -> int:
+        return len(self.duplicate_of)
+
+
+def _split_by_digest(group: list[SizedFile], digests: dict[str, str]) -> list[list[SizedFile]]:
+    buckets: dict[str, list[SizedFile]] = defaultdict(list)
+    for file_info in group:
+        digest = digests.get(file_info.filepath)
+        if digest is not None:
+            buckets[digest].append(file_info)
+    return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+
+def find_duplicates(
+    files: Iterable[Union[FileInfo, SizedFile]],
+    block_size: int = PARTIAL_BLOCK_SIZE,
+    max_hash_bytes: Optional[int] = MAX_HASH_BYTES,
+    hasher: Optional[FileHasher] = None
+) -> DuplicateReport:
+    """
+    Find files with identical content in three stages, each one only looking at
+    the collisions of the previous one: size, head+tail partial hash, full hash.
+
+    Files with a unique size are never opened. Each hashing stage runs on the
+    hasher's thread pool; any algorithm works since digests are only compared.
+    """
+    hasher = hasher or FileHasher()
+    files = list(files)
+    report = DuplicateReport(files=len(files), algorithm=hasher.algorithm)
+
+    by_size: dict[int, list[SizedFile]] = defaultdict(list)
+    for file_info in files:
+        if max_hash_bytes is None or file_info.size_bytes < max_hash_bytes:
+            by_size[file_info.size_bytes].append(file_info)
+
+    confirmed: list[list[SizedFile]] = []
+    partial_groups: list[list[SizedFile]] = []
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        if size == 0:
+            confirmed.append(group)
+        else:
+            partial_groups.append(group)
+
+    candidates = [f for group in partial_groups for f in group]
+    report.partial_hashed = len(candidates)
+    partial_digests = hasher.hash_file_ends(((f.filepath, f.size_bytes) for f in candidates), block_size)
+
+    full_groups: list[list[SizedFile]] = []
+    for group in partial_groups:
+        for bucket in _split_by_digest(group, partial_digests):
+            if bucket[0].size_bytes <= 2 * block_size:
+                # The partial hash already covered every byte
+                confirmed.append(bucket)
+                report.digests.update((f.filepath, partial_digests[f.filepath]) for f in bucket)
+            else:
+                full_groups.append(bucket)
+
+    candidates = [f for group in full_groups for f in group]
+    report.full_hashed = len(candidates)
+    full_digests = hasher.hash_files(f.filepath for f in candidates)
+    report.digests.update(full_digests)
+
+    for group in full_groups:
+        confirmed.extend(_split_by_digest(group, full_digests))
+
+    order = {id(file_info): i for i, file_info in enumerate(files)}
+    for group in confirmed:
+        group.sort(key=lambda f: order[id(f)])
+        original = group[0].filepath
+        for file_info in group[1:]:
+            report.duplicate_of[file_info.filepath] = original
+
+    logger.info(
+        f"Duplicate check: {report.total_duplicates} duplicates among {report.files} files "
+        f"({report.partial_hashed} partially hashed, {report.full_hashed} fully hashed)"
+    )
+    return report
+
+
+class CopyTracker:
+    """
+    Finds files identical to an earlier one while a walk is still going on.
+
+    Only a file sharing its size with an earlier one is hashed, along with the
+    first file of that size; everything else is never opened. Unlike
+    find_duplicates there is no partial-hash stage, so every hashed file gets
+    a full digest the caller can reuse.
+    """
+
+    def __init__(self, hasher: Optional[FileHasher] = None):
+        self.hasher = hasher or FileHasher()
+        self._first_of_size: dict[int, str] = {}
+        self._by_digest: dict[str, str] = {}
+        # filepath -> full digest of the files hashed so far
+        self.digests: dict[str, str] = {}
+
+    def is_first_of_size(self, file: Union[FileInfo, SizedFile]) -> bool:
+        return self._first_of_size.get(file.size_bytes) == file.filepath
+
+    def original_of(self, file: Union[FileInfo, SizedFile]) -> Optional[str]:
+        # The earliest file added with the same content, None for the first copy of any content
+        first = self._first_of_size.setdefault(file.size_bytes, file.filepath)
+        if first == file.filepath:
+            return None
+
+        unhashed = [path for path in (first, file.filepath) if path not in self.digests]
+        for path, digest in self.hasher.hash_files(unhashed).items():
+            self.digests[path] = digest
+            self._by_digest.setdefault(digest, path)
+
+        original = self._by_digest.get(self.digests.get(file.filepath))
+        return original if original != file.filepath else None
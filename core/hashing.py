@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+HASH_ALGORITHMS = {"sha256", "sha1", "md5", "blake2b", "blake2s"}
+
+DEFAULT_ALGORITHM = "sha256"
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def _new_digest(algorithm: str):
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {algorithm} (expected one of {sorted(HASH_ALGORITHMS)})")
+    return hashlib.new(algorithm)
+
+
+def hash_file(
+    file_path: PathLike,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer: Optional[bytearray] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE
+) -> str:
+    digest = _new_digest(algorithm)
+    view = memoryview(buffer if buffer is not None else bytearray(block_size))
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(view)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def hash_file_ends(
+    file_path: PathLike,
+    size: int,
+    block_size: int,
+    algorithm: str = DEFAULT_ALGORITHM,
+    buffer: Optional[bytearray] = None
+) -> str:
+    # Hash of the first and last `block_size` bytes (the whole file when it is small enough)
+    digest = _new_digest(algorithm)
+    view = memoryview(buffer if buffer is not None and len(buffer) >= block_size else bytearray(block_size))[:block_size]
+    with open(file_path, 'rb', buffering=0) as f:
+        read = f.readinto(view)
+        digest.update(view[:read])
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            read = f.readinto(view)
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+class FileHasher:
+    """
+    Hashes files on a thread pool (hashlib releases the GIL for large updates).
+
+    Each worker thread reads into its own preallocated buffer, so no bytes
+    object is allocated per block. Files that cannot be read are left out of
+    the returned mapping.
+    """
+
+    def __init__(
+        self,
+        algorithm: str = DEFAULT_ALGORITHM,
+        num_workers: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE
+    ):
+        _new_digest(algorithm)
+        self.algorithm = algorithm
+        self.num_workers = min(8, os.cpu_count() or 1) if num_workers is None else max(1, num_workers)
+        self.block_size = block_size
+        self._local = threading.local()
+
+    def hash_files(self, paths: Iterable[PathLike]) -> dict[PathLike, str]:
+        return self._map(paths, lambda path: hash_file(path, self.algorithm, self._buffer(), self.block_size))
+
+    def hash_file_ends(self, files: Iterable[tuple[PathLike, int]], block_size: int) -> dict[PathLike, str]:
+        sizes = dict(files)
+        return self._map(
+            sizes,
+            lambda path: hash_file_ends(path, sizes[path], block_size, self.algorithm, self._buffer())
+        )
+
+    def _buffer(self) -> bytearray:
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(self.block_size)
+        return buffer
+
+    def _map(self, paths: Iterable[PathLike], hash_fn) -> dict[PathLike, str]:
+        paths = list(paths)
+
+        def run(path: PathLike) -> Optional[str]:
+            try:
+                return hash_fn(path)
+            except OSError as e:
+                logger.debug(f"Could not hash {path}: {e}")
+                return None
+
+        if self.num_workers == 1 or len(paths) < 2:
+            digests = [run(path) for path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.num_workers, len(paths)), thread_name_prefix="hasher") as executor:
+                digests = list(executor.map(run, paths))
+
+        return {path: digest for path, digest in zip(paths, digests) if digest is not None}
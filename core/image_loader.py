@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import torch
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+Preprocess = Callable[["Image.Image"], "torch.Tensor"]
+LoadFn = Callable[[Path], "torch.Tensor"]
+# Estimated bytes needed to decode an image, from its header
+CostFn = Callable[[Path], int]
+
+# Formats whose decoder can natively produce a downscaled image (DCT scaling)
+DRAFT_FORMATS = {"JPEG", "MPO"}
+
+# Images with more pixels than this (after draft scaling) are refused as decompression bombs;
+# anything smaller is decoded, on its own when it is over the decode budget. ~1.5 GB as 8-bit RGB
+DEFAULT_MAX_PIXELS = 512_000_000
+
+# Decoded bytes allowed in one batch; up to `prefetch_batches` batches are decoded at once
+DEFAULT_DECODE_BUDGET = 512 * 1024**2
+
+# Modes whose box reduction gives the same pixels before or after conversion to RGB
+REDUCE_FIRST_MODES = {"L", "RGB"}
+
+# Bytes per decoded pixel by mode; other modes count as 4
+MODE_BYTES = {"1": 1, "L": 1, "P": 1, "LA": 2, "PA": 2, "I;16": 2, "I;16B": 2, "I;16L": 2, "RGB": 3, "YCbCr": 3, "LAB": 3}
+
+# TIFF NewSubfileType bit marking a reduced-resolution copy of another page
+REDUCED_RESOLUTION_SUBFILE = 1
+
+# Set in each process-pool worker by _init_process_worker
+_worker_load_fn: Optional[LoadFn] = None
+
+
+def open_image(image_path: Path, target_size: int = 224, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS) -> Image.Image:
+    from PIL import Image
+
+    image = _open_reduced(image_path, target_size)
+
+    # Size comes from the header (after draft scaling); nothing has been decoded yet
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        image.close()
+        raise Image.DecompressionBombError(f"{width}x{height} image exceeds the limit of {max_pixels} pixels")
+
+    # Downscale before the conversion when it doesn't change the result, so the RGB copy is small
+    factor = min(image.size) // target_size
+    if factor >= 2 and image.mode in REDUCE_FIRST_MODES:
+        image = image.reduce(factor)
+
+    image = image.convert("RGB")
+
+    # Cheap box downscale so the preprocess resize starts close to the model input size
+    factor = min(image.size) // target_size
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    return image
+
+
+def estimate_decode_bytes(
+    image_path: Path, target_size: int = 224, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS
+) -> int:
+    # Memory open_image needs for this image, read from the header without decoding anything.
+    # Unreadable files and images over max_pixels cost nothing here; open_image refuses them undecoded.
+    try:
+        with _open_reduced(image_path, target_size) as image:
+            pixels = image.size[0] * image.size[1]
+            if max_pixels and pixels > max_pixels:
+                return 0
+            cost = pixels * MODE_BYTES.get(image.mode, 4)
+            if image.mode not in REDUCE_FIRST_MODES:
+                # Converted to RGB at full size before the reduction
+                cost += pixels * 3
+            return cost
+    except Exception:
+        return 0
+
+
+def _raise_pillow_limit() -> None:
+    # Image.open refuses images over twice Pillow's MAX_IMAGE_PIXELS (~179 MP by default) at full size,
+    # before draft scaling could shrink them. The limit is raised to this module's ceiling, process-wide
+    # but never disabled, so every other Image.open keeps its bomb check; open_image then applies
+    # max_pixels to the reduced size.
+    from PIL import Image
+
+    if Image.MAX_IMAGE_PIXELS is not None and Image.MAX_IMAGE_PIXELS < DEFAULT_MAX_PIXELS:
+        Image.MAX_IMAGE_PIXELS = DEFAULT_MAX_PIXELS
+
+
+def _open_reduced(image_path: Path, target_size: int) -> Image.Image:
+    # Opens the image at the smallest resolution its format can decode directly, still >= target_size
+    from PIL import Image
+
+    _raise_pillow_limit()
+    image = Image.open(image_path)
+
+    if image.format in DRAFT_FORMATS:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while both sides stay >= target_size
+        image.draft("RGB", (target_size, target_size))
+    elif image.format == "TIFF" and getattr(image, "n_frames", 1) > 1:
+        _seek_reduced_subfile(image, target_size)
+
+    return image
+
+
+def _seek_reduced_subfile(image: Image.Image, target_size: int) -> None:
+    # Pyramidal TIFFs store reduced-resolution copies of the first page as extra subfiles
+    best_frame, best_pixels = 0, image.size[0] * image.size[1]
+    for frame in range(1, image.n_frames):
+        image.seek(frame)
+        if not image.tag_v2.get(254, 0) & REDUCED_RESOLUTION_SUBFILE:
+            continue
+        width, height = image.size
+        if min(width, height) >= target_size and width * height < best_pixels:
+            best_frame, best_pixels = frame, width * height
+    image.seek(best_frame)
+
+
+class ImageDecoder:
+    """Picklable decode + preprocess step shared by thread and process workers."""
+
+    def __init__(self, preprocess: Preprocess, target_size: int = 224, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS):
+        self.preprocess = preprocess
+        self.target_size = target_size
+        self.max_pixels = max_pixels
+
+    def __call__(self, image_path: Path) -> torch.Tensor:
+        return self.preprocess(open_image(image_path, self.target_size, self.max_pixels))
+
+    def decode_cost(self, image_path: Path) -> int:
+        return estimate_decode_bytes(image_path, self.target_size, self.max_pixels)
+
+
+def _init_process_worker(load_fn: LoadFn) -> None:
+    import torch
+
+    global _worker_load_fn
+    _worker_load_fn = load_fn
+    # Each worker decodes one image at a time; avoid oversubscribing the cores
+    torch.set_num_threads(1)
+
+
+def _load_in_process_worker(image_path: Path) -> torch.Tensor:
+    return _worker_load_fn(image_path)
+
+
+class ImageBatchLoader:
+    """
+    Decodes and preprocesses images on a worker pool ahead of the consumer.
+
+    Up to `prefetch_batches` batches are in flight while the current one is
+    being encoded, so decoding batch N+1 overlaps with inference on batch N.
+    With `num_workers=0` images are loaded inline on the calling thread.
+
+    Given a cost function, batches are also cut so their estimated decoded
+    size stays within `memory_budget` bytes, and no more than
+    `prefetch_batches` budgets are decoding at once. An image over the budget
+    on its own is decoded alone.
+    """
+
+    WORKER_TYPES = {"thread", "process"}
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        worker_type: str = "thread",
+        prefetch_batches: int = 2,
+        memory_budget: Optional[int] = DEFAULT_DECODE_BUDGET
+    ):
+        if worker_type not in self.WORKER_TYPES:
+            raise ValueError(f"Unknown worker type: {worker_type} (expected one of {sorted(self.WORKER_TYPES)})")
+
+        self.num_workers = min(8, os.cpu_count() or 1) if num_workers is None else max(0, num_workers)
+        self.worker_type = worker_type
+        self.prefetch_batches = max(1, prefetch_batches)
+        self.memory_budget = memory_budget
+        self._executor: Optional[Executor] = None
+        self._executor_load_fn: Optional[LoadFn] = None
+
+    def iter_batches(
+        self,
+        image_paths: list[Path],
+        batch_size: int,
+        load_fn: LoadFn,
+        cost_fn: Optional[CostFn] = None
+    ) -> Iterator[tuple[list[Path], list[Path], list[torch.Tensor]]]:
+        # Yields (batch paths, successfully loaded paths, their tensors) in input order
+        batches = self._plan_batches(image_paths, batch_size, cost_fn)
+        if not batches:
+            return
+
+        if self.num_workers == 0:
+            for batch_paths, _ in batches:
+                yield self._collect(batch_paths, [self._run_inline(p, load_fn) for p in batch_paths])
+            return
+
+        executor = self._get_executor(load_fn)
+        pending: deque[tuple[list[Path], list[Future], int]] = deque()
+        in_flight_cost = 0
+        max_in_flight_cost = (self.memory_budget or 0) * self.prefetch_batches
+        next_batch = 0
+
+        def submit_next() -> bool:
+            nonlocal next_batch, in_flight_cost
+            if next_batch == len(batches) or len(pending) == self.prefetch_batches:
+                return False
+            batch_paths, cost = batches[next_batch]
+            # The batch being collected still counts until it is done
+            if in_flight_cost and in_flight_cost + cost > max_in_flight_cost:
+                return False
+            pending.append((batch_paths, [self._submit(executor, p, load_fn) for p in batch_paths], cost))
+            in_flight_cost += cost
+            next_batch += 1
+            return True
+
+        while submit_next():
+            pass
+
+        try:
+            while pending:
+                batch_paths, futures, cost = pending.popleft()
+                while submit_next():
+                    pass
+                batch = self._collect(batch_paths, futures)
+                in_flight_cost -= cost
+                while submit_next():
+                    pass
+                yield batch
+        finally:
+            for _, futures, _ in pending:
+                for future in futures:
+                    future.cancel()
+
+    def _plan_batches(self, image_paths: list[Path], batch_size: int, cost_fn: Optional[CostFn]) -> list[tuple[list[Path], int]]:
+        # (paths, estimated decode bytes) per batch, in input order
+        if cost_fn is None or not self.memory_budget:
+            return [(image_paths[i:i + batch_size], 0) for i in range(0, len(image_paths), batch_size)]
+
+        batches = []
+        current: list[Path] = []
+        current_cost = 0
+        for image_path in image_paths:
+            cost = cost_fn(image_path)
+            if current and (len(current) == batch_size or current_cost + cost > self.memory_budget):
+                batches.append((current, current_cost))
+                current, current_cost = [], 0
+            current.append(image_path)
+            current_cost += cost
+        if current:
+            batches.append((current, current_cost))
+
+        # An image over the budget takes the whole in-flight allowance, so nothing decodes next to it
+        return [
+            (paths, cost if cost <= self.memory_budget else self.memory_budget * self.prefetch_batches)
+            for paths, cost in batches
+        ]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_load_fn = None
+
+    def _get_executor(self, load_fn: LoadFn) -> Executor:
+        # Process workers hold their own copy of the decoder; rebuild them if it changed
+        if self._executor is not None and self.worker_type == "process" and self._executor_load_fn is not load_fn:
+            self.close()
+
+        if self._executor is None:
+            if self.worker_type == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    initializer=_init_process_worker,
+                    initargs=(load_fn,)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="image-loader")
+            self._executor_load_fn = load_fn
+
+        return self._executor
+
+    def _submit(self, executor: Executor, image_path: Path, load_fn: LoadFn) -> Future:
+        if self.worker_type == "process":
+            return executor.submit(_load_in_process_worker, image_path)
+        return executor.submit(load_fn, image_path)
+
+    @staticmethod
+    def _run_inline(image_path: Path, load_fn: LoadFn) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(load_fn(image_path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @staticmethod
+    def _collect(batch_paths: list[Path], futures: list[Future]) -> tuple[list[Path], list[Path], list[torch.Tensor]]:
+        loaded_paths = []
+        tensors = []
+        for image_path, future in zip(batch_paths, futures):
+            try:
+                tensors.append(future.result())
+                loaded_paths.append(image_path)
+            except Exception as e:
+                logger.warning(f"Could not load {image_path}: {e}")
+        return batch_paths, loaded_paths, tensors
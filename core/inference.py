@@ -1,11 +1,29 @@
 
+from __future__ import annotations
+
+import hashlib
+import json
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from collections.abc import Sized
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Mapping, Optional
 from dataclasses import dataclass
 
-import torch
-from PIL import Image
+from core.batching import BatchSizeTuner
+from core.cache import ClassificationCache, EmbeddingCache, TextEmbeddingCache
+from core.hashing import DEFAULT_ALGORITHM, FileHasher
+from core.image_loader import DEFAULT_DECODE_BUDGET, DEFAULT_MAX_PIXELS, ImageBatchLoader, ImageDecoder
+from core.sharding import EncodedBatch, ShardPlan, ShardPool, available_cpus, fork_supported
+from core.timings import lazy_import, timed
+
+if TYPE_CHECKING:
+    # numpy, torch and the model backends are imported on first use, so commands
+    # that never classify an image don't pay for them
+    import numpy as np
+    import torch
 
 _clip_model = None
 _clip_preprocess = None
@@ -13,6 +31,19 @@ _clip_tokenizer = None
 
 logger = logging.getLogger(__name__)
 
+# Called with (images done, total images or None when the input is a lazy iterable)
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def categories_fingerprint(categories: list[str], category_prompts: list[str]) -> str:
+    return hashlib.sha256(json.dumps([categories, category_prompts]).encode()).hexdigest()
+
 
 @dataclass
 class ClassificationResult:
@@ -31,47 +62,168 @@ class ClipInference:
     # Supported image extensions
     IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif", ".tiff"}
     
+    # Cache lookups are done this many batches at a time, bounding memory for lazy inputs
+    CACHE_LOOKUP_BATCHES = 16
+    
+    # Embeddings stacked into one matrix per scoring step of rank_images
+    RANK_CHUNK_SIZE = 4096
+    
     def __init__(
         self,
         model_name: str = "ViT-B-32",
         pretrained: str = "laion2b_s34b_b79k",
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        num_workers: Optional[int] = None,
+        worker_type: str = "thread",
+        prefetch_batches: int = 2,
+        max_pixels: Optional[int] = DEFAULT_MAX_PIXELS,
+        decode_budget: Optional[int] = DEFAULT_DECODE_BUDGET,
+        backend: str = "torch",
+        onnx_precision: str = "int8",
+        text_cache: Optional[TextEmbeddingCache] = None,
+        result_cache: Optional[ClassificationCache] = None,
+        shards: Optional[ShardPlan] = None,
+        batch_size: Optional[int] = None,
+        auto_batch_size: bool = False,
+        max_rss_mb: Optional[int] = None,
+        persist_batch_size: bool = True
     ):
 
         self.model_name = model_name
         self.pretrained = pretrained
+        self.embedding_cache = embedding_cache
+        self.text_cache = text_cache
+        self.result_cache = result_cache
+        self._hasher: Optional[FileHasher] = None
+        # Normalized text features by prompt; they outlive unload_model, as they don't depend on the loaded weights
+        self._text_features: dict[str, np.ndarray] = {}
+        self._text_lock = threading.Lock()
+        self.image_loader = ImageBatchLoader(
+            num_workers=num_workers,
+            worker_type=worker_type,
+            prefetch_batches=prefetch_batches,
+            memory_budget=decode_budget
+        )
+        # Before core.backends, which needs torch as well, so the timings report attributes the import
+        torch = lazy_import("torch")
+        from core.backends import BACKENDS, OnnxBackend
+
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend} (expected one of {sorted(BACKENDS)})")
+        
+        self.backend_name = backend
+        self.onnx_precision = onnx_precision
+        self._backend = None
         self._model = None
         self._preprocess = None
         self._tokenizer = None
+        self._image_decoder: Optional[ImageDecoder] = None
+        self.max_pixels = max_pixels
+        self._model_lock = threading.RLock()
+        self._load_thread: Optional[threading.Thread] = None
+        self._async_load_error: Optional[Exception] = None
+        # With more than one worker, image batches are encoded on forked copies of the loaded model
+        self.shards = shards
+        self._shard_pool: Optional[ShardPool] = None
+        self._shard_lock = threading.Lock()
+        # A fixed `batch_size` overrides the one each call asks for; with `auto_batch_size` it is tuned
+        # per device once the model is loaded, backing off when RSS crosses `max_rss_mb`. Tuned sizes are
+        # remembered across runs unless `persist_batch_size` is off.
+        self.batch_size = batch_size
+        self.auto_batch_size = auto_batch_size
+        self.max_rss_mb = max_rss_mb
+        self.persist_batch_size = persist_batch_size
+        self.batch_tuner: Optional[BatchSizeTuner] = None
         
         if device is None:
             self.device = "cuda" if torch.cuda.is_available() else "cpu"
         else:
             self.device = device
         
-        logger.info(f"CLIP Inference initialized (device: {self.device})")
+        if backend == OnnxBackend.name and self.device != "cpu":
+            logger.warning(f"ONNX backend runs on the CPU, ignoring device {self.device}")
+            self.device = "cpu"
+        
+        logger.info(f"CLIP Inference initialized (device: {self.device}, backend: {backend})")
+    
+    @property
+    def cache_model(self) -> str:
+        # Model name the caches are keyed by: torch and ONNX (at each precision) produce different vectors
+        from core.backends import OnnxBackend
+        
+        if self.backend_name == OnnxBackend.name:
+            return f"{self.model_name}@{self.backend_name}-{self.onnx_precision}"
+        return f"{self.model_name}@{self.backend_name}"
+    
+    def is_model_loaded(self) -> bool:
+        return self._backend is not None
+    
+    def load_model(self) -> None:
+        self._ensure_model_loaded()
+    
+    def load_async(self) -> None:
+        # Starts loading the model on a background thread; callers that need it block on the model lock
+        # until it is ready. A failed background load is re-raised once, by the next caller that needs the model.
+        if self._backend is not None or self._load_thread is not None:
+            return
+        
+        def load() -> None:
+            # The error is stored before the lock is released, so no caller can start a second load meanwhile
+            with self._model_lock:
+                try:
+                    self._ensure_model_loaded()
+                except Exception as e:
+                    self._async_load_error = e
+                finally:
+                    self._load_thread = None
+        
+        self._load_thread = threading.Thread(target=load, name="clip-model-loader", daemon=True)
+        self._load_thread.start()
     
     def _ensure_model_loaded(self) -> None:
-        if self._model is not None:
+        if self._backend is not None:
             return
         
+        with self._model_lock:
+            if self._async_load_error is not None:
+                error, self._async_load_error = self._async_load_error, None
+                raise error
+            if self._backend is None:
+                self._load_model()
+    
+    def _load_model(self) -> None:
         try:
-            import open_clip
+            from core.backends import TorchBackend
+
+            open_clip = lazy_import("open_clip")
             
             logger.info(f"Loading CLIP model: {self.model_name} ({self.pretrained})...")
             
-            self._model, _, self._preprocess = open_clip.create_model_and_transforms(
-                self.model_name,
-                pretrained=self.pretrained,
-                device=self.device
-            )
+            with timed("load CLIP model"):
+                self._model, _, self._preprocess = open_clip.create_model_and_transforms(
+                    self.model_name,
+                    pretrained=self.pretrained,
+                    device=self.device
+                )
             self._tokenizer = open_clip.get_tokenizer(self.model_name)
             
             self._model.eval()
             
-            logger.info(f"CLIP model loaded successfully on {self.device}")
+            self._image_decoder = ImageDecoder(self._preprocess, self._get_input_size(), self.max_pixels)
+            self._backend = self._create_backend()
+            
+            if not isinstance(self._backend, TorchBackend):
+                # The exported graphs hold their own weights
+                self._model = None
+            
+            logger.info(f"CLIP model loaded successfully on {self.device} ({self._backend.name} backend)")
+            
+            if self.auto_batch_size and self.batch_tuner is None:
+                self.batch_tuner = self._create_batch_tuner()
             
             if self.device == "cuda":
+                import torch
                 gpu_name = torch.cuda.get_device_name(0)
                 gpu_memory = torch.cuda.get_device_properties(0).total_memory / 1024**3
                 logger.info(f"GPU: {gpu_name} ({gpu_memory:.1f} GB)")
@@ -80,6 +232,59 @@ class ClipInference:
             logger.error(f"Failed to load CLIP model: {e}")
             raise RuntimeError(f"Could not load CLIP model: {e}")
     
+    def _create_backend(self):
+        from core.backends import OnnxBackend, TorchBackend
+
+        if self.backend_name == OnnxBackend.name:
+            try:
+                return OnnxBackend(
+                    self._model,
+                    self._tokenizer,
+                    self.model_name,
+                    self.pretrained,
+                    precision=self.onnx_precision
+                )
+            except ImportError:
+                logger.warning("onnxruntime not installed, falling back to the torch backend")
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable ({e}), falling back to the torch backend")
+        
+        # Cached vectors are written under the backend actually in use
+        self.backend_name = TorchBackend.name
+        return TorchBackend(self._model)
+    
+    def _create_batch_tuner(self) -> BatchSizeTuner:
+        import torch
+        
+        if self.device == "cuda":
+            hardware = torch.cuda.get_device_name(0)
+            candidates = BatchSizeTuner.CUDA_CANDIDATES
+        else:
+            hardware = f"cpu-{available_cpus()}cores-{torch.get_num_threads()}threads"
+            candidates = BatchSizeTuner.CPU_CANDIDATES
+        
+        # A size chosen under an RSS ceiling is only reused under the same ceiling
+        ceiling = f"/max-rss-{self.max_rss_mb}mb" if self.max_rss_mb else ""
+        return BatchSizeTuner(
+            f"{self.model_name}/{self._backend.name}/{hardware}{ceiling}",
+            candidates,
+            max_rss_bytes=self.max_rss_mb * 1024**2 if self.max_rss_mb else None,
+            persist=self.persist_batch_size
+        )
+    
+    def _batch_size(self, requested: int) -> int:
+        # Probing needs in-process batches; the shards use a tuned size only once one is known
+        tuner = self.batch_tuner
+        if tuner is not None and (tuner.settled or self._shard_pool is None):
+            return tuner.batch_size
+        return self.batch_size or requested
+    
+    def _get_input_size(self) -> int:
+        image_size = getattr(self._model.visual, "image_size", 224)
+        if isinstance(image_size, (tuple, list)):
+            return min(image_size)
+        return int(image_size)
+    
     def is_image_file(self, file_path: Path) -> bool:
         return file_path.suffix.lower() in self.IMAGE_EXTENSIONS
     
@@ -90,136 +295,497 @@ class ClipInference:
         category_prompts: Optional[list[str]] = None
     ) -> ClassificationResult:
    
-        self._ensure_model_loaded()
-        
         if category_prompts is None:
             category_prompts = [f"a photo of {cat}" for cat in categories]
         
-        try:
-            image = Image.open(image_path).convert("RGB")
-            image_tensor = self._preprocess(image).unsqueeze(0).to(self.device)
-            
-            text_tokens = self._tokenizer(category_prompts).to(self.device)
-            
-            with torch.no_grad():
-                image_features = self._model.encode_image(image_tensor)
-                text_features = self._model.encode_text(text_tokens)
-                
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-                
-                similarity = (image_features @ text_features.T).squeeze(0)
-                
-                probs = torch.softmax(similarity * 100, dim=0)
-            
-            scores_dict = {cat: prob.item() for cat, prob in zip(categories, probs)}
-            best_idx = probs.argmax().item()
-            best_category = categories[best_idx]
-            best_confidence = probs[best_idx].item()
-            
-            return ClassificationResult(
-                file_path=image_path,
-                suggested_category=best_category,
-                confidence=best_confidence,
-                all_scores=scores_dict
-            )
-            
-        except Exception as e:
-            logger.error(f"Error classifying {image_path}: {e}")
-            raise
+        embedding = self.embed_images([image_path])[0]
+        if embedding is None:
+            raise RuntimeError(f"Could not load image: {image_path}")
+        
+        import numpy as np
+
+        text_features = self._encode_prompts(category_prompts)
+        return self._scores_to_results([image_path], np.stack([embedding]), text_features, categories)[0]
     
     def classify_batch(
         self,
         image_paths: list[Path],
         categories: list[str],
         category_prompts: Optional[list[str]] = None,
-        batch_size: int = 16
+        batch_size: int = 16,
+        progress_callback: Optional[ProgressCallback] = None,
+        content_hashes: Optional[Mapping[Path, str]] = None,
+        hash_algorithm: str = DEFAULT_ALGORITHM
     ) -> list[ClassificationResult]:
      
-        self._ensure_model_loaded()
-        
+        return list(self.iter_classify_batch(
+            image_paths,
+            categories,
+            category_prompts,
+            batch_size=batch_size,
+            progress_callback=progress_callback,
+            content_hashes=content_hashes,
+            hash_algorithm=hash_algorithm
+        ))
+    
+    def iter_classify_batch(
+        self,
+        image_paths: Iterable[Path],
+        categories: list[str],
+        category_prompts: Optional[list[str]] = None,
+        batch_size: int = 16,
+        progress_callback: Optional[ProgressCallback] = None,
+        content_hashes: Optional[Mapping[Path, str]] = None,
+        hash_algorithm: str = DEFAULT_ALGORITHM
+    ) -> Iterator[ClassificationResult]:
+        # Yields results in input order as soon as each batch has been encoded.
+        # `content_hashes` are `hash_algorithm` digests the caller already has (e.g. from the scanner).
         if category_prompts is None:
             category_prompts = [f"a photo of {cat}" for cat in categories]
         
-        results = []
+        if self.result_cache is None:
+            yield from self._classify_paths(image_paths, categories, category_prompts, batch_size, progress_callback)
+            return
         
-        text_tokens = self._tokenizer(category_prompts).to(self.device)
-        with torch.no_grad():
-            text_features = self._model.encode_text(text_tokens)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+        fingerprint = categories_fingerprint(categories, category_prompts)
+        total = len(image_paths) if isinstance(image_paths, Sized) else None
+        done = 0
+        # With nothing stored for this model and category set, hashing ahead of the decode would read every
+        # file twice just to find copies within this run; new files are hashed once they have been decoded
+        cold = not self.result_cache.has_entries(self.cache_model, self.pretrained, fingerprint)
         
-        for i in range(0, len(image_paths), batch_size):
-            batch_paths = image_paths[i:i + batch_size]
-            batch_tensors = []
-            valid_indices = []
+        for window in _chunked(image_paths, batch_size * self.CACHE_LOOKUP_BATCHES):
+            hashes = self._content_hashes(window, content_hashes or {}, hash_algorithm, read_files=not cold)
+            scores_by_hash = self.result_cache.get_many(set(hashes.values()), self.cache_model, self.pretrained, fingerprint)
             
-            for idx, img_path in enumerate(batch_paths):
-                try:
-                    image = Image.open(img_path).convert("RGB")
-                    tensor = self._preprocess(image)
-                    batch_tensors.append(tensor)
-                    valid_indices.append(idx)
-                except Exception as e:
-                    logger.warning(f"Could not load {img_path}: {e}")
-                    results.append(ClassificationResult(
-                        file_path=img_path,
-                        suggested_category="Erro",
-                        confidence=0.0,
-                        all_scores={}
-                    ))
-            
-            if not batch_tensors:
-                continue
+            # One path per unknown content goes through CLIP; its copies reuse the result
+            to_classify: dict[Path, None] = {}
+            claimed: set[str] = set()
+            for image_path in window:
+                content_hash = hashes.get(image_path)
+                if content_hash is None:
+                    to_classify[image_path] = None
+                elif content_hash not in scores_by_hash and content_hash not in claimed:
+                    claimed.add(content_hash)
+                    to_classify[image_path] = None
+            
+            reused = len(window) - len(to_classify)
+            
+            def window_progress(count: int, _total: Optional[int], offset: int = done + reused) -> None:
+                progress_callback(offset + count, total)
+            
+            classified: dict[Path, ClassificationResult] = {}
+            new_scores: dict[str, dict[str, float]] = {}
+            next_index = 0
+            
+            for result in self._classify_paths(
+                list(to_classify),
+                categories,
+                category_prompts,
+                batch_size,
+                window_progress if progress_callback is not None else None
+            ):
+                classified[result.file_path] = result
+                content_hash = hashes.get(result.file_path)
+                if content_hash is not None and result.all_scores:
+                    new_scores[content_hash] = scores_by_hash[content_hash] = result.all_scores
+                
+                # Emit, in input order, everything that is resolved so far
+                while next_index < len(window):
+                    image_path = window[next_index]
+                    if image_path in classified:
+                        yield classified[image_path]
+                    elif hashes.get(image_path) in scores_by_hash:
+                        yield self._result_from_scores(image_path, scores_by_hash[hashes[image_path]])
+                    else:
+                        break
+                    next_index += 1
+            
+            if cold:
+                # Just decoded, so these reads come from the page cache
+                unhashed = [path for path, result in classified.items() if path not in hashes and result.all_scores]
+                for path, content_hash in self._hash_files(unhashed, hash_algorithm).items():
+                    new_scores[content_hash] = classified[path].all_scores
+            self.result_cache.put_many(new_scores, self.cache_model, self.pretrained, fingerprint)
+            
+            done += len(window)
+            if progress_callback is not None and not to_classify:
+                progress_callback(done, total)
+            
+            # The rest were reused, or are copies of a file that could not be loaded
+            for image_path in window[next_index:]:
+                result = classified.get(image_path)
+                if result is None:
+                    result = self._result_from_scores(image_path, scores_by_hash.get(hashes.get(image_path), {}))
+                yield result
+    
+    def _classify_paths(
+        self,
+        image_paths: Iterable[Path],
+        categories: list[str],
+        category_prompts: list[str],
+        batch_size: int,
+        progress_callback: Optional[ProgressCallback]
+    ) -> Iterator[ClassificationResult]:
+        import numpy as np
+        
+        text_features = None
+        
+        for group in self._iter_embedding_groups(image_paths, batch_size, progress_callback):
+            valid = [(p, emb) for p, emb in group if emb is not None]
+            classified: dict[Path, ClassificationResult] = {}
             
-            batch = torch.stack(batch_tensors).to(self.device)
+            if valid:
+                if text_features is None:
+                    text_features = self._encode_prompts(category_prompts)
+                valid_paths = [p for p, _ in valid]
+                valid_embeddings = np.stack([emb for _, emb in valid])
+                
+                for result in self._scores_to_results(valid_paths, valid_embeddings, text_features, categories):
+                    classified[result.file_path] = result
             
-            with torch.no_grad():
-                image_features = self._model.encode_image(batch)
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            for img_path, _ in group:
+                yield classified.get(img_path) or self._result_from_scores(img_path, {})
+    
+    def _content_hashes(
+        self,
+        window: list[Path],
+        known: Mapping[Path, str],
+        algorithm: str,
+        read_files: bool = True
+    ) -> dict[Path, str]:
+        # Cache keys ("<algorithm>:<digest>") for the window. Only files the embedding cache can't serve are
+        # read and hashed; unchanged files in place are cheap to score from their cached embedding, and
+        # hashing them would read every byte
+        hashes = {p: f"{algorithm}:{known[p]}" for p in window if known.get(p)}
+        if not read_files:
+            return hashes
+        
+        unknown = [p for p in dict.fromkeys(window) if p not in hashes]
+        if unknown and self.embedding_cache is not None:
+            embedded = self.embedding_cache.contains_many(unknown, self.cache_model, self.pretrained)
+            unknown = [p for p in unknown if p not in embedded]
+        
+        hashes.update(self._hash_files(unknown, algorithm))
+        return hashes
+    
+    def _hash_files(self, paths: list[Path], algorithm: str) -> dict[Path, str]:
+        if not paths:
+            return {}
+        if self._hasher is None or self._hasher.algorithm != algorithm:
+            self._hasher = FileHasher(algorithm=algorithm)
+        return {path: f"{algorithm}:{digest}" for path, digest in self._hasher.hash_files(paths).items()}
+    
+    @staticmethod
+    def _result_from_scores(image_path: Path, scores: dict[str, float]) -> ClassificationResult:
+        if not scores:
+            return ClassificationResult(
+                file_path=image_path,
+                suggested_category="Erro",
+                confidence=0.0,
+                all_scores={}
+            )
+        best = max(scores, key=scores.get)
+        return ClassificationResult(
+            file_path=image_path,
+            suggested_category=best,
+            confidence=scores[best],
+            all_scores=dict(scores)
+        )
+    
+    def embed_images(self, image_paths: list[Path], batch_size: int = 16) -> list[Optional[np.ndarray]]:
+        # One normalized embedding per path, None when the image could not be loaded
+        return [embedding for _, embedding in self.iter_embed_images(image_paths, batch_size)]
+    
+    def iter_embed_images(
+        self,
+        image_paths: Iterable[Path],
+        batch_size: int = 16,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Iterator[tuple[Path, Optional[np.ndarray]]]:
+        for group in self._iter_embedding_groups(image_paths, batch_size, progress_callback):
+            yield from group
+    
+    def _iter_embedding_groups(
+        self,
+        image_paths: Iterable[Path],
+        batch_size: int,
+        progress_callback: Optional[ProgressCallback]
+    ) -> Iterator[list[tuple[Path, Optional[np.ndarray]]]]:
+        total = len(image_paths) if isinstance(image_paths, Sized) else None
+        done = 0
+        window_size = self._batch_size(batch_size) * self.CACHE_LOOKUP_BATCHES
+        
+        for window in _chunked(image_paths, window_size):
+            for group in self._embed_window(window, batch_size):
+                done += len(group)
+                if progress_callback is not None:
+                    progress_callback(done, total)
+                yield group
+    
+    def _embed_window(
+        self,
+        window: list[Path],
+        batch_size: int
+    ) -> Iterator[list[tuple[Path, Optional[np.ndarray]]]]:
+        # Cache hits are resolved up front; misses go through the prefetching loader (or the shards).
+        # Every group is emitted in input order as soon as all of its paths are resolved.
+        import numpy as np
+
+        resolved: dict[Path, Optional[np.ndarray]] = {}
+        if self.embedding_cache is not None:
+            resolved.update(self.embedding_cache.get_many(window, self.cache_model, self.pretrained))
+        
+        pending = list(dict.fromkeys(p for p in window if p not in resolved))
+        next_index = 0
+        
+        def ready_group() -> list[tuple[Path, Optional[np.ndarray]]]:
+            nonlocal next_index
+            start = next_index
+            while next_index < len(window) and window[next_index] in resolved:
+                next_index += 1
+            return [(p, resolved[p]) for p in window[start:next_index]]
+        
+        if pending:
+            self._ensure_model_loaded()
+        
+        group = ready_group()
+        if group:
+            yield group
+        
+        for batch_paths, loaded_paths, features in self._encode_batches(pending, batch_size):
+            resolved.update(dict.fromkeys(batch_paths))
+            
+            if features is not None:
+                batch_embeddings = dict(zip(loaded_paths, features))
+                resolved.update(batch_embeddings)
                 
-                similarity = image_features @ text_features.T
-                probs = torch.softmax(similarity * 100, dim=1)
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(batch_embeddings, self.cache_model, self.pretrained)
             
-            for batch_idx, file_idx in enumerate(valid_indices):
-                img_path = batch_paths[file_idx]
-                img_probs = probs[batch_idx]
+            group = ready_group()
+            if group:
+                yield group
+    
+    def _encode_batches(self, image_paths: list[Path], batch_size: int) -> Iterator[EncodedBatch]:
+        pool = self._get_shard_pool()
+        batch_size = self._batch_size(batch_size)
+        # One caller at a time drives the shards; concurrent requests (serve) encode in-process
+        if pool is not None and self._shard_lock.acquire(blocking=False):
+            done = 0
+            try:
+                for batch in pool.iter_batches(image_paths, batch_size, self._image_decoder.decode_cost):
+                    done += len(batch[0])
+                    yield batch
+                return
+            except RuntimeError as e:
+                # The batches not yet returned are encoded in-process; the pool restarts on the next call
+                logger.warning(f"{e}; encoding the remaining {len(image_paths) - done} images in-process")
+                image_paths = image_paths[done:]
+            finally:
+                self._shard_lock.release()
+        
+        # While the tuner is probing, batches are loaded one at a time so each gets the size being probed;
+        # after that, a back-off restarts the loader at the new size
+        tuner = self.batch_tuner
+        start = 0
+        while start < len(image_paths):
+            size = self._batch_size(batch_size)
+            end = start + size if tuner is not None and not tuner.settled else len(image_paths)
+            batches = self._load_and_encode(image_paths[start:end], size)
+            try:
+                for batch in batches:
+                    start += len(batch[0])
+                    yield batch
+                    if tuner is not None and tuner.batch_size != size:
+                        break
+            finally:
+                batches.close()
+    
+    def _load_and_encode(self, image_paths: list[Path], batch_size: int) -> Iterator[EncodedBatch]:
+        # Batches are also cut by the decoded size read from the image headers
+        decoder = self._image_decoder
+        for batch_paths, loaded_paths, batch_tensors in self.image_loader.iter_batches(
+            image_paths, batch_size, decoder, decoder.decode_cost
+        ):
+            yield batch_paths, loaded_paths, self._encode_tensors(batch_tensors) if batch_tensors else None
+    
+    def _encode_paths(self, image_paths: list[Path]) -> tuple[list[Path], Optional[np.ndarray]]:
+        # Decodes and encodes one batch inline; this is what each shard worker runs
+        loaded_paths = []
+        tensors = []
+        for image_path in image_paths:
+            try:
+                tensors.append(self._image_decoder(image_path))
+                loaded_paths.append(image_path)
+            except Exception as e:
+                logger.warning(f"Could not load {image_path}: {e}")
+        return loaded_paths, self._encode_tensors(tensors) if tensors else None
+    
+    def _encode_tensors(self, tensors: list[torch.Tensor]) -> np.ndarray:
+        import numpy as np
+        import torch
+        
+        tuner = self.batch_tuner
+        if tuner is None:
+            batch = torch.stack(tensors).to(self.device)
+            return self._encode_image_batch(batch).cpu().numpy().astype(np.float32)
+        
+        start_time = time.perf_counter()
+        try:
+            batch = torch.stack(tensors).to(self.device)
+            features = self._encode_image_batch(batch).cpu().numpy().astype(np.float32)
+        except torch.cuda.OutOfMemoryError:
+            batch = None
+            torch.cuda.empty_cache()
+            if len(tensors) == 1:
+                raise
+            # Smaller batches from now on; this one is encoded in two halves
+            tuner.record_oom(len(tensors))
+            half = len(tensors) // 2
+            return np.concatenate([self._encode_tensors(tensors[:half]), self._encode_tensors(tensors[half:])])
+        
+        tuner.record(len(tensors), time.perf_counter() - start_time)
+        return features
+    
+    def _get_shard_pool(self) -> Optional[ShardPool]:
+        if self.shards is None or self.shards.workers <= 1:
+            return None
+        
+        with self._model_lock:
+            if self._shard_pool is None:
+                from core.backends import TorchBackend
+                
+                if self.device != "cpu" or not isinstance(self._backend, TorchBackend):
+                    reason = f"the {self._backend.name} backend on {self.device}"
+                elif not fork_supported():
+                    reason = "a platform without fork()"
+                else:
+                    reason = None
                 
-                scores_dict = {cat: prob.item() for cat, prob in zip(categories, img_probs)}
-                best_idx = img_probs.argmax().item()
+                if reason is not None:
+                    logger.warning(f"Sharded inference needs the torch backend on the CPU, not {reason}; running in-process")
+                    self.shards = None
+                    return None
                 
-                results.append(ClassificationResult(
-                    file_path=img_path,
-                    suggested_category=categories[best_idx],
-                    confidence=img_probs[best_idx].item(),
-                    all_scores=scores_dict
-                ))
+                self._shard_pool = ShardPool(self, self.shards)
+            return self._shard_pool
+
+    def rank_images(
+        self,
+        query: str,
+        image_paths: Iterable[Path],
+        top_k: int = 50,
+        min_similarity: float = 0.0,
+        batch_size: int = 32,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> list[tuple[Path, float]]:
+        # Up to top_k (path, cosine similarity) pairs, best first. Embeddings come from the cache where
+        # possible and are scored a chunk at a time with one matrix product, keeping only the running top_k.
+        import numpy as np
         
-        return results
+        query_vector = self._encode_prompts([query]).cpu().numpy()[0].astype(np.float32)
+        best_paths: list[Path] = []
+        best_scores = np.empty(0, dtype=np.float32)
+        
+        for chunk in _chunked(self.iter_embed_images(image_paths, batch_size, progress_callback), self.RANK_CHUNK_SIZE):
+            valid = [(p, emb) for p, emb in chunk if emb is not None]
+            if not valid:
+                continue
+            
+            paths = best_paths + [p for p, _ in valid]
+            scores = np.concatenate([best_scores, np.stack([emb for _, emb in valid]) @ query_vector])
+            
+            keep = np.flatnonzero(scores >= min_similarity)
+            if len(keep) > top_k:
+                keep = keep[np.argpartition(scores[keep], -top_k)[-top_k:]]
+            
+            best_paths = [paths[i] for i in keep]
+            best_scores = scores[keep]
+        
+        order = np.argsort(-best_scores, kind="stable")
+        return [(best_paths[i], float(best_scores[i])) for i in order]
 
     def encode_text(self, text: str) -> list[float]:
-        self._ensure_model_loaded()
-        text_tokens = self._tokenizer([text]).to(self.device)
-        with torch.no_grad():
-            text_features = self._model.encode_text(text_tokens)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-            return text_features.cpu().numpy()[0].tolist()
+        return self._encode_prompts([text]).cpu().numpy()[0].tolist()
 
     def get_image_embedding(self, image_path: Path) -> list[float]:
-        self._ensure_model_loaded()
-        try:
-            image = Image.open(image_path).convert("RGB")
-            image_tensor = self._preprocess(image).unsqueeze(0).to(self.device)
-            with torch.no_grad():
-                image_features = self._model.encode_image(image_tensor)
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                return image_features.cpu().numpy()[0].tolist()
-        except Exception as e:
-            logger.error(f"Error encoding image {image_path}: {e}")
+        embedding = self.embed_images([image_path])[0]
+        if embedding is None:
+            logger.error(f"Error encoding image {image_path}")
             return []
+        return embedding.tolist()
+    
+    def get_cache_stats(self) -> dict:
+        if self.embedding_cache is None:
+            return {"hits": 0, "misses": 0}
+        return self.embedding_cache.get_stats()
+    
+    def _encode_image_batch(self, batch: torch.Tensor) -> torch.Tensor:
+        image_features = self._backend.encode_image(batch)
+        return image_features / image_features.norm(dim=-1, keepdim=True)
+    
+    def _encode_prompts(self, prompts: list[str]) -> torch.Tensor:
+        # Only prompts that are in neither the in-memory nor the persistent cache go through the
+        # text tower, so adding custom categories encodes just the new prompts
+        import numpy as np
+        import torch
+        
+        with self._text_lock:
+            missing = [p for p in dict.fromkeys(prompts) if p not in self._text_features]
+            if missing and self.text_cache is not None:
+                self._text_features.update(self.text_cache.get_many(missing, self.cache_model, self.pretrained))
+                missing = [p for p in missing if p not in self._text_features]
+            
+            if missing:
+                self._ensure_model_loaded()
+                text_tokens = self._tokenizer(missing).to(self.device)
+                text_features = self._backend.encode_text(text_tokens)
+                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                
+                encoded = dict(zip(missing, text_features.cpu().numpy().astype(np.float32)))
+                self._text_features.update(encoded)
+                if self.text_cache is not None:
+                    self.text_cache.put_many(encoded, self.cache_model, self.pretrained)
+            
+            features = np.stack([self._text_features[p] for p in prompts])
+        
+        return torch.from_numpy(features).to(self.device)
+    
+    def _scores_to_results(
+        self,
+        image_paths: list[Path],
+        embeddings: np.ndarray,
+        text_features: torch.Tensor,
+        categories: list[str]
+    ) -> list[ClassificationResult]:
+        import torch
+
+        image_features = torch.from_numpy(embeddings).to(self.device, dtype=text_features.dtype)
+        
+        with torch.no_grad():
+            similarity = image_features @ text_features.T
+            probs = torch.softmax(similarity * 100, dim=1).cpu()
+        
+        results = []
+        for img_path, img_probs in zip(image_paths, probs):
+            scores_dict = {cat: prob.item() for cat, prob in zip(categories, img_probs)}
+            best_idx = img_probs.argmax().item()
+            
+            results.append(ClassificationResult(
+                file_path=img_path,
+                suggested_category=categories[best_idx],
+                confidence=img_probs[best_idx].item(),
+                all_scores=scores_dict
+            ))
+        
+        return results
     
     def get_device_info(self) -> dict:
+        torch = lazy_import("torch")
         info = {
             "device": self.device,
+            "backend": self.backend_name,
             "cuda_available": torch.cuda.is_available(),
         }
         
@@ -231,15 +797,27 @@ class ClipInference:
         return info
     
     def unload_model(self) -> None:
-        if self._model is not None:
+        with self._model_lock:
+            self._unload_model()
+    
+    def _unload_model(self) -> None:
+        if self._backend is not None:
+            del self._backend
             del self._model
             del self._preprocess
             del self._tokenizer
+            self._backend = None
             self._model = None
             self._preprocess = None
             self._tokenizer = None
+            self._image_decoder = None
+            self.image_loader.close()
+            if self._shard_pool is not None:
+                self._shard_pool.close()
+                self._shard_pool = None
             
             if self.device == "cuda":
+                import torch
                 torch.cuda.empty_cache()
             
             logger.info("CLIP model unloaded")
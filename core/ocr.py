@@ -1,30 +1,48 @@
+import importlib.util
 import logging
 from pathlib import Path
 from typing import Optional
-import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+# Extensions whose text extraction is expensive enough to cache
+CACHED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"}
+
 class OCRManager:
-    
-    def __init__(self, tesseract_cmd: Optional[str] = None):
-        if tesseract_cmd:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-            
-    def extract_text_from_pdf(self, pdf_path: Path, max_pages: int = 5) -> str:
+
+    def __init__(self, tesseract_cmd: Optional[str] = None, max_pages: int = 5, use_cache: bool = True):
+        # PyMuPDF, pytesseract and PIL are imported on first use, not here
+        self.tesseract_cmd = tesseract_cmd
+        self.max_pages = max_pages
+        self.use_cache = use_cache
+        self._cache = None
+
+    @staticmethod
+    def is_available() -> bool:
+        # Checks that the dependencies are installed without importing them
+        return all(importlib.util.find_spec(name) is not None for name in ("fitz", "pytesseract"))
+
+    def extract_text_from_pdf(self, pdf_path: Path, max_pages: Optional[int] = None, doc=None) -> str:
+        # `doc` is an already open fitz.Document, so callers that read the metadata don't parse the file twice
+        max_pages = self.max_pages if max_pages is None else max_pages
         text = ""
         try:
-            doc = fitz.open(str(pdf_path))
+            if doc is None:
+                import fitz  # PyMuPDF
+                with fitz.open(str(pdf_path)) as pdf:
+                    return self.extract_text_from_pdf(pdf_path, max_pages, pdf)
             for i in range(min(len(doc), max_pages)):
                 text += doc[i].get_text()
-            doc.close()
         except Exception as e:
             logger.error(f"Error extracting text from PDF {pdf_path}: {e}")
         return text.strip()
 
     def extract_text_from_image(self, image_path: Path) -> str:
+        import pytesseract
+        from PIL import Image
+
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
         try:
             image = Image.open(image_path)
             text = pytesseract.image_to_string(image)
@@ -33,10 +51,30 @@ class OCRManager:
             logger.error(f"Error extracting text from image {image_path}: {e}")
             return ""
 
-    def get_document_content(self, file_path: Path) -> str:
+    def get_document_content(self, file_path: Path, pdf=None) -> str:
+        ext = file_path.suffix.lower()
+        if ext not in CACHED_EXTENSIONS or not self.use_cache:
+            return self._extract_content(file_path, pdf)
+
+        # Cached by content hash, so a document is only processed once across runs, wherever it lives
+        from core.hashing import hash_file
+
+        cache = self._get_cache()
+        try:
+            content_hash = hash_file(file_path)
+        except OSError:
+            return self._extract_content(file_path, pdf)
+
+        text = cache.get(content_hash, self.max_pages)
+        if text is None:
+            text = self._extract_content(file_path, pdf)
+            cache.put(content_hash, self.max_pages, text)
+        return text
+
+    def _extract_content(self, file_path: Path, pdf=None) -> str:
         ext = file_path.suffix.lower()
         if ext == ".pdf":
-            return self.extract_text_from_pdf(file_path)
+            return self.extract_text_from_pdf(file_path, doc=pdf)
         elif ext in [".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tiff"]:
             return self.extract_text_from_image(file_path)
         elif ext in [".txt", ".md", ".csv"]:
@@ -46,3 +84,9 @@ class OCRManager:
             except:
                 return ""
         return ""
+
+    def _get_cache(self):
+        if self._cache is None:
+            from core.cache import OCRCache
+            self._cache = OCRCache()
+        return self._cache
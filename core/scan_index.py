@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+from core.cache import _SqliteStore
+
+logger = logging.getLogger(__name__)
+
+# (size, mtime_ns, inode)
+IndexedStat = tuple[int, int, int]
+
+# Paths per SELECT ... IN query, under SQLite's default variable limit
+QUERY_CHUNK_SIZE = 500
+
+
+class ScanIndex(_SqliteStore):
+    """
+    Persistent per-file scan results, so a rescan only re-processes files
+    that are new or whose (size, mtime_ns, inode) changed.
+
+    Rows are keyed by (path, profile); the profile names the scanner settings
+    that shaped the stored metadata (hashing, document metadata, OCR), so
+    scans with different settings never reuse each other's rows. Rows are
+    also indexed by parent directory, so a walk loads one directory at a time.
+    """
+
+    # Bumped when the table layout changes; older tables are dropped, as every row can be rebuilt by a scan
+    SCHEMA_VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scanned_files (
+            path TEXT NOT NULL,
+            profile TEXT NOT NULL,
+            parent TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            metadata TEXT NOT NULL,
+            PRIMARY KEY (profile, path)
+        )
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        super().__init__(db_path, "scan_index.sqlite3", self.SCHEMA)
+
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE scanned_files")
+            self._conn.execute(self.SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scanned_files_parent ON scanned_files (profile, parent)")
+        self._conn.commit()
+
+    def load_directory(self, profile: str, directory: str) -> dict[str, IndexedStat]:
+        # Change-detection fields of the files directly in `directory`
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode FROM scanned_files WHERE profile = ? AND parent = ?",
+                (profile, directory)
+            ).fetchall()
+
+        return {path: (size, mtime_ns, inode) for path, size, mtime_ns, inode in rows}
+
+    def indexed_directories(self, profile: str, directory: Path) -> list[str]:
+        # Every directory at or below `directory` with indexed files
+        root = str(directory)
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT parent FROM scanned_files "
+                "WHERE profile = ? AND (parent = ? OR (parent >= ? AND parent < ?))",
+                (profile, root, prefix, upper)
+            ).fetchall()
+
+        return [parent for parent, in rows]
+
+    def get_metadata_many(self, profile: str, paths: list[str]) -> dict[str, dict]:
+        result = {}
+        for i in range(0, len(paths), QUERY_CHUNK_SIZE):
+            chunk = paths[i:i + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT path, metadata FROM scanned_files WHERE profile = ? AND path IN ({placeholders})",
+                    (profile, *chunk)
+                ).fetchall()
+            result.update((path, json.loads(metadata)) for path, metadata in rows)
+        return result
+
+    def put_many(self, profile: str, items: Iterable[tuple[str, os.stat_result, dict]]) -> None:
+        rows = [
+            (
+                path, profile, os.path.dirname(path),
+                stat.st_size, stat.st_mtime_ns, stat.st_ino, json.dumps(metadata, default=str)
+            )
+            for path, stat, metadata in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scanned_files (path, profile, parent, size, mtime_ns, inode, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def delete_many(self, profile: str, paths: Iterable[str]) -> None:
+        rows = [(profile, path) for path in paths]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany("DELETE FROM scanned_files WHERE profile = ? AND path = ?", rows)
+            self._conn.commit()
+
@@ -1,25 +1,123 @@
 
 import logging
 import os
+import sys
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional, Union
 from datetime import datetime
 
+from core.doc_metadata import DocumentMetadataPool, create_ocr_manager, extract_document_metadata, ocr_available
+from core.hashing import DEFAULT_ALGORITHM, FileHasher, hash_file
+from core.scan_index import IndexedStat, ScanIndex
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
 class FileInfo:
-    path: Path
-    name: str
-    extension: str
-    size_bytes: int
-    created_at: Optional[datetime] = None
-    modified_at: Optional[datetime] = None
-    is_image: bool = False
-    is_document: bool = False
-    metadata: dict = field(default_factory=dict)
+    """
+    One scanned file, kept compact for million-file scans.
+
+    Only the path string, size, raw timestamps, the binary content hash and
+    any extra metadata are stored (in slots). `path`, `name`, the datetimes
+    and the `metadata` dict are materialized on access; `metadata` is a fresh
+    dict on every access, so update the record through `content_hash`.
+    """
+    
+    __slots__ = (
+        "filepath", "extension", "size_bytes", "is_image", "is_document",
+        "_ctime", "_mtime", "_hash", "_extra", "_path"
+    )
+    
+    # Metadata keys rebuilt from slots rather than stored per file
+    _DERIVED_KEYS = frozenset({"extension", "size_bytes", "hash"})
+    
+    def __init__(
+        self,
+        filepath: Union[str, os.PathLike, None] = None,
+        name: Optional[str] = None,
+        extension: str = "",
+        size_bytes: int = 0,
+        created_at: Union[datetime, float, None] = None,
+        modified_at: Union[datetime, float, None] = None,
+        is_image: bool = False,
+        is_document: bool = False,
+        metadata: Optional[dict] = None,
+        path: Optional[Path] = None
+    ):
+        # `path` (the dataclass field this replaced) and `name` are accepted for compatibility;
+        # name is always derived from the path
+        if filepath is None:
+            if path is None:
+                raise TypeError("FileInfo() needs a filepath or path")
+            filepath = path
+        self.filepath = os.fspath(filepath)
+        self.extension = sys.intern(extension)
+        self.size_bytes = size_bytes
+        self.is_image = is_image
+        self.is_document = is_document
+        self._ctime = created_at.timestamp() if isinstance(created_at, datetime) else created_at
+        self._mtime = modified_at.timestamp() if isinstance(modified_at, datetime) else modified_at
+        self._hash: Union[bytes, str, None] = None
+        self._extra: Optional[dict] = None
+        self._path: Optional[Path] = filepath if isinstance(filepath, Path) else None
+        
+        if metadata:
+            extra = {k: v for k, v in metadata.items() if k not in self._DERIVED_KEYS}
+            self.content_hash = metadata.get("hash", "")
+            self._extra = extra or None
+    
+    @property
+    def path(self) -> Path:
+        # Built on first use; parsing a Path per file dominates large scans otherwise
+        if self._path is None:
+            self._path = Path(self.filepath)
+        return self._path
+    
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.filepath)
+    
+    @property
+    def created_at(self) -> Optional[datetime]:
+        return self._to_datetime(self._ctime)
+    
+    @property
+    def modified_at(self) -> Optional[datetime]:
+        return self._to_datetime(self._mtime)
+    
+    @property
+    def mtime(self) -> Optional[float]:
+        # Raw modification timestamp, for change detection without building a datetime
+        return self._mtime
+    
+    @property
+    def content_hash(self) -> str:
+        if isinstance(self._hash, bytes):
+            return self._hash.hex()
+        return self._hash or ""
+    
+    @content_hash.setter
+    def content_hash(self, value: str) -> None:
+        # Lowercase hex digests are packed to bytes; anything else is kept as given, so it reads back unchanged
+        try:
+            packed = bytes.fromhex(value) if value else None
+        except ValueError:
+            packed = None
+        self._hash = packed if packed is not None and packed.hex() == value else (value or None)
+    
+    @property
+    def metadata(self) -> dict:
+        metadata = {"extension": self.extension, "size_bytes": self.size_bytes, "hash": self.content_hash}
+        if self._extra:
+            metadata.update(self._extra)
+        return metadata
+    
+    def update_metadata(self, values: dict) -> None:
+        extra = {k: v for k, v in values.items() if k not in self._DERIVED_KEYS}
+        if extra:
+            self._extra = {**(self._extra or {}), **extra}
     
     @property
     def size_human(self) -> str:
@@ -29,6 +127,27 @@ class FileInfo:
                 return f"{size:.1f} {unit}"
             size /= 1024
         return f"{size:.1f} TB"
+    
+    @staticmethod
+    def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+        if timestamp is None:
+            return None
+        try:
+            return datetime.fromtimestamp(timestamp)
+        except (OSError, OverflowError, ValueError):
+            return None
+    
+    def __repr__(self) -> str:
+        return f"FileInfo({self.filepath!r}, size_bytes={self.size_bytes})"
+
+
+@dataclass
+class ScanDelta:
+    # Changes since the previous indexed scan (only filled in when the scanner has a ScanIndex)
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    unchanged_count: int = 0
 
 
 @dataclass
@@ -40,8 +159,10 @@ class ScanResult:
     other_files: list[FileInfo]
     errors: list[tuple[Path, str]]
     scan_time_seconds: float
+    delta: ScanDelta = field(default_factory=ScanDelta)
+    ocr_time_seconds: float = 0.0
     
-    @property
+    @cached_property
     def all_files(self) -> list[FileInfo]:
         return self.images + self.documents + self.other_files
 
@@ -72,95 +193,83 @@ class FileScanner:
         "Local Settings", "Application Data"
     }
     
-    def __init__(self, recursive: bool = False, include_hidden: bool = False, use_ocr: bool = True, calculate_hash: bool = True, fast_mode: bool = False):
+    # Files at or above this size are not hashed
+    MAX_HASH_BYTES = 100 * 1024 * 1024
+    
+    # Files hashed and written to the scan index together by iter_scan
+    PIPELINE_BATCH_SIZE = 256
+    
+    def __init__(
+        self,
+        recursive: bool = False,
+        include_hidden: bool = False,
+        use_ocr: bool = True,
+        ocr_cache: bool = True,
+        calculate_hash: bool = True,
+        fast_mode: bool = False,
+        hash_algorithm: str = DEFAULT_ALGORITHM,
+        hash_workers: Optional[int] = None,
+        index: Optional[ScanIndex] = None,
+        metadata_workers: Optional[int] = None,
+        metadata_timeout: float = 30.0
+    ):
     
         self.recursive = recursive
         self.include_hidden = include_hidden
-        self.use_ocr = use_ocr
         self.calculate_hash = calculate_hash
         self.fast_mode = fast_mode
-        self.ocr = None
-        if use_ocr:
-            try:
-                from core.ocr import OCRManager
-                self.ocr = OCRManager()
-            except ImportError:
-                logger.warning("OCRManager dependencies not met, disabling OCR")
-                self.use_ocr = False
+        self.hasher = FileHasher(algorithm=hash_algorithm, num_workers=hash_workers)
+        self.index = index
+        # Document metadata is extracted in worker processes; 0 extracts inline, without a time limit
+        self.metadata_workers = metadata_workers
+        self.metadata_timeout = metadata_timeout
+        self.use_ocr = use_ocr and ocr_available()
+        self.ocr_cache = ocr_cache
+        self._ocr = None
+        # Total time spent in OCR during the last scan
+        self.ocr_time_seconds = 0.0
     
-    def scan(self, directory: Path) -> ScanResult:
+    def scan(self, directory: Path, on_file: Optional[Callable[[FileInfo], None]] = None) -> ScanResult:
       
         import time
         start_time = time.time()
         
-        directory = Path(directory).resolve()
-        
-        if not directory.exists():
-            raise ValueError(f"Directory does not exist: {directory}")
-        
-        if not directory.is_dir():
-            raise ValueError(f"Path is not a directory: {directory}")
-        
-        if not os.access(directory, os.R_OK):
-            raise PermissionError(f"Cannot read directory: {directory}")
-        
-        logger.info(f"Scanning directory: {directory}")
-        
         images: list[FileInfo] = []
         documents: list[FileInfo] = []
         other_files: list[FileInfo] = []
         errors: list[tuple[Path, str]] = []
+        delta = ScanDelta()
         
-        files_to_scan = []
-        if self.recursive:
-            for root, dirs, files in os.walk(directory):
-                # Filter excluded directories in-place to prevent os.walk from entering them
-                dirs[:] = [d for d in dirs if d not in self.EXCLUDE_DIRS and (self.include_hidden or not d.startswith("."))]
-                for file in files:
-                    if not self.include_hidden and file.startswith("."):
-                        continue
-                    files_to_scan.append(Path(root) / file)
-        else:
-            for item in directory.iterdir():
-                if item.is_file():
-                    if not self.include_hidden and item.name.startswith("."):
-                        continue
-                    files_to_scan.append(item)
-
-        for file_path in files_to_scan:
-            try:
-                file_info = self._get_file_info(file_path)
-                
-                if file_info.is_image:
-                    images.append(file_info)
-                elif file_info.is_document:
-                    documents.append(file_info)
-                else:
-                    other_files.append(file_info)
-                    
-            except PermissionError as e:
-                logger.warning(f"Permission denied: {file_path}")
-                errors.append((file_path, f"Permission denied: {e}"))
-            except Exception as e:
-                logger.warning(f"Error scanning {file_path}: {e}")
-                errors.append((file_path, str(e)))
+        for file_info in self.iter_scan(directory, errors, delta):
+            if file_info.is_image:
+                images.append(file_info)
+            elif file_info.is_document:
+                documents.append(file_info)
+            else:
+                other_files.append(file_info)
+            
+            if on_file is not None:
+                on_file(file_info)
         
         scan_time = time.time() - start_time
         
         result = ScanResult(
-            directory=directory,
+            directory=Path(directory).resolve(),
             total_files=len(images) + len(documents) + len(other_files),
             images=images,
             documents=documents,
             other_files=other_files,
             errors=errors,
-            scan_time_seconds=scan_time
+            scan_time_seconds=scan_time,
+            delta=delta,
+            ocr_time_seconds=self.ocr_time_seconds
         )
         
         logger.info(
             f"Scan complete: {result.total_files} files "
             f"({len(images)} images, {len(documents)} documents, {len(other_files)} other) "
             f"in {scan_time:.2f}s"
+            + (f" ({self.ocr_time_seconds:.2f}s in OCR)" if self.ocr_time_seconds else "")
         )
         
         if errors:
@@ -168,124 +277,295 @@ class FileScanner:
         
         return result
     
-    def _calculate_hash(self, file_path: Path, block_size: int = 65536) -> str:
-        import hashlib
-        sha256 = hashlib.sha256()
+    def iter_scan(
+        self,
+        directory: Path,
+        errors: Optional[list[tuple[Path, str]]] = None,
+        delta: Optional[ScanDelta] = None
+    ) -> Iterator[FileInfo]:
+        # Yields files in walk order as they are scanned; unreadable files are appended to `errors`.
+        # Hashing and index writes happen per PIPELINE_BATCH_SIZE files, and index rows are loaded one
+        # directory at a time as the walk reaches it, so memory does not grow with the tree.
+        directory = Path(directory).resolve()
+        
+        if not directory.exists():
+            raise ValueError(f"Directory does not exist: {directory}")
+        
+        if not directory.is_dir():
+            raise ValueError(f"Path is not a directory: {directory}")
+        
+        if not os.access(directory, os.R_OK):
+            raise PermissionError(f"Cannot read directory: {directory}")
+        
+        logger.info(f"Scanning directory: {directory}")
+        
+        errors = errors if errors is not None else []
+        delta = delta if delta is not None else ScanDelta()
+        self.ocr_time_seconds = 0.0
+        
+        profile = self._index_profile()
+        # Index rows of the directory being walked; the walk yields the files of a directory together
+        current_dir: Optional[str] = None
+        indexed: dict[str, IndexedStat] = {}
+        visited: set[str] = set()
+        use_pool = not self.fast_mode and self.metadata_workers != 0
+        pool: Optional[DocumentMetadataPool] = None
+        # Files waiting for document metadata, hashing or index writes, in walk order:
+        # (file, stat to store or None when unchanged, whether its metadata is being extracted)
+        batch: list[tuple[FileInfo, Optional[os.stat_result], bool]] = []
+        
+        try:
+            for entry in self._iter_file_entries(directory, errors):
+                if self.index and os.path.dirname(entry.path) != current_dir:
+                    # Files of the previous directory the walk did not find are gone
+                    self._delete_unseen(profile, directory, indexed, errors, delta)
+                    current_dir = os.path.dirname(entry.path)
+                    visited.add(current_dir)
+                    indexed = self.index.load_directory(profile, current_dir)
+                
+                try:
+                    # DirEntry caches the stat result; it is the only stat call for this file
+                    stat = entry.stat()
+                    deferred = False
+                    
+                    previous = indexed.pop(entry.path, None)
+                    if previous == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+                        # Stored metadata is filled in when the batch is flushed
+                        file_info = self._get_file_info(entry.path, stat, entry.name, metadata={})
+                        delta.unchanged_count += 1
+                        stat = None
+                    else:
+                        file_info = self._get_file_info(entry.path, stat, entry.name, extract_documents=not use_pool)
+                        if self.index:
+                            (delta.added if previous is None else delta.modified).append(entry.path)
+                        
+                        if use_pool and file_info.is_document:
+                            # Extracted by the pool while the walk goes on; collected when the batch is flushed
+                            if pool is None:
+                                pool = DocumentMetadataPool(
+                                    self.metadata_workers, self.metadata_timeout, self.use_ocr, self.ocr_cache
+                                )
+                            pool.submit(entry.path)
+                            deferred = True
+                        
+                except PermissionError as e:
+                    logger.warning(f"Permission denied: {entry.path}")
+                    errors.append((Path(entry.path), f"Permission denied: {e}"))
+                    continue
+                except Exception as e:
+                    logger.warning(f"Error scanning {entry.path}: {e}")
+                    errors.append((Path(entry.path), str(e)))
+                    continue
+                
+                if not batch and not deferred and not self.calculate_hash and not self.index:
+                    yield file_info
+                    continue
+                
+                batch.append((file_info, stat, deferred))
+                if len(batch) >= self.PIPELINE_BATCH_SIZE:
+                    yield from self._flush_batch(profile, batch, pool, errors)
+                    batch = []
+            
+            yield from self._flush_batch(profile, batch, pool, errors)
+        finally:
+            if pool is not None:
+                pool.close()
+        
+        if self.index:
+            self._delete_unseen(profile, directory, indexed, errors, delta)
+            # Directories the walk found no files in: emptied or removed since the last scan
+            for parent in self.index.indexed_directories(profile, directory):
+                if parent not in visited:
+                    self._delete_unseen(profile, directory, self.index.load_directory(profile, parent), errors, delta)
+            logger.info(
+                f"Scan index: {len(delta.added)} new, {len(delta.modified)} changed, "
+                f"{len(delta.deleted)} deleted, {delta.unchanged_count} unchanged"
+            )
+    
+    def _flush_batch(
+        self,
+        profile: str,
+        batch: list[tuple[FileInfo, Optional[os.stat_result], bool]],
+        pool: Optional[DocumentMetadataPool],
+        errors: list[tuple[Path, str]]
+    ) -> list[FileInfo]:
+        # Only new or changed files (those with a stat to store) need hashing and indexing
+        fresh: list[tuple[FileInfo, os.stat_result]] = []
+        failed: set[str] = set()
+        
+        deferred = [file_info.filepath for file_info, _, is_deferred in batch if is_deferred]
+        results = pool.collect(deferred) if deferred else {}
+        
+        unchanged = [file_info.filepath for file_info, stat, _ in batch if stat is None]
+        stored = self.index.get_metadata_many(profile, unchanged) if unchanged else {}
+        
+        for file_info, stat, is_deferred in batch:
+            if stat is None:
+                metadata = stored.get(file_info.filepath, {})
+                file_info.content_hash = metadata.get("hash", "")
+                file_info.update_metadata(metadata)
+            if is_deferred:
+                result = results[file_info.filepath]
+                if isinstance(result, str):
+                    errors.append((file_info.path, result))
+                    failed.add(file_info.filepath)
+                else:
+                    metadata, ocr_seconds = result
+                    file_info.update_metadata(metadata)
+                    self.ocr_time_seconds += ocr_seconds
+            if stat is not None:
+                fresh.append((file_info, stat))
+        
+        if self.calculate_hash:
+            self._fill_hashes([file_info for file_info, _ in fresh])
+        
+        if self.index:
+            # Files whose extraction timed out or crashed are left out so the next scan retries them
+            self.index.put_many(profile, ((f.filepath, stat, f.metadata) for f, stat in fresh if f.filepath not in failed))
+        
+        return [file_info for file_info, _, _ in batch]
+    
+    def _iter_file_entries(self, directory: Path, errors: list[tuple[Path, str]]) -> Iterator[os.DirEntry]:
+        # Same order as os.walk (top-down, files of a directory before its subdirectories),
+        # but file/dir checks use the type information scandir already returned
+        pending = [str(directory)]
+        while pending:
+            current = pending.pop()
+            subdirs = []
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not self.include_hidden and entry.name.startswith("."):
+                            continue
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if self.recursive and entry.name not in self.EXCLUDE_DIRS:
+                                    subdirs.append(entry.path)
+                            elif entry.is_file():
+                                yield entry
+                            elif entry.is_symlink() and not os.path.exists(entry.path):
+                                logger.warning(f"Broken symlink: {entry.path}")
+                                errors.append((Path(entry.path), "Broken symlink"))
+                            else:
+                                logger.debug(f"Skipping {entry.path}: not a regular file")
+                        except OSError as e:
+                            logger.warning(f"Error scanning {entry.path}: {e}")
+                            errors.append((Path(entry.path), str(e)))
+            except OSError as e:
+                if current == str(directory):
+                    raise
+                logger.warning(f"Cannot read directory {current}: {e}")
+                errors.append((Path(current), str(e)))
+                continue
+            
+            pending.extend(reversed(subdirs))
+    
+    def _index_profile(self) -> str:
+        # Everything that changes what _get_file_info stores in metadata
+        hashing = self.hasher.algorithm if self.calculate_hash else "nohash"
+        extraction = "fast" if self.fast_mode else ("ocr" if self.use_ocr else "meta")
+        return f"{hashing}:{extraction}"
+    
+    def _delete_unseen(
+        self,
+        profile: str,
+        directory: Path,
+        unseen: Iterable[str],
+        errors: list[tuple[Path, str]],
+        delta: ScanDelta
+    ) -> None:
+        deleted = self._find_deleted(directory, unseen, errors)
+        self.index.delete_many(profile, deleted)
+        delta.deleted.extend(deleted)
+    
+    def _find_deleted(
+        self,
+        directory: Path,
+        unseen: Iterable[str],
+        errors: list[tuple[Path, str]]
+    ) -> list[str]:
+        # Indexed files this walk would have visited but did not find
+        root = str(directory)
+        unreadable = tuple(str(path) + os.sep for path, _ in errors)
+        deleted = []
+        for path in unseen:
+            parts = os.path.relpath(path, root).split(os.sep)
+            dirs = parts[:-1]
+            if dirs and not self.recursive:
+                continue
+            if any(d in self.EXCLUDE_DIRS for d in dirs):
+                continue
+            if not self.include_hidden and any(part.startswith(".") for part in parts):
+                continue
+            if unreadable and path.startswith(unreadable):
+                continue
+            deleted.append(path)
+        return deleted
+    
+    def _calculate_hash(self, file_path: Path) -> str:
         try:
-            with open(file_path, 'rb') as f:
-                for block in iter(lambda: f.read(block_size), b''):
-                    sha256.update(block)
-            return sha256.hexdigest()
+            return hash_file(file_path, self.hasher.algorithm, block_size=self.hasher.block_size)
         except Exception as e:
             logger.debug(f"Could not calculate hash for {file_path}: {e}")
             return ""
 
-    def _get_file_info(self, file_path: Path) -> FileInfo:
+    def _fill_hashes(self, files: list[FileInfo]) -> None:
+        # Hashed on the hasher's worker pool once the walk is done
+        hashable = [f for f in files if f.size_bytes < self.MAX_HASH_BYTES]
+        digests = self.hasher.hash_files(f.filepath for f in hashable)
+        for file_info in hashable:
+            file_info.content_hash = digests.get(file_info.filepath, "")
+
+    def _get_file_info(
+        self,
+        file_path: Union[str, Path],
+        stat: Optional[os.stat_result] = None,
+        name: Optional[str] = None,
+        metadata: Optional[dict] = None,
+        extract_documents: bool = True
+    ) -> FileInfo:
     
-        stat = file_path.stat()
-        extension = file_path.suffix.lower()
+        if stat is None:
+            stat = os.stat(file_path)
+        name = name or os.path.basename(file_path)
+        extension = os.path.splitext(name)[1].lower()
+        if extension == ".":
+            extension = ""
         
         is_image = extension in self.IMAGE_EXTENSIONS
         is_document = extension in self.DOCUMENT_EXTENSIONS
         
-        try:
-            created_at = datetime.fromtimestamp(stat.st_ctime)
-            modified_at = datetime.fromtimestamp(stat.st_mtime)
-        except (OSError, OverflowError):
-            created_at = None
-            modified_at = None
-        
-        metadata = {
-            "extension": extension,
-            "size_bytes": stat.st_size,
-            "hash": self._calculate_hash(file_path) if self.calculate_hash and stat.st_size < 100 * 1024 * 1024 else "" # Hash only files < 100MB for speed
-        }
-        
-        if extension in self.VIDEO_EXTENSIONS:
-            metadata["type"] = "video"
-        elif extension in self.AUDIO_EXTENSIONS:
-            metadata["type"] = "audio"
-        elif extension in self.ARCHIVE_EXTENSIONS:
-            metadata["type"] = "archive"
-        
-        if is_document and not self.fast_mode:
-            doc_meta = self.get_document_metadata(file_path)
-            metadata.update(doc_meta)
+        # Metadata stored by the scan index for an unchanged file is reused as is.
+        # extension, size_bytes and hash are FileInfo fields; only extra keys are collected here,
+        # the hash is filled in by iter_scan() for files < MAX_HASH_BYTES when calculate_hash is on
+        if metadata is None:
+            metadata = {}
+            
+            if extension in self.VIDEO_EXTENSIONS:
+                metadata["type"] = "video"
+            elif extension in self.AUDIO_EXTENSIONS:
+                metadata["type"] = "audio"
+            elif extension in self.ARCHIVE_EXTENSIONS:
+                metadata["type"] = "archive"
+            
+            if is_document and not self.fast_mode and extract_documents:
+                doc_meta = self.get_document_metadata(Path(file_path))
+                metadata.update(doc_meta)
             
         return FileInfo(
-            path=file_path,
-            name=file_path.name,
+            filepath=os.fspath(file_path),
             extension=extension,
             size_bytes=stat.st_size,
-            created_at=created_at,
-            modified_at=modified_at,
+            created_at=stat.st_ctime,
+            modified_at=stat.st_mtime,
             is_image=is_image,
             is_document=is_document,
             metadata=metadata
         )
     
     def get_document_metadata(self, file_path: Path) -> dict:
- 
-        metadata = {}
-        extension = file_path.suffix.lower()
-        
-        try:
-            if extension == ".pdf":
-                metadata = self._get_pdf_metadata(file_path)
-            elif extension in {".doc", ".docx"}:
-                metadata = self._get_docx_metadata(file_path)
-        except Exception as e:
-            logger.debug(f"Could not extract metadata from {file_path}: {e}")
-        
-        if self.use_ocr and not metadata.get("title") and self.ocr:
-            content = self.ocr.get_document_content(file_path)
-            if content:
-                metadata["ocr_content"] = content[:1000] 
-                if not metadata.get("title"):
-                    first_line = content.split('\n')[0].strip()
-                    if 3 < len(first_line) < 50:
-                        metadata["title"] = first_line
-
+        if self.use_ocr and self._ocr is None:
+            self._ocr = create_ocr_manager(self.ocr_cache)
+        metadata, ocr_seconds = extract_document_metadata(file_path, self._ocr if self.use_ocr else None)
+        self.ocr_time_seconds += ocr_seconds
         return metadata
-    
-    def _get_pdf_metadata(self, file_path: Path) -> dict:
-        try:
-            from pypdf import PdfReader
-            
-            reader = PdfReader(file_path)
-            meta = reader.metadata or {}
-            
-            return {
-                "title": meta.get("/Title", ""),
-                "author": meta.get("/Author", ""),
-                "subject": meta.get("/Subject", ""),
-                "pages": len(reader.pages),
-                "creator": meta.get("/Creator", ""),
-            }
-        except ImportError:
-            logger.debug("pypdf not installed, skipping PDF metadata extraction")
-            return {}
-        except Exception as e:
-            logger.debug(f"PDF metadata extraction failed: {e}")
-            return {}
-    
-    def _get_docx_metadata(self, file_path: Path) -> dict:
-        try:
-            from docx import Document
-            
-            doc = Document(file_path)
-            props = doc.core_properties
-            
-            return {
-                "title": props.title or "",
-                "author": props.author or "",
-                "subject": props.subject or "",
-                "keywords": props.keywords or "",
-                "created": str(props.created) if props.created else "",
-            }
-        except ImportError:
-            logger.debug("python-docx not installed, skipping DOCX metadata extraction")
-            return {}
-        except Exception as e:
-            logger.debug(f"DOCX metadata extraction failed: {e}")
-            return {}
@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TextIO
+
+from core.inference import ClipInference
+
+logger = logging.getLogger(__name__)
+
+Notify = Callable[[str, dict], None]
+Handler = Callable[[dict, Notify], Any]
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+def detach_stdin() -> TextIO:
+    # Returns a private reader on the request pipe and points fd 0 and sys.stdin at os.devnull.
+    # multiprocessing closes sys.stdin in every forked child, which blocks on the buffer lock the
+    # read loop holds while it waits for the next request; workers forked by a request would hang.
+    requests = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    sys.stdin = open(os.devnull, encoding="utf-8")
+    return requests
+
+
+class EngineServer:
+    """
+    Newline-delimited JSON-RPC 2.0 server that keeps one ClipInference resident.
+
+    Every request line is dispatched to a worker thread, so several requests
+    (from one pipe or several TCP clients) can be in flight at once. The model
+    is unloaded after `idle_timeout` seconds without requests and loaded again
+    lazily by the next request that needs it.
+    """
+
+    def __init__(self, inference: ClipInference, idle_timeout: float = 300.0, max_workers: int = 4):
+        self.inference = inference
+        self.idle_timeout = idle_timeout
+        self.max_workers = max_workers
+
+        self._handlers: dict[str, Handler] = {
+            "ping": lambda params, notify: {"status": "ok", "model_loaded": self.inference.is_model_loaded()},
+        }
+        # Params each method must be given, checked before its handler runs
+        self._required: dict[str, tuple[str, ...]] = {}
+        self._activity_lock = threading.Lock()
+        self._active_requests = 0
+        self._last_activity = time.monotonic()
+        self._shutdown = threading.Event()
+
+    def register(self, method: str, handler: Handler, required: tuple[str, ...] = ()) -> None:
+        self._handlers[method] = handler
+        self._required[method] = required
+
+    def handle_request(self, request: Any, send: Callable[[dict], None]) -> None:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            send(self._error(None, INVALID_REQUEST, "Invalid request"))
+            return
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+
+        handler = self._handlers.get(method)
+        if handler is None:
+            if request_id is not None:
+                send(self._error(request_id, METHOD_NOT_FOUND, f"Unknown method: {method}"))
+            return
+
+        if not isinstance(params, dict):
+            problem = "params must be an object"
+        else:
+            missing = [name for name in self._required.get(method, ()) if name not in params]
+            problem = f"missing {', '.join(missing)}" if missing else None
+        if problem is not None:
+            if request_id is not None:
+                send(self._error(request_id, INVALID_PARAMS, f"Invalid params for {method}: {problem}"))
+            return
+
+        def notify(name: str, data: dict) -> None:
+            send({"jsonrpc": "2.0", "method": name, "params": {"request_id": request_id, **data}})
+
+        self._begin_request()
+        try:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": handler(params, notify)}
+        except Exception as e:
+            logger.exception(f"Error handling {method}")
+            response = self._error(request_id, SERVER_ERROR, str(e))
+        finally:
+            self._end_request()
+
+        if request_id is not None:
+            send(response)
+
+    def serve_stdio(self, stdin: TextIO, stdout: TextIO) -> None:
+        write_lock = threading.Lock()
+
+        def send(message: dict) -> None:
+            with write_lock:
+                stdout.write(json.dumps(message) + "\n")
+                stdout.flush()
+
+        self._start_idle_watchdog()
+        send({"jsonrpc": "2.0", "method": "ready", "params": {"transport": "stdio"}})
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for line in stdin:
+                self._dispatch_line(line, send, executor)
+                if self._shutdown.is_set():
+                    break
+
+        self._shutdown.set()
+
+    def serve_tcp(self, host: str, port: int, ready_stream: Optional[TextIO] = None) -> None:
+        server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                write_lock = threading.Lock()
+
+                def send(message: dict) -> None:
+                    with write_lock:
+                        try:
+                            self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+                            self.wfile.flush()
+                        except OSError:
+                            logger.debug("Client disconnected before response was sent")
+
+                with ThreadPoolExecutor(max_workers=server.max_workers) as executor:
+                    for raw_line in self.rfile:
+                        server._dispatch_line(raw_line.decode("utf-8", errors="replace"), send, executor)
+                        if server._shutdown.is_set():
+                            break
+
+        class ThreadingServer(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        with ThreadingServer((host, port), RequestHandler) as tcp_server:
+            bound_host, bound_port = tcp_server.server_address[:2]
+            logger.info(f"Engine server listening on {bound_host}:{bound_port}")
+
+            if ready_stream is not None:
+                ready_stream.write(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "ready",
+                    "params": {"transport": "tcp", "host": bound_host, "port": bound_port}
+                }) + "\n")
+                ready_stream.flush()
+
+            self._start_idle_watchdog()
+            threading.Thread(
+                target=lambda: (self._shutdown.wait(), tcp_server.shutdown()),
+                daemon=True
+            ).start()
+            tcp_server.serve_forever()
+
+    def _dispatch_line(self, line: str, send: Callable[[dict], None], executor: ThreadPoolExecutor) -> None:
+        if not line.strip():
+            return
+
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            send(self._error(None, PARSE_ERROR, f"Parse error: {e}"))
+            return
+
+        # Shutdown is answered inline so the read loop can stop right after it
+        if isinstance(request, dict) and request.get("method") == "shutdown":
+            self._shutdown.set()
+            if request.get("id") is not None:
+                send({"jsonrpc": "2.0", "id": request["id"], "result": {"status": "shutting down"}})
+            return
+
+        executor.submit(self.handle_request, request, send)
+
+    def _begin_request(self) -> None:
+        with self._activity_lock:
+            self._active_requests += 1
+            self._last_activity = time.monotonic()
+
+    def _end_request(self) -> None:
+        with self._activity_lock:
+            self._active_requests -= 1
+            self._last_activity = time.monotonic()
+
+    def _start_idle_watchdog(self) -> None:
+        if self.idle_timeout <= 0:
+            return
+
+        def watch():
+            interval = min(self.idle_timeout, 5.0)
+            while not self._shutdown.wait(interval):
+                with self._activity_lock:
+                    idle_for = time.monotonic() - self._last_activity
+                    if self._active_requests == 0 and idle_for >= self.idle_timeout and self.inference.is_model_loaded():
+                        logger.info(f"Engine idle for {idle_for:.0f}s, unloading CLIP model")
+                        self.inference.unload_model()
+
+        threading.Thread(target=watch, name="engine-idle-watchdog", daemon=True).start()
+
+    @staticmethod
+    def _error(request_id: Any, code: int, message: str) -> dict:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from core.workers import WorkerProcess
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from core.image_loader import CostFn
+    from core.inference import ClipInference
+
+logger = logging.getLogger(__name__)
+
+# torch gains little from more intra-op threads than this at batch sizes of 8-16
+THREADS_PER_SHARD = 4
+
+# (batch paths, successfully loaded paths, their normalized embeddings or None when none loaded)
+EncodedBatch = tuple[list[Path], list[Path], Optional["np.ndarray"]]
+
+
+@dataclass(frozen=True)
+class ShardPlan:
+    workers: int
+    threads_per_worker: int
+
+    def __str__(self) -> str:
+        return f"{self.workers} workers x {self.threads_per_worker} threads"
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def fork_supported() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def plan_shards(
+    workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    cpus: Optional[int] = None
+) -> ShardPlan:
+    # Splits the cores between workers. Without a worker count, each worker gets THREADS_PER_SHARD
+    # threads; without a thread count, the cores are divided evenly between the workers.
+    cpus = cpus or available_cpus()
+    if not workers or workers < 0:
+        threads = max(1, threads_per_worker or min(THREADS_PER_SHARD, cpus))
+        return ShardPlan(max(1, cpus // threads), threads)
+    return ShardPlan(workers, max(1, threads_per_worker or cpus // workers))
+
+
+def candidate_plans(cpus: Optional[int] = None) -> list[ShardPlan]:
+    # Every split of the cores into workers x threads with a power-of-two thread count
+    cpus = cpus or available_cpus()
+    plans = []
+    threads = 1
+    while threads <= cpus:
+        plans.append(ShardPlan(cpus // threads, threads))
+        threads *= 2
+    return plans
+
+
+def tune_shards(
+    inference: ClipInference,
+    sample_paths: list[Path],
+    batch_size: int = 16,
+    plans: Optional[list[ShardPlan]] = None
+) -> list[tuple[ShardPlan, float]]:
+    # Encodes the sample once per plan and returns (plan, images/sec) pairs, fastest first.
+    # The embedding cache is bypassed, so every plan does the same decode + encode work.
+    inference.load_model()
+    measured = []
+    for plan in plans or candidate_plans():
+        pool = ShardPool(inference, plan)
+        try:
+            pool.start()
+            start = time.perf_counter()
+            for _ in pool.iter_batches(sample_paths, batch_size):
+                pass
+            measured.append((plan, len(sample_paths) / (time.perf_counter() - start)))
+        finally:
+            pool.close()
+        logger.debug(f"Shard plan {plan}: {measured[-1][1]:.1f} images/s")
+    return sorted(measured, key=lambda item: -item[1])
+
+
+def _shard_main(conn, inference: ClipInference, threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+    # Batch sizes are chosen by the parent; a tuner copied into the fork would measure and save on its own
+    inference.batch_tuner = None
+    while True:
+        try:
+            batch_paths = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if batch_paths is None:
+            return
+
+        try:
+            conn.send(inference._encode_paths(batch_paths))
+        except Exception as e:
+            conn.send(f"Inference shard failed: {e}")
+
+
+class _Shard(WorkerProcess):
+    def __init__(self, context, inference: ClipInference, threads: int):
+        # Forked, not spawned: the child starts with the parent's loaded model and never pickles it
+        super().__init__(context, _shard_main, (inference, threads))
+        # Indices of the batches sent to this worker, oldest first
+        self.in_flight: deque[int] = deque()
+        # When a busy worker that has not replied since is considered stuck
+        self.deadline = 0.0
+
+
+class ShardPool:
+    """
+    Encodes images on forked copies of a loaded ClipInference, for CPU hosts
+    where one process cannot keep every core busy.
+
+    Workers are forked once the model is loaded, so they share its weights
+    copy-on-write instead of each loading a copy. Each worker decodes and
+    encodes whole batches with `threads_per_worker` torch threads. Batches go
+    to whichever worker has room and are merged back in input order.
+
+    Given a cost function, the decode budget of the inference's image loader
+    applies as well: a worker decodes one image at a time, so a batch costs
+    its largest image, and batches are only sent while the ones in flight
+    stay within `memory_budget * prefetch_batches`. A worker
+    that dies, or sends nothing for `timeout` seconds while busy, fails the
+    iteration with a RuntimeError and the pool is closed.
+    """
+
+    # Batches queued per worker, so a worker never waits on the parent between two batches
+    BATCHES_PER_WORKER = 2
+
+    def __init__(self, inference: ClipInference, plan: ShardPlan, timeout: float = 300.0):
+        self.inference = inference
+        self.plan = plan
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("fork")
+        self._shards: list[_Shard] = []
+
+    def start(self) -> None:
+        if self._shards:
+            return
+        for _ in range(self.plan.workers):
+            self._shards.append(_Shard(self._context, self.inference, self.plan.threads_per_worker))
+        logger.info(f"Started {self.plan} for CPU inference")
+
+    def iter_batches(
+        self,
+        image_paths: list[Path],
+        batch_size: int,
+        cost_fn: Optional[CostFn] = None
+    ) -> Iterator[EncodedBatch]:
+        batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+        if not batches:
+            return
+
+        self.start()
+        loader = self.inference.image_loader
+        max_in_flight_cost = (loader.memory_budget or 0) * loader.prefetch_batches if cost_fn else 0
+        costs: dict[int, int] = {}
+        in_flight_cost = 0
+        results: dict[int, tuple[list[Path], Optional[np.ndarray]]] = {}
+        next_batch = 0
+        next_result = 0
+
+        def fits(index: int) -> bool:
+            # An image over the whole allowance is still sent, once nothing else is decoding
+            if not max_in_flight_cost:
+                return True
+            if index not in costs:
+                costs[index] = max(map(cost_fn, batches[index]))
+            return not in_flight_cost or in_flight_cost + costs[index] <= max_in_flight_cost
+
+        try:
+            while next_result < len(batches):
+                for shard in self._shards:
+                    while (
+                        len(shard.in_flight) < self.BATCHES_PER_WORKER
+                        and next_batch < len(batches)
+                        and fits(next_batch)
+                    ):
+                        if not shard.in_flight:
+                            shard.deadline = time.monotonic() + self.timeout
+                        self._send(shard, batches[next_batch])
+                        shard.in_flight.append(next_batch)
+                        in_flight_cost += costs.get(next_batch, 0)
+                        next_batch += 1
+
+                for shard in self._wait_ready():
+                    index = shard.in_flight.popleft()
+                    results[index] = self._receive(shard)
+                    in_flight_cost -= costs.pop(index, 0)
+
+                while next_result in results:
+                    loaded_paths, features = results.pop(next_result)
+                    yield batches[next_result], loaded_paths, features
+                    next_result += 1
+        finally:
+            # An abandoned iteration leaves replies in the pipes; read them so the next one starts clean
+            try:
+                while any(shard.in_flight for shard in self._shards):
+                    for shard in self._wait_ready():
+                        shard.in_flight.popleft()
+                        self._receive(shard)
+            except RuntimeError:
+                pass
+
+    def close(self) -> None:
+        for shard in self._shards:
+            shard.stop(kill=bool(shard.in_flight))
+        self._shards = []
+
+    def _send(self, shard: _Shard, batch_paths: list[Path]) -> None:
+        try:
+            shard.send(batch_paths)
+        except OSError:
+            self._fail(f"Inference shard crashed (exit code {shard.exitcode})")
+
+    def _wait_ready(self) -> list[_Shard]:
+        # Busy workers with a reply to read; wakes up at the nearest deadline to check for stuck or dead ones
+        busy = [shard for shard in self._shards if shard.in_flight]
+        wait_for = max(0.0, min(shard.deadline for shard in busy) - time.monotonic())
+        ready = wait([shard.conn for shard in busy], timeout=min(wait_for, 5.0))
+
+        now = time.monotonic()
+        for shard in busy:
+            if shard.conn in ready:
+                continue
+            if not shard.is_alive():
+                self._fail(f"Inference shard crashed (exit code {shard.exitcode})")
+            if now >= shard.deadline:
+                self._fail(f"Inference shard sent nothing for {self.timeout:.0f}s")
+        return [shard for shard in busy if shard.conn in ready]
+
+    def _receive(self, shard: _Shard) -> tuple[list[Path], Optional[np.ndarray]]:
+        try:
+            reply = shard.conn.recv()
+        except (EOFError, OSError):
+            reply = f"Inference shard crashed (exit code {shard.exitcode})"
+
+        if isinstance(reply, str):
+            self._fail(reply)
+        shard.deadline = time.monotonic() + self.timeout
+        return reply
+
+    def _fail(self, message: str) -> None:
+        # The pool is rebuilt by the next start()
+        self.close()
+        raise RuntimeError(message)
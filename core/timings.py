@@ -0,0 +1,43 @@
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, TextIO
+
+# Set when this module is first imported, which engine.py does before anything else
+_START = time.perf_counter()
+
+_phases: list[tuple[str, float]] = []
+
+
+def record(label: str, seconds: float) -> None:
+    _phases.append((label, seconds))
+
+
+@contextmanager
+def timed(label: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(label, time.perf_counter() - start)
+
+
+def lazy_import(name: str):
+    # Imports a heavy dependency on first use and records how long that took
+    module = sys.modules.get(name)
+    if module is None:
+        with timed(f"import {name}"):
+            module = importlib.import_module(name)
+    return module
+
+
+def elapsed() -> float:
+    return time.perf_counter() - _START
+
+
+def print_report(stream: TextIO) -> None:
+    print("Startup timings (since engine import):", file=stream)
+    for label, seconds in _phases:
+        print(f"  {label:<28} {seconds * 1000:8.1f} ms", file=stream)
+    print(f"  {'total':<28} {elapsed() * 1000:8.1f} ms", file=stream)
@@ -0,0 +1,44 @@
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerProcess:
+    """
+    A child process running `target(conn, *args)`, talking to the parent over
+    a Pipe. Shared by the document metadata pool and the inference shards.
+    """
+
+    def __init__(self, context, target: Callable[..., None], args: tuple = ()):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=target, args=(child_conn, *args), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def send(self, message: Any) -> None:
+        self.conn.send(message)
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    @property
+    def exitcode(self):
+        # Waits briefly for a worker whose pipe just closed to be reaped
+        self.process.join(timeout=1)
+        return self.process.exitcode
+
+    def stop(self, kill: bool = False) -> None:
+        # A None message asks the worker to return; one that is busy or stuck is killed
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
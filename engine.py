@@ -1,20 +1,35 @@
 #!/usr/bin/env python3
 
 
+# Imported first so the --timings report covers every other import
+from core import timings
+
+import atexit
+import functools
 import logging
 import sys
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
 import typer
 from rich.logging import RichHandler
 
+from core.cache import ClassificationCache, EmbeddingCache, TextEmbeddingCache
 from core.inference import ClipInference, ClassificationResult
-from core.scanner import FileScanner, ScanResult
+from core.scanner import FileInfo, FileScanner, ScanResult
+from core.sharding import plan_shards
+from core.scan_index import ScanIndex
+from core.duplicates import CopyTracker, SizedFile, find_duplicates
 from core.file_ops import FileOperations
 from core.categories import CategoryManager, Category
 from utils.display import DisplayManager
 
+if TYPE_CHECKING:
+    # Needs numpy; imported where a search actually uses the index
+    from core.ann import IVFIndex
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(message)s",
@@ -30,6 +45,147 @@ app = typer.Typer(
 
 display = DisplayManager()
 
+timings.record("engine imports", timings.elapsed())
+
+
+@app.callback()
+def main(
+    show_timings: bool = typer.Option(
+        False, "--timings",
+        help="Print a startup timing report (imports, model load) to stderr on exit"
+    ),
+):
+    if show_timings:
+        atexit.register(timings.print_report, sys.stderr)
+
+
+@dataclass(frozen=True)
+class EngineOptions:
+    # `shards` is the number of forked CPU inference workers: 1 runs in-process, 0 sizes it to the machine.
+    # A `batch_size` of 0 tunes it per device; `max_rss_mb` (0 = none) makes the tuner back off.
+    # Without `use_cache`, nothing is read from or written to the cache directory.
+    use_cache: bool = True
+    backend: str = "torch"
+    shards: int = 1
+    batch_size: int = 0
+    max_rss_mb: int = 0
+
+
+NO_CACHE_OPTION = typer.Option(
+    False, "--no-cache",
+    help="Do not read or write any persistent cache: embeddings, classifications, OCR text, "
+         "scan and image indexes, tuned batch sizes"
+)
+BACKEND_OPTION = typer.Option(
+    "torch", "--backend",
+    help="Inference backend: 'torch' or 'onnx' (int8 ONNX Runtime on the CPU)"
+)
+SHARDS_OPTION = typer.Option(
+    1, "--shards",
+    help="Encode images on N forked CPU workers sharing the model weights (0 = one per 4 cores, 1 = off)"
+)
+BATCH_SIZE_OPTION = typer.Option(
+    0, "--batch-size",
+    help="Images per inference batch (0 = tune it for this device and remember the result)"
+)
+MAX_RSS_MB_OPTION = typer.Option(
+    0, "--max-rss-mb",
+    help="Lower the tuned batch size when the process RSS passes this many MB (0 = no ceiling)"
+)
+
+
+def create_inference(options: EngineOptions = EngineOptions()) -> ClipInference:
+    embedding_cache = None
+    text_cache = None
+    result_cache = None
+    if options.use_cache:
+        try:
+            embedding_cache = EmbeddingCache()
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable, continuing without it: {e}")
+        try:
+            text_cache = TextEmbeddingCache()
+        except Exception as e:
+            logger.warning(f"Text embedding cache unavailable, continuing without it: {e}")
+        try:
+            result_cache = ClassificationCache()
+        except Exception as e:
+            logger.warning(f"Classification cache unavailable, continuing without it: {e}")
+    return ClipInference(
+        embedding_cache=embedding_cache,
+        backend=options.backend,
+        text_cache=text_cache,
+        result_cache=result_cache,
+        shards=None if options.shards == 1 else plan_shards(options.shards),
+        batch_size=options.batch_size or None,
+        auto_batch_size=not options.batch_size,
+        max_rss_mb=options.max_rss_mb or None,
+        persist_batch_size=options.use_cache
+    )
+
+
+class InferenceLoader:
+    """
+    Creates the ClipInference and loads the model on a background thread.
+
+    `start` is called when the scan sees its first image, so the import of
+    torch and the model load overlap with the rest of the walk; runs without
+    images never start it. `get` blocks until the instance exists, while the
+    model itself may still be loading.
+    """
+
+    def __init__(self, options: EngineOptions = EngineOptions()):
+        self.options = options
+        self._inference: Optional[ClipInference] = None
+        self._error: Optional[Exception] = None
+        self._created = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="inference-loader", daemon=True)
+            self._thread.start()
+
+    def get(self) -> ClipInference:
+        self.start()
+        self._created.wait()
+        if self._error is not None:
+            raise self._error
+        return self._inference
+
+    def _run(self) -> None:
+        try:
+            self._inference = create_inference(self.options)
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            self._created.set()
+        self._inference.load_async()
+
+
+def open_image_index(inference: ClipInference) -> Optional["IVFIndex"]:
+    from core.ann import IVFIndex, image_index_dir
+    
+    try:
+        return IVFIndex.load(image_index_dir(inference.cache_model, inference.pretrained))
+    except Exception as e:
+        logger.warning(f"Image index unavailable, searching without it: {e}")
+        return None
+
+
+def create_scan_index(use_cache: bool = True) -> Optional[ScanIndex]:
+    if not use_cache:
+        return None
+    try:
+        return ScanIndex()
+    except Exception as e:
+        logger.warning(f"Scan index unavailable, scanning without it: {e}")
+        return None
+
 
 class FileOrganizer:
     
@@ -38,17 +194,22 @@ class FileOrganizer:
         target_dir: Path,
         recursive: bool = False,
         dry_run: bool = False,
-        user_prompt: Optional[str] = None
+        user_prompt: Optional[str] = None,
+        options: EngineOptions = EngineOptions()
     ):
         self.target_dir = Path(target_dir).resolve()
         self.recursive = recursive
         self.dry_run = dry_run
         self.user_prompt = user_prompt
+        self.options = options
         
         self.category_manager = CategoryManager()
-        self.scanner = FileScanner(recursive=recursive)
+        self.scanner = FileScanner(
+            recursive=recursive, index=create_scan_index(options.use_cache), ocr_cache=options.use_cache
+        )
         self.file_ops = FileOperations(base_directory=self.target_dir, dry_run=dry_run)
         self.inference: Optional[ClipInference] = None
+        self.inference_loader = InferenceLoader(options)
         
         self.scan_result: Optional[ScanResult] = None
         self.classification_results: list[ClassificationResult] = []
@@ -75,7 +236,7 @@ class FileOrganizer:
         display.print_info(f"Scanning directory: {self.target_dir}")
         
         try:
-            self.scan_result = self.scanner.scan(self.target_dir)
+            self.scan_result = self.scanner.scan(self.target_dir, on_file=self._on_file_scanned)
             
             display.print_scan_summary(
                 total_files=self.scan_result.total_files,
@@ -83,7 +244,8 @@ class FileOrganizer:
                 documents=len(self.scan_result.documents),
                 other=len(self.scan_result.other_files),
                 errors=len(self.scan_result.errors),
-                scan_time=self.scan_result.scan_time_seconds
+                scan_time=self.scan_result.scan_time_seconds,
+                ocr_time=self.scan_result.ocr_time_seconds
             )
             
             if self.scan_result.errors:
@@ -102,13 +264,17 @@ class FileOrganizer:
             display.print_error(f"Permission denied: {e}")
             return False
     
+    def _on_file_scanned(self, file_info: FileInfo) -> None:
+        if file_info.is_image:
+            self.inference_loader.start()
+    
     def _classify_files(self) -> bool:
         if not self.scan_result:
             return False
         
         if self.scan_result.images:
             display.print_info("Loading AI model for image classification...")
-            self.inference = ClipInference()
+            self.inference = self.inference_loader.get()
             display.print_device_info(self.inference.get_device_info())
             
             self._classify_images()
@@ -128,22 +294,27 @@ class FileOrganizer:
         category_prompts = self.category_manager.get_clip_prompts()
         
         image_paths = [f.path for f in self.scan_result.images]
+        # Hashes from the scan let copies and moved files reuse stored classifications
+        content_hashes = {f.path: f.content_hash for f in self.scan_result.images if f.content_hash}
         
         display.print_info(f"Classifying {len(image_paths)} images...")
         
         with display.create_progress() as progress:
             task = progress.add_task("Analyzing images...", total=len(image_paths))
             
-            results = self.inference.classify_batch(
+            for result in self.inference.iter_classify_batch(
                 image_paths=image_paths,
                 categories=category_names,
                 category_prompts=category_prompts,
-                batch_size=8
-            )
-            
-            progress.update(task, completed=len(image_paths))
+                batch_size=8,
+                progress_callback=lambda done, total: progress.update(task, completed=done),
+                content_hashes=content_hashes,
+                hash_algorithm=self.scanner.hasher.algorithm
+            ):
+                self._add_result(result)
         
-        self.classification_results.extend(results)
+        cache_stats = self.inference.get_cache_stats()
+        display.print_cache_summary(cache_stats["hits"], cache_stats["misses"])
     
     def _classify_documents(self) -> None:
         if not self.scan_result:
@@ -159,7 +330,7 @@ class FileOrganizer:
                     confidence=1.0,  
                     all_scores={category.name: 1.0}
                 )
-                self.classification_results.append(result)
+                self._add_result(result)
     
     def _classify_other_files(self) -> None:
         if not self.scan_result:
@@ -183,7 +354,17 @@ class FileOrganizer:
                     all_scores={"Outros": 0.5}
                 )
             
-            self.classification_results.append(result)
+            self._add_result(result)
+    
+    def _add_result(self, result: ClassificationResult) -> None:
+        # Moves are planned as results arrive, so planning overlaps with inference
+        self.classification_results.append(result)
+        self.file_ops.plan_move(
+            source=result.file_path,
+            category_folder=self._get_folder_name(result.suggested_category),
+            category_name=result.suggested_category,
+            confidence=result.confidence
+        )
     
     def _handle_user_action(self) -> bool:
         if not self.classification_results:
@@ -197,15 +378,6 @@ class FileOrganizer:
         
         display.print_classification_results(results_display)
         
-        for result in self.classification_results:
-            folder_name = self._get_folder_name(result.suggested_category)
-            self.file_ops.plan_move(
-                source=result.file_path,
-                category_folder=folder_name,
-                category_name=result.suggested_category,
-                confidence=result.confidence
-            )
-        
         choice = display.prompt_action()
         
         if choice == "a":
@@ -273,7 +445,12 @@ def organize(
     verbose: bool = typer.Option(
         False, "--verbose", "-v",
         help="Enable verbose logging"
-    )
+    ),
+    no_cache: bool = NO_CACHE_OPTION,
+    backend: str = BACKEND_OPTION,
+    shards: int = SHARDS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    max_rss_mb: int = MAX_RSS_MB_OPTION
 ):
 
     if verbose:
@@ -293,7 +470,8 @@ def organize(
         target_dir=target_dir,
         recursive=recursive,
         dry_run=dry_run,
-        user_prompt=prompt
+        user_prompt=prompt,
+        options=EngineOptions(not no_cache, backend, shards, batch_size, max_rss_mb)
     )
     
     success = organizer.run()
@@ -318,15 +496,455 @@ def info():
         display.print_error(f"Error checking system: {e}")
 
 
-@app.command()
-def analyze(
-    directory: str = typer.Argument(..., help="Directory to analyze"),
-):
+def describe_file(idx: int, file_info, category_manager: CategoryManager, duplicate_of: Optional[str]) -> dict:
+    category = None
+    confidence = 0.5
+    
+    if not file_info.is_image:
+        cat_obj = category_manager.get_category_by_extension(file_info.extension, file_info.name)
+        if cat_obj:
+            category = cat_obj.folder_name
+            confidence = 1.0
+        else:
+            category = "Outros"
+            confidence = 0.5
 
-    import json
-    import sys
-    import traceback
+    is_duplicate = duplicate_of is not None
+    return {
+        "index": idx,
+        "filename": file_info.name,
+        "filepath": file_info.filepath,
+        "suggested_folder": category or "Outros",
+        "suggested_name": None, # Logic simplified for now
+        "confidence": confidence,
+        "selected": not is_duplicate,
+        "is_duplicate": is_duplicate,
+        "duplicate_of": duplicate_of
+    }
+
+
+def get_folder_for_category(categories: list[Category], category_name: str) -> str:
+    return next((c.folder_name for c in categories if c.name == category_name), category_name)
+
+
+def run_analyze(
+    directory: str,
+    get_inference: Callable[[], ClipInference],
+    scan_index: Optional[ScanIndex] = None,
+    preload: Optional[Callable[[], None]] = None,
+    ocr_cache: bool = True
+) -> dict:
+    # `preload` is called when the scan sees an image, to start loading CLIP while the walk goes on
+    target_dir = Path(directory).resolve()
+    
+    category_manager = CategoryManager()
+    # Duplicates are found in a staged pass below instead of hashing every file during the scan
+    scanner = FileScanner(calculate_hash=False, index=scan_index, ocr_cache=ocr_cache)
+    
+    def on_file(file_info: FileInfo) -> None:
+        if preload is not None and file_info.is_image:
+            preload()
+    
+    scan_result = scanner.scan(target_dir, on_file=on_file)
+    
+    classifications = []
+    all_files = scan_result.all_files
+    duplicates = find_duplicates(all_files)
+    
+    for idx, file_info in enumerate(all_files):
+        classifications.append(
+            describe_file(idx, file_info, category_manager, duplicates.duplicate_of.get(file_info.filepath))
+        )
+        
+    image_indices = [i for i, f in enumerate(all_files) if f.is_image]
+    cache_stats = {"hits": 0, "misses": 0}
+    
+    if image_indices:
+        try:
+            inference = get_inference()
+            stats_before = inference.get_cache_stats()
+            categories = category_manager.get_image_categories()
+            cat_names = [c.name for c in categories]
+            cat_prompts = category_manager.get_clip_prompts()
+            
+            # One image per duplicate group goes through CLIP; its copies get the same result
+            representatives: dict[str, Path] = {}
+            for i in image_indices:
+                file_info = all_files[i]
+                representatives.setdefault(duplicates.duplicate_of.get(file_info.filepath, file_info.filepath), file_info.path)
+            
+            results = inference.classify_batch(
+                list(representatives.values()),
+                cat_names,
+                cat_prompts,
+                content_hashes={Path(filepath): digest for filepath, digest in duplicates.digests.items()},
+                hash_algorithm=duplicates.algorithm
+            )
+            by_path = {res.file_path: res for res in results}
+            
+            for real_idx in image_indices:
+                filepath = all_files[real_idx].filepath
+                res = by_path[representatives[duplicates.duplicate_of.get(filepath, filepath)]]
+                classifications[real_idx]["suggested_folder"] = get_folder_for_category(categories, res.suggested_category)
+                classifications[real_idx]["confidence"] = res.confidence
+            
+            stats_after = inference.get_cache_stats()
+            cache_stats = {key: stats_after[key] - stats_before[key] for key in cache_stats}
+                
+        except Exception as e:
+            # Use sys.stderr explicitly or print, which now goes to stderr
+            print(f"CLIP Error: {e}", file=sys.stderr)
+
+    return {
+        "total_files": scan_result.total_files,
+        "images": len(scan_result.images),
+        "documents": len(scan_result.documents),
+        "other_files": len(scan_result.other_files),
+        "classifications": classifications,
+        "scan_time": scan_result.scan_time_seconds,
+        "total_duplicates": duplicates.total_duplicates,
+        "cache_hits": cache_stats["hits"],
+        "cache_misses": cache_stats["misses"]
+    }
+
+
+def run_analyze_stream(
+    directory: str,
+    get_inference: Callable[[], ClipInference],
+    emit: Callable[[dict], None],
+    scan_index: Optional[ScanIndex] = None,
+    preload: Optional[Callable[[], None]] = None,
+    ocr_cache: bool = True
+) -> None:
+    # NDJSON variant of run_analyze. Files are emitted as "file" records while the walk is still
+    # running (images once CLIP has classified them), interleaved with "progress" records.
+    # Duplicates need every file's size, so they follow the walk as "duplicate" records that
+    # flag already emitted files; a final "summary" record closes the stream. An image identical
+    # to an earlier one is spotted during the walk and reuses that image's result instead of CLIP.
+    import time
+    from collections import deque
+    from itertools import chain
+    
+    target_dir = Path(directory).resolve()
+    
+    category_manager = CategoryManager()
+    scanner = FileScanner(calculate_hash=False, index=scan_index, ocr_cache=ocr_cache)
+    
+    counts = {"images": 0, "documents": 0, "other_files": 0}
+    # Only what the duplicate pass needs is kept per file, not the FileInfo
+    scanned: list[SizedFile] = []
+    # (index, FileInfo, filepath of the earlier image it copies or None), in walk order
+    pending_images = deque()
+    copies = CopyTracker()
+    # Digests of the images hashed by the copy check, handed to the classification cache
+    content_hashes: dict[Path, str] = {}
+    # (folder, confidence) of the images a later copy may point to
+    outcomes: dict[str, tuple[str, float]] = {}
+    queued = 0
+    scan_time = 0.0
+    
+    def scan_images() -> Iterator[Path]:
+        # Drives the walk: other files are emitted right away, image paths are handed to CLIP
+        nonlocal scan_time, queued
+        start_time = time.time()
+        for idx, file_info in enumerate(scanner.iter_scan(target_dir)):
+            scanned.append(SizedFile(file_info.filepath, file_info.size_bytes))
+            if (idx + 1) % 1000 == 0:
+                emit({"type": "progress", "phase": "scan", "done": idx + 1, "total": None})
+            
+            if file_info.is_image:
+                if counts["images"] == 0 and preload is not None:
+                    preload()
+                counts["images"] += 1
+                original = copies.original_of(file_info)
+                for filepath in (file_info.filepath, original):
+                    if filepath in copies.digests:
+                        content_hashes[Path(filepath)] = copies.digests[filepath]
+                pending_images.append((idx, file_info, original))
+                if original is None:
+                    queued += 1
+                    yield file_info.path
+            else:
+                counts["documents" if file_info.is_document else "other_files"] += 1
+                emit({"type": "file", **describe_file(idx, file_info, category_manager, None)})
+        
+        scan_time = time.time() - start_time
+        emit({"type": "progress", "phase": "scan", "done": len(scanned), "total": len(scanned)})
+    
+    def emit_image(idx: int, file_info: FileInfo, original: Optional[str], res: Optional[ClassificationResult]) -> None:
+        record = describe_file(idx, file_info, category_manager, None)
+        if res is not None:
+            outcome = (get_folder_for_category(categories, res.suggested_category), res.confidence)
+        else:
+            outcome = outcomes.get(original)
+        if outcome is not None:
+            record["suggested_folder"], record["confidence"] = outcome
+            if file_info.filepath in copies.digests or copies.is_first_of_size(file_info):
+                outcomes[file_info.filepath] = outcome
+        emit({"type": "file", **record})
+    
+    image_paths = scan_images()
+    first_image = next(image_paths, None)
+    categories = []
+    cache_stats = {"hits": 0, "misses": 0}
+    
+    if first_image is not None:
+        try:
+            inference = get_inference()
+            stats_before = inference.get_cache_stats()
+            categories = category_manager.get_image_categories()
+            
+            results = inference.iter_classify_batch(
+                chain([first_image], image_paths),
+                [c.name for c in categories],
+                category_manager.get_clip_prompts(),
+                progress_callback=lambda done, total: emit(
+                    {"type": "progress", "phase": "classify", "done": done, "total": queued if scan_time else None}
+                ),
+                content_hashes=content_hashes,
+                hash_algorithm=copies.hasher.algorithm
+            )
+            
+            for res in results:
+                # Copies ahead of this result point to images already emitted
+                idx, file_info, original = pending_images.popleft()
+                while original is not None:
+                    emit_image(idx, file_info, original, None)
+                    idx, file_info, original = pending_images.popleft()
+                emit_image(idx, file_info, None, res)
+            
+            stats_after = inference.get_cache_stats()
+            cache_stats = {key: stats_after[key] - stats_before[key] for key in cache_stats}
+            
+        except Exception as e:
+            print(f"CLIP Error: {e}", file=sys.stderr)
+        
+        # Finish the walk if CLIP stopped early; anything it did not get to is still reported, unclassified
+        for _ in image_paths:
+            pass
+        while pending_images:
+            emit_image(*pending_images.popleft(), None)
+    
+    duplicates = find_duplicates(scanned)
+    for filepath, original in duplicates.duplicate_of.items():
+        emit({"type": "duplicate", "filepath": filepath, "duplicate_of": original})
+    
+    emit({
+        "type": "summary",
+        "total_files": len(scanned),
+        "images": counts["images"],
+        "documents": counts["documents"],
+        "other_files": counts["other_files"],
+        "scan_time": scan_time,
+        "total_duplicates": duplicates.total_duplicates,
+        "cache_hits": cache_stats["hits"],
+        "cache_misses": cache_stats["misses"]
+    })
+
+
+# Search returns at most this many results; images must be at least this similar to the query
+SEARCH_MAX_RESULTS = 50
+SEARCH_MIN_SIMILARITY = 0.22
+
+# Images embedded between two search progress messages
+SEARCH_PROGRESS_STEP = 500
+
+# New embeddings are added to the image index this many at a time
+IMAGE_INDEX_ADD_BATCH = 4096
+
+
+def report_search_progress(message: str) -> None:
+    print(f"[UI_PROGRESS] {message}", file=sys.stderr)
+
+
+def run_search(
+    directory: str,
+    query: str,
+    get_inference: Callable[[], ClipInference],
+    progress: Callable[[str], None] = report_search_progress,
+    get_image_index: Optional[Callable[[ClipInference], Optional["IVFIndex"]]] = None
+) -> list[dict]:
+    target_dir = Path(directory).expanduser().resolve()
+    
+    # Prepare query terms (support OR logic via pipe |)
+    query_terms = [q.strip().lower() for q in query.split('|') if q.strip()]
+    
+    # Use recursive scan for search to find files in subfolders
+    # Disable hashing and metadata extraction for search speed
+    scanner = FileScanner(recursive=True, use_ocr=False, calculate_hash=False, fast_mode=True)
+    scan_result = scanner.scan(target_dir)
+    all_files = scan_result.all_files
+    
+    progress(f"Varredura completa. {len(all_files)} arquivos encontrados.")
+    
+    if not all_files:
+        return []
+        
+    results = []
+    
+    # 1. First pass: Text-based matching on filenames (Very Fast)
+    progress("Filtrando por nome e metadados...")
+    for idx, file_info in enumerate(all_files):
+        # Filename match (highest priority) uses OR logic for terms
+        name_lower = file_info.name.lower()
+        if any(term in name_lower for term in query_terms):
+            results.append({
+                "index": idx,
+                "filename": file_info.name,
+                "filepath": str(file_info.path),
+                "suggested_folder": "Busca (Nome)",
+                "suggested_name": None,
+                "confidence": 0.95, 
+                "selected": True,
+                "is_duplicate": False,
+                "duplicate_of": None
+            })
+            continue
+        
+        # Metadata match (title, author, tags)
+        meta_str = str(file_info.metadata).lower()
+        if any(term in meta_str for term in query_terms):
+            results.append({
+                "index": idx,
+                "filename": file_info.name,
+                "filepath": str(file_info.path),
+                "suggested_folder": "Busca (Metadados)",
+                "suggested_name": None,
+                "confidence": 0.8,
+                "selected": True,
+                "is_duplicate": False,
+                "duplicate_of": None
+            })
     
+    # 2. Second pass: CLIP Semantic search for images (Slower)
+    # Only perform CLIP search if we have few results or if user specifies
+    matched_paths = {r["filepath"] for r in results}
+    images = [f for f in scan_result.images if str(f.path) not in matched_paths]
+    
+    # Only calculate embedding for the FIRST term if multiple (approximation) or join them?
+    primary_query = query_terms[0] if query_terms else ""
+    
+    if images and primary_query and (len(results) < 10 or len(query.split()) > 2):
+        try:
+            progress(f"Analisando visualmente {len(images)} imagens...")
+            inference = get_inference()
+            
+            reported = 0
+            
+            def on_progress(done: int, total: Optional[int]) -> None:
+                nonlocal reported
+                if done - reported >= SEARCH_PROGRESS_STEP or done == total:
+                    reported = done
+                    progress(f"Analisando visualmente {done}/{total} imagens...")
+            
+            image_index = get_image_index(inference) if get_image_index is not None else None
+            if image_index is not None:
+                ranked = search_image_index(image_index, inference, scan_result.images, images, target_dir, primary_query, on_progress)
+            else:
+                ranked = inference.rank_images(
+                    primary_query,
+                    [img.path for img in images],
+                    top_k=SEARCH_MAX_RESULTS,
+                    min_similarity=SEARCH_MIN_SIMILARITY,
+                    progress_callback=on_progress
+                )
+            
+            for rank, (img_path, similarity) in enumerate(ranked):
+                results.append({
+                    "index": 1000 + rank,
+                    "filename": img_path.name,
+                    "filepath": str(img_path),
+                    "suggested_folder": "Busca (IA)",
+                    "suggested_name": None,
+                    "confidence": similarity,
+                    "selected": True,
+                    "is_duplicate": False,
+                    "duplicate_of": None
+                })
+        except Exception as e:
+            print(f"CLIP Semantic Search failed: {e}", file=sys.stderr)
+
+    # Sort by confidence and return top 50
+    progress("Finalizando resultados...")
+    results.sort(key=lambda x: x["confidence"], reverse=True)
+    
+    # Remove duplicates by path (just in case)
+    seen_paths = set()
+    final_results = []
+    for r in results:
+        if r["filepath"] not in seen_paths:
+            final_results.append(r)
+            seen_paths.add(r["filepath"])
+    
+    return final_results[:SEARCH_MAX_RESULTS]
+
+
+def search_image_index(
+    index: "IVFIndex",
+    inference: ClipInference,
+    scanned_images: list[FileInfo],
+    candidates: list[FileInfo],
+    directory: Path,
+    query: str,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+) -> list[tuple[Path, float]]:
+    import numpy as np
+    
+    # Bring the persisted index up to date with this scan: new or changed images are embedded
+    # (mostly from the embedding cache) and images no longer under `directory` are dropped
+    stale = {f.path: f for f in scanned_images if index.get_stat(f.filepath) != (f.size_bytes, f.mtime)}
+    entries = []
+    for image_path, embedding in inference.iter_embed_images(list(stale), 32, progress_callback):
+        if embedding is not None:
+            file_info = stale[image_path]
+            entries.append((file_info.filepath, file_info.size_bytes, file_info.mtime, embedding))
+        if len(entries) >= IMAGE_INDEX_ADD_BATCH:
+            index.add(entries)
+            entries = []
+    index.add(entries)
+    
+    scanned = {f.filepath for f in scanned_images}
+    index.remove([p for p in index.paths_under(str(directory)) if p not in scanned])
+    index.save()
+    
+    query_vector = np.asarray(inference.encode_text(query), dtype=np.float32)
+    found = index.search(
+        query_vector,
+        SEARCH_MAX_RESULTS,
+        SEARCH_MIN_SIMILARITY,
+        paths={f.filepath for f in candidates}
+    )
+    return [(Path(filepath), similarity) for filepath, similarity in found]
+
+
+def run_classify(
+    paths: list[str],
+    inference: ClipInference,
+    category_manager: Optional[CategoryManager] = None
+) -> list[dict]:
+    category_manager = category_manager or CategoryManager()
+    categories = category_manager.get_image_categories()
+    
+    results = inference.classify_batch(
+        [Path(p).expanduser().resolve() for p in paths],
+        [c.name for c in categories],
+        category_manager.get_clip_prompts()
+    )
+    
+    output = []
+    for res in results:
+        folder = get_folder_for_category(categories, res.suggested_category)
+        output.append({
+            "filepath": str(res.file_path),
+            "suggested_category": res.suggested_category,
+            "suggested_folder": folder,
+            "confidence": res.confidence,
+            "all_scores": res.all_scores
+        })
+    return output
+
+
+def redirect_stdout_to_stderr():
     # Save original stdout to ensure only JSON goes there
     original_stdout = sys.stdout
     try:
@@ -337,99 +955,55 @@ def analyze(
     # Redirect all standard output to stderr to prevent pollution of the JSON pipe
     # This catches progress bars (tqdm), warnings, and utility prints
     sys.stdout = sys.stderr
+    return original_stdout
+
+
+@app.command()
+def analyze(
+    directory: str = typer.Argument(..., help="Directory to analyze"),
+    stream: bool = typer.Option(
+        False, "--stream",
+        help="Emit NDJSON: one record per classified file plus progress and summary records"
+    ),
+    no_cache: bool = NO_CACHE_OPTION,
+    backend: str = BACKEND_OPTION,
+    shards: int = SHARDS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    max_rss_mb: int = MAX_RSS_MB_OPTION
+):
+
+    import json
+    import traceback
+    
+    original_stdout = redirect_stdout_to_stderr()
+    
+    options = EngineOptions(not no_cache, backend, shards, batch_size, max_rss_mb)
+    loader = InferenceLoader(options)
     
     try:
-        target_dir = Path(directory).resolve()
-        
-        category_manager = CategoryManager()
-        scanner = FileScanner()
-        
-        scan_result = scanner.scan(target_dir)
-        
-        classifications = []
-        idx = 0
-        hashes = {}
-        duplicates_count = 0
-        
-        all_files = scan_result.all_files
+        if stream:
+            run_analyze_stream(
+                directory,
+                loader.get,
+                lambda record: print(json.dumps(record), file=original_stdout, flush=True),
+                create_scan_index(options.use_cache),
+                preload=loader.start,
+                ocr_cache=options.use_cache
+            )
+            return
         
-        for file_info in all_files:
-            h = file_info.metadata.get("hash", "")
-            is_duplicate = False
-            duplicate_of = None
-            
-            if h:
-                if h in hashes:
-                    is_duplicate = True
-                    duplicate_of = hashes[h]
-                    duplicates_count += 1
-                else:
-                    hashes[h] = str(file_info.path)
-
-            category = None
-            confidence = 0.5
-            
-            if not file_info.is_image:
-                cat_obj = category_manager.get_category_by_extension(file_info.extension, file_info.name)
-                if cat_obj:
-                    category = cat_obj.folder_name
-                    confidence = 1.0
-                else:
-                    category = "Outros"
-                    confidence = 0.5
-
-            classifications.append({
-                "index": idx,
-                "filename": file_info.name,
-                "filepath": str(file_info.path),
-                "suggested_folder": category or "Outros",
-                "suggested_name": None, # Logic simplified for now
-                "confidence": confidence,
-                "selected": not is_duplicate,
-                "is_duplicate": is_duplicate,
-                "duplicate_of": duplicate_of
-            })
-            idx += 1
-            
-        image_indices = [i for i, f in enumerate(all_files) if f.is_image]
-        
-        if image_indices:
-            try:
-                inference = ClipInference()
-                categories = category_manager.get_image_categories()
-                cat_names = [c.name for c in categories]
-                cat_prompts = category_manager.get_clip_prompts()
-                
-                img_path_objs = [all_files[i].path for i in image_indices]
-                
-                results = inference.classify_batch(img_path_objs, cat_names, cat_prompts)
-                
-                for i, res in enumerate(results):
-                    real_idx = image_indices[i]
-                    folder = next((c.folder_name for c in categories if c.name == res.suggested_category), res.suggested_category)
-                    
-                    classifications[real_idx]["suggested_folder"] = folder
-                    classifications[real_idx]["confidence"] = res.confidence
-                    
-            except Exception as e:
-                # Use sys.stderr explicitly or print, which now goes to stderr
-                print(f"CLIP Error: {e}")
- 
-        output = {
-            "total_files": scan_result.total_files,
-            "images": len(scan_result.images),
-            "documents": len(scan_result.documents),
-            "other_files": len(scan_result.other_files),
-            "classifications": classifications,
-            "scan_time": scan_result.scan_time_seconds,
-            "total_duplicates": duplicates_count
-        }
+        output = run_analyze(
+            directory, loader.get, create_scan_index(options.use_cache),
+            preload=loader.start, ocr_cache=options.use_cache
+        )
         
         # Print FINAL JSON to the REAL stdout
         print(json.dumps(output), file=original_stdout)
         
     except Exception as e:
         error_out = {"error": str(e), "trace": traceback.format_exc()}
+        if stream:
+            error_out["type"] = "error"
         # Print ERROR JSON to the REAL stdout
         print(json.dumps(error_out), file=original_stdout)
         sys.exit(1)
@@ -439,128 +1013,25 @@ def analyze(
 def search(
     directory: str = typer.Argument(..., help="Directory to search"),
     query: str = typer.Argument(..., help="Search query"),
+    no_cache: bool = NO_CACHE_OPTION,
+    backend: str = BACKEND_OPTION,
+    shards: int = SHARDS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    max_rss_mb: int = MAX_RSS_MB_OPTION
 ):
   
     import json
-    import sys
-    import numpy as np
     
-    # Save original stdout
-    original_stdout = sys.stdout
-    try:
-        original_stdout.reconfigure(encoding='utf-8')
-    except AttributeError:
-        pass
-        
-    # Redirect all other stdout prints to stderr
-    sys.stdout = sys.stderr
+    original_stdout = redirect_stdout_to_stderr()
     
     try:
-        # Prepare query terms (support OR logic via pipe |)
-        query_terms = [q.strip().lower() for q in query.split('|') if q.strip()]
-        
-        # Use recursive scan for search to find files in subfolders
-        # Disable hashing and metadata extraction for search speed
-        scanner = FileScanner(recursive=True, use_ocr=False, calculate_hash=False, fast_mode=True)
-        scan_result = scanner.scan(target_dir)
-        all_files = scan_result.all_files
-        
-        print(f"[UI_PROGRESS] Varredura completa. {len(all_files)} arquivos encontrados.", file=sys.stderr)
-        
-        if not all_files:
-            print(json.dumps([]), file=original_stdout)
-            sys.exit(0)
-            
-        results = []
-        inference = None
-        q_vec = None
-        
-        # 1. First pass: Text-based matching on filenames (Very Fast)
-        print("[UI_PROGRESS] Filtrando por nome e metadados...", file=sys.stderr)
-        for idx, file_info in enumerate(all_files):
-            # Filename match (highest priority) uses OR logic for terms
-            name_lower = file_info.name.lower()
-            if any(term in name_lower for term in query_terms):
-                results.append({
-                    "index": idx,
-                    "filename": file_info.name,
-                    "filepath": str(file_info.path),
-                    "suggested_folder": "Busca (Nome)",
-                    "suggested_name": None,
-                    "confidence": 0.95, 
-                    "selected": True,
-                    "is_duplicate": False,
-                    "duplicate_of": None
-                })
-                continue
-            
-            # Metadata match (title, author, tags)
-            meta_str = str(file_info.metadata).lower()
-            if any(term in meta_str for term in query_terms):
-                results.append({
-                    "index": idx,
-                    "filename": file_info.name,
-                    "filepath": str(file_info.path),
-                    "suggested_folder": "Busca (Metadados)",
-                    "suggested_name": None,
-                    "confidence": 0.8,
-                    "selected": True,
-                    "is_duplicate": False,
-                    "duplicate_of": None
-                })
-        
-        # 2. Second pass: CLIP Semantic search for images (Slower)
-        # Only perform CLIP search if we have few results or if user specifies
-        images = [f for f in scan_result.images if not any(r["filepath"] == str(f.path) for r in results)]
-        
-        # Only calculate embedding for the FIRST term if multiple (approximation) or join them?
-        primary_query = query_terms[0] if query_terms else ""
-        
-        if images and primary_query and (len(results) < 10 or len(query.split()) > 2):
-            try:
-                print(f"[UI_PROGRESS] Analisando visualmente {min(len(images), 100)} imagens...", file=sys.stderr)
-                if not inference:
-                    inference = ClipInference()
-                    query_embedding = inference.encode_text(primary_query) 
-                    q_vec = np.array(query_embedding)
-                
-                # Limit CLIP search to top 100 images to avoid freezing if directory is huge
-                # In a real app, we would use a vector database
-                for idx, img in enumerate(images[:100]):
-                    img_emb = inference.get_image_embedding(img.path)
-                    if not img_emb: continue
-                    
-                    i_vec = np.array(img_emb)
-                    similarity = np.dot(q_vec, i_vec) / (np.linalg.norm(q_vec) * np.linalg.norm(i_vec))
-                    
-                    if similarity > 0.22: # Tighter threshold for better quality
-                        results.append({
-                            "index": 1000 + idx,
-                            "filename": img.name,
-                            "filepath": str(img.path),
-                            "suggested_folder": "Busca (IA)",
-                            "suggested_name": None,
-                            "confidence": float(similarity),
-                            "selected": True,
-                            "is_duplicate": False,
-                            "duplicate_of": None
-                        })
-            except Exception as e:
-                print(f"CLIP Semantic Search failed: {e}", file=sys.stderr)
-
-        # Sort by confidence and return top 50
-        print("[UI_PROGRESS] Finalizando resultados...", file=sys.stderr)
-        results.sort(key=lambda x: x["confidence"], reverse=True)
-        
-        # Remove duplicates by path (just in case)
-        seen_paths = set()
-        final_results = []
-        for r in results:
-            if r["filepath"] not in seen_paths:
-                final_results.append(r)
-                seen_paths.add(r["filepath"])
-        
-        print(json.dumps(final_results[:50]), file=original_stdout)
+        results = run_search(
+            directory,
+            query,
+            lambda: create_inference(EngineOptions(not no_cache, backend, shards, batch_size, max_rss_mb)),
+            get_image_index=None if no_cache else open_image_index
+        )
+        print(json.dumps(results), file=original_stdout)
         
     except Exception as e:
         import traceback
@@ -570,5 +1041,75 @@ def search(
         sys.exit(1)
 
 
+@app.command()
+def serve(
+    port: Optional[int] = typer.Option(
+        None, "--port",
+        help="Listen on 127.0.0.1:PORT (0 picks a free port) instead of stdin/stdout"
+    ),
+    idle_timeout: float = typer.Option(
+        300.0, "--idle-timeout",
+        help="Seconds without requests before the CLIP model is unloaded (0 disables)"
+    ),
+    no_cache: bool = NO_CACHE_OPTION,
+    backend: str = BACKEND_OPTION,
+    shards: int = SHARDS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    max_rss_mb: int = MAX_RSS_MB_OPTION
+):
+
+    from core.server import EngineServer, detach_stdin
+    
+    original_stdout = redirect_stdout_to_stderr()
+    # Before anything can fork a worker
+    requests = detach_stdin() if port is None else None
+    
+    options = EngineOptions(not no_cache, backend, shards, batch_size, max_rss_mb)
+    inference = create_inference(options)
+    server = EngineServer(inference, idle_timeout=idle_timeout)
+    
+    scan_index = create_scan_index(options.use_cache)
+    
+    def analyze_request(params: dict, notify) -> dict:
+        if not params.get("stream"):
+            return run_analyze(
+                params["directory"], lambda: inference, scan_index,
+                preload=inference.load_async, ocr_cache=options.use_cache
+            )
+        
+        # Streamed records go out as "record" notifications; the summary is the result
+        summary = {}
+        def emit(record: dict) -> None:
+            if record["type"] == "summary":
+                summary.update(record)
+            else:
+                notify("record", record)
+        run_analyze_stream(
+            params["directory"], lambda: inference, emit, scan_index,
+            preload=inference.load_async, ocr_cache=options.use_cache
+        )
+        return summary
+    
+    server.register("analyze", analyze_request, required=("directory",))
+    # One index per model, loaded on the first search and kept in memory
+    get_image_index = None if no_cache else functools.lru_cache(maxsize=None)(open_image_index)
+    server.register("search", lambda params, notify: run_search(
+        params["directory"],
+        params["query"],
+        lambda: inference,
+        progress=lambda message: notify("progress", {"message": message}),
+        get_image_index=get_image_index
+    ), required=("directory", "query"))
+    server.register("classify", lambda params, notify: run_classify(params["paths"], inference), required=("paths",))
+    
+    if port is None:
+        server.serve_stdio(requests, original_stdout)
+    else:
+        server.serve_tcp("127.0.0.1", port, ready_stream=original_stdout)
+
+
 if __name__ == "__main__":
+    # Required for process pools inside the PyInstaller-frozen sidecar
+    import multiprocessing
+    multiprocessing.freeze_support()
     app()
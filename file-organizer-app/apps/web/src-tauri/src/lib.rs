@@ -43,6 +43,10 @@ pub struct AnalyzeResult {
     pub classifications: Vec<FileClassification>,
     pub scan_time: f64,
     pub total_duplicates: usize,
+    #[serde(default)]
+    pub cache_hits: usize,
+    #[serde(default)]
+    pub cache_misses: usize,
 }
 
 #[derive(Debug, Serialize, Deserialize)]
@@ -155,22 +159,139 @@ async fn list_directory(directory: String) -> Result<ListResult, String> {
 
 use tauri_plugin_shell::ShellExt;
 
-#[tauri::command]
-async fn analyze_directory(app: tauri::AppHandle, directory: String) -> Result<AnalyzeResult, String> {
-    let output = app.shell().sidecar("file-organizer-engine")
+use std::collections::HashMap;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, Mutex};
+use tauri::async_runtime::{channel, Sender};
+use tauri::Manager;
+use tauri_plugin_shell::process::{CommandChild, CommandEvent};
+
+enum EngineMessage {
+    Notification(String, serde_json::Value),
+    Response(Result<serde_json::Value, String>),
+}
+
+type PendingRequests = Arc<Mutex<HashMap<u64, Sender<EngineMessage>>>>;
+
+struct EngineProcess {
+    child: CommandChild,
+    pending: PendingRequests,
+}
+
+/// Long-lived `engine serve` sidecar, so CLIP is loaded once instead of once per command.
+/// It is started by the first request and started again if it exits.
+#[derive(Default)]
+pub struct Engine {
+    process: Mutex<Option<EngineProcess>>,
+    next_id: AtomicU64,
+}
+
+fn spawn_engine(app: &tauri::AppHandle) -> Result<EngineProcess, String> {
+    let (mut rx, child) = app.shell().sidecar("file-organizer-engine")
         .map_err(|e| format!("Failed to create sidecar command: {}", e))?
-        .args(["analyze", &directory])
-        .output()
-        .await
-        .map_err(|e| format!("Failed to execute sidecar: {}", e))?;
-
-    if !output.status.success() {
-        let stderr = String::from_utf8_lossy(&output.stderr).to_string();
-        return Err(format!("Engine Error: {}", stderr));
+        .args(["serve"])
+        .spawn()
+        .map_err(|e| format!("Failed to spawn sidecar: {}", e))?;
+
+    let pending = PendingRequests::default();
+    let reader_pending = pending.clone();
+    let app = app.clone();
+    tauri::async_runtime::spawn(async move {
+        let mut line_buf = Vec::new();
+        while let Some(event) = rx.recv().await {
+            match event {
+                CommandEvent::Stdout(data) => {
+                    // One JSON-RPC message per line; chunks are not guaranteed to end on a newline
+                    line_buf.extend(data);
+                    while let Some(pos) = line_buf.iter().position(|b| *b == b'\n') {
+                        let line: Vec<u8> = line_buf.drain(..=pos).collect();
+                        dispatch_engine_line(&reader_pending, &line).await;
+                    }
+                }
+                CommandEvent::Terminated(_) => break,
+                _ => {}
+            }
+        }
+
+        {
+            let engine = app.state::<Engine>();
+            let mut process = engine.process.lock().unwrap();
+            if process.as_ref().map_or(false, |p| Arc::ptr_eq(&p.pending, &reader_pending)) {
+                *process = None;
+            }
+        }
+        let senders: Vec<_> = reader_pending.lock().unwrap().drain().map(|(_, tx)| tx).collect();
+        for tx in senders {
+            let _ = tx.send(EngineMessage::Response(Err("Engine exited before answering".to_string()))).await;
+        }
+    });
+
+    Ok(EngineProcess { child, pending })
+}
+
+async fn dispatch_engine_line(pending: &PendingRequests, line: &[u8]) {
+    let message: serde_json::Value = match serde_json::from_slice(line) {
+        Ok(value) => value,
+        Err(_) => return,
+    };
+
+    if let Some(id) = message.get("id").and_then(|id| id.as_u64()) {
+        let tx = pending.lock().unwrap().remove(&id);
+        if let Some(tx) = tx {
+            let result = match message.get("error") {
+                Some(error) => Err(format!(
+                    "Engine Error: {}",
+                    error.get("message").and_then(|m| m.as_str()).unwrap_or("unknown error")
+                )),
+                None => Ok(message.get("result").cloned().unwrap_or(serde_json::Value::Null)),
+            };
+            let _ = tx.send(EngineMessage::Response(result)).await;
+        }
+        return;
     }
 
-    let stdout = String::from_utf8_lossy(&output.stdout).to_string();
-    serde_json::from_str(&stdout).map_err(|e| format!("JSON Error: {}", e))
+    // Notifications carry the id of the request they belong to
+    let request_id = message.pointer("/params/request_id").and_then(|id| id.as_u64());
+    let method = message.get("method").and_then(|m| m.as_str()).unwrap_or_default().to_string();
+    if let Some(id) = request_id {
+        let tx = pending.lock().unwrap().get(&id).cloned();
+        if let Some(tx) = tx {
+            let _ = tx.send(EngineMessage::Notification(method, message["params"].clone())).await;
+        }
+    }
+}
+
+async fn engine_request(
+    app: &tauri::AppHandle,
+    method: &str,
+    params: serde_json::Value,
+    mut on_notification: impl FnMut(&str, serde_json::Value),
+) -> Result<serde_json::Value, String> {
+    let (tx, mut rx) = channel(64);
+    {
+        let engine = app.state::<Engine>();
+        let id = engine.next_id.fetch_add(1, Ordering::Relaxed) + 1;
+        let mut process = engine.process.lock().unwrap();
+        if process.is_none() {
+            *process = Some(spawn_engine(app)?);
+        }
+        let running = process.as_mut().unwrap();
+        running.pending.lock().unwrap().insert(id, tx);
+
+        let request = serde_json::json!({"jsonrpc": "2.0", "id": id, "method": method, "params": params});
+        if let Err(e) = running.child.write(format!("{}\n", request).as_bytes()) {
+            *process = None;
+            return Err(format!("Failed to send request to engine: {}", e));
+        }
+    }
+
+    while let Some(message) = rx.recv().await {
+        match message {
+            EngineMessage::Notification(name, params) => on_notification(&name, params),
+            EngineMessage::Response(result) => return result,
+        }
+    }
+    Err("Engine exited before answering".to_string())
 }
 
 #[tauri::command]
@@ -493,42 +614,65 @@ async fn open_file(path: String) -> Result<(), String> {
 
 #[tauri::command]
 async fn search_semantic(app: tauri::AppHandle, directory: String, query: String) -> Result<Vec<FileClassification>, String> {
-    use tauri_plugin_shell::process::CommandEvent;
     use tauri::Emitter;
 
-    let (mut rx, _child) = app.shell().sidecar("file-organizer-engine")
-        .map_err(|e| format!("Failed to create sidecar command: {}", e))?
-        .args(["search", &directory, &query])
-        .spawn()
-        .map_err(|e| format!("Failed to spawn sidecar: {}", e))?;
+    let params = serde_json::json!({"directory": directory, "query": query});
+    let result = engine_request(&app, "search", params, |name, params| {
+        if name == "progress" {
+            if let Some(message) = params.get("message").and_then(|m| m.as_str()) {
+                let _ = app.emit("search-progress", message.to_string());
+            }
+        }
+    }).await?;
 
-    let mut stdout_buf = Vec::new();
-    let mut stderr_buf = Vec::new();
+    serde_json::from_value(result).map_err(|e| format!("JSON Error: {}", e))
+}
+
+#[tauri::command]
+async fn analyze_directory_stream(app: tauri::AppHandle, directory: String) -> Result<AnalyzeResult, String> {
+    use tauri::Emitter;
 
-    while let Some(event) = rx.recv().await {
-        match event {
-            CommandEvent::Stdout(data) => {
-                stdout_buf.extend(data);
+    // Records are forwarded as events while the engine works and collected for the final result,
+    // so the caller does not depend on events arriving before the command returns
+    let mut classifications: Vec<FileClassification> = Vec::new();
+    let mut duplicates: HashMap<String, String> = HashMap::new();
+
+    let params = serde_json::json!({"directory": directory, "stream": true});
+    let mut summary = engine_request(&app, "analyze", params, |name, record| {
+        if name != "record" {
+            return;
+        }
+        let event = match record.get("type").and_then(|t| t.as_str()) {
+            Some("file") => {
+                if let Ok(item) = serde_json::from_value::<FileClassification>(record.clone()) {
+                    classifications.push(item);
+                }
+                "analyze-item"
             }
-            CommandEvent::Stderr(data) => {
-                let line = String::from_utf8_lossy(&data).to_string();
-                if line.contains("[UI_PROGRESS]") {
-                    let msg = line.replace("[UI_PROGRESS]", "").trim().to_string();
-                    let _ = app.emit("search-progress", msg);
+            Some("progress") => "analyze-progress",
+            Some("duplicate") => {
+                let field = |key: &str| record.get(key).and_then(|v| v.as_str()).map(|v| v.to_string());
+                if let (Some(filepath), Some(original)) = (field("filepath"), field("duplicate_of")) {
+                    duplicates.insert(filepath, original);
                 }
-                stderr_buf.extend(data);
+                "analyze-duplicate"
             }
-            _ => {}
+            _ => return,
+        };
+        let _ = app.emit(event, record);
+    }).await?;
+
+    for item in classifications.iter_mut() {
+        if let Some(original) = duplicates.remove(&item.filepath) {
+            item.is_duplicate = true;
+            item.duplicate_of = Some(original);
+            item.selected = false;
         }
     }
+    classifications.sort_by_key(|item| item.index);
 
-    let stdout_str = String::from_utf8_lossy(&stdout_buf).to_string();
-    if stdout_str.trim().is_empty() {
-        let stderr_str = String::from_utf8_lossy(&stderr_buf).to_string();
-        return Err(format!("Engine Error (Empty Output): {}", stderr_str));
-    }
-
-    serde_json::from_str(&stdout_str).map_err(|e| format!("JSON Error: {}\nRaw: {}", e, stdout_str))
+    summary["classifications"] = serde_json::to_value(&classifications).map_err(|e| format!("JSON Error: {}", e))?;
+    serde_json::from_value(summary).map_err(|e| format!("JSON Error: {}", e))
 }
 
 #[tauri::command]
@@ -741,6 +885,7 @@ pub fn run() {
     std::env::set_var("WEBKIT_DISABLE_COMPOSITING_MODE", "1");
 
     tauri::Builder::default()
+        .manage(Engine::default())
         .plugin(tauri_plugin_shell::init())
         .plugin(tauri_plugin_dialog::init())
         .plugin(tauri_plugin_fs::init())
@@ -751,7 +896,7 @@ pub fn run() {
             list_folders,
             get_home_directory,
             get_mounted_drives,
-            analyze_directory,
+            analyze_directory_stream,
             move_files,
             get_available_categories,
             rename_file,
@@ -1,10 +1,12 @@
 import { invoke } from "@tauri-apps/api/core";
+import { listen } from "@tauri-apps/api/event";
 import { open } from "@tauri-apps/plugin-dialog";
 import type {
   FileClassification,
   FileItem,
   ListResult,
   AnalyzeResult,
+  AnalyzeProgress,
   MoveResult,
   FolderNode,
   DriveInfo,
@@ -45,11 +47,21 @@ export async function listDirectory(directory: string): Promise<ListResult> {
   return await invoke<ListResult>("list_directory", { directory });
 }
 
-/** Analyze directory with AI classification (slower) */
-export async function analyzeDirectory(
+/** Analyze directory with AI classification, reporting progress while the engine scans and classifies */
+export async function analyzeDirectoryStream(
   directory: string,
+  onProgress?: (progress: AnalyzeProgress) => void,
 ): Promise<AnalyzeResult> {
-  return await invoke<AnalyzeResult>("analyze_directory", { directory });
+  const unlisten = await listen<AnalyzeProgress>("analyze-progress", (event) =>
+    onProgress?.(event.payload),
+  );
+  try {
+    return await invoke<AnalyzeResult>("analyze_directory_stream", {
+      directory,
+    });
+  } finally {
+    unlisten();
+  }
 }
 
 export async function moveFiles(
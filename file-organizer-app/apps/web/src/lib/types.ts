@@ -50,6 +50,14 @@ export interface AnalyzeResult {
   classifications: FileClassification[];
   scan_time: number;
   total_duplicates: number;
+  cache_hits: number;
+  cache_misses: number;
+}
+
+export interface AnalyzeProgress {
+  phase: "scan" | "classify";
+  done: number;
+  total: number | null;
 }
 
 export interface MoveResult {
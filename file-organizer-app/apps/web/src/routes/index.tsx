@@ -13,7 +13,7 @@ import { ScanningOverlay } from "@/components/analysis-progress";
 import {
   selectDirectory,
   listDirectory,
-  analyzeDirectory,
+  analyzeDirectoryStream,
   moveFiles,
   getAvailableCategories,
   searchSemantic,
@@ -207,7 +207,13 @@ function HomeComponent() {
     );
 
     try {
-      const result = await analyzeDirectory(currentPath);
+      // The scan has no known total; classification progress fills the bar once it has one
+      const result = await analyzeDirectoryStream(currentPath, (update) => {
+        if (update.phase === "classify" && update.total) {
+          const value = 10 + Math.round((85 * update.done) / update.total);
+          setProgress((p) => Math.max(p, value));
+        }
+      });
       setAnalyzeResult(result);
       setClassifications(result.classifications);
       setProgress(100);
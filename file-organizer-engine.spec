@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['rich._unicode_data.unicode17-0-0'],
+    hiddenimports=['rich._unicode_data.unicode17-0-0', 'torch', 'open_clip'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
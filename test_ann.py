@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+
+from core.ann import IVFIndex
+
+
+def normalized(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def index(tmp_path):
+    # Clustered vectors, as CLIP embeddings of photo collections are; small limits so 2000 vectors train
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32))
+    vectors = normalized(centers[rng.integers(0, 20, 2000)] + 0.3 * rng.standard_normal((2000, 32)))
+
+    index = IVFIndex(directory=tmp_path / "index", n_probe=8)
+    index.MIN_TRAIN_SIZE = 1000
+    index.EXACT_SEARCH_SIZE = 100
+    index.add((f"/photos/{i}.jpg", i, float(i), vector) for i, vector in enumerate(vectors))
+    assert index.is_trained
+    return index, vectors
+
+
+def exact(vectors, query, k, rows=None):
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(sorted(rows))
+    scores = vectors[rows] @ query
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(f"/photos/{rows[i]}.jpg", float(scores[i])) for i in order]
+
+
+def queries(vectors, n=20):
+    rng = np.random.default_rng(1)
+    return normalized(vectors[rng.integers(0, len(vectors), n)] + 0.1 * rng.standard_normal((n, vectors.shape[1])))
+
+
+def test_search_probing_every_list_is_exact(index):
+    index, vectors = index
+    for query in queries(vectors):
+        found = index.search(query, 10, n_probe=index.n_lists)
+        expected = exact(vectors, query, 10)
+        assert [path for path, _ in found] == [path for path, _ in expected]
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+
+
+def test_search_recall(index):
+    index, vectors = index
+    hits = 0
+    for query in queries(vectors):
+        found = {path for path, _ in index.search(query, 10)}
+        hits += len(found & {path for path, _ in exact(vectors, query, 10)})
+    assert hits / (10 * 20) >= 0.9
+
+
+def test_search_with_paths_filter(index):
+    index, vectors = index
+    allowed = set(range(0, 2000, 7))
+    for query in queries(vectors, 5):
+        found = index.search(query, 10, paths={f"/photos/{i}.jpg" for i in allowed}, n_probe=index.n_lists)
+        assert [path for path, _ in found] == [path for path, _ in exact(vectors, query, 10, allowed)]
+
+
+def test_saved_changes_survive_reload(index):
+    index, vectors = index
+    index.save()
+    index.add([("/photos/new.jpg", 1, 1.0, vectors[0])])
+    index.remove(["/photos/1.jpg", "/photos/2.jpg"])
+    index.save()
+
+    loaded = IVFIndex.load(index.directory)
+    assert len(loaded) == len(index) == 1999
+    assert "/photos/new.jpg" in loaded and "/photos/1.jpg" not in loaded
+    query = queries(vectors, 1)[0]
+    assert loaded.search(query, 10, n_probe=loaded.n_lists) == index.search(query, 10, n_probe=index.n_lists)
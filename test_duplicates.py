@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.duplicates import PARTIAL_BLOCK_SIZE, CopyTracker, SizedFile, find_duplicates
+
+
+def brute_force(files):
+    # duplicate -> first file with the same content, by a full hash of every file
+    groups = defaultdict(list)
+    for file in files:
+        with open(file.filepath, "rb") as f:
+            groups[hashlib.sha256(f.read()).hexdigest()].append(file.filepath)
+    return {path: group[0] for group in groups.values() for path in group[1:]}
+
+
+@pytest.fixture
+def files(tmp_path):
+    rng = random.Random(0)
+    block = PARTIAL_BLOCK_SIZE
+    head = rng.randbytes(block)
+    tail = rng.randbytes(block)
+    contents = {
+        "empty": b"",
+        "tiny": b"x",
+        "small": rng.randbytes(1000),
+        "exactly_two_blocks": rng.randbytes(2 * block),
+        # Same size, same ends: only a full hash tells them apart
+        "large_a": head + b"a" * block + tail,
+        "large_b": head + b"b" * block + tail,
+        "unique_size": rng.randbytes(3 * block + 7),
+    }
+    # Same size as "small" but different bytes
+    contents["small_other"] = rng.randbytes(1000)
+
+    result = []
+    for name, content in contents.items():
+        for copy in range(3 if name != "unique_size" else 1):
+            path = tmp_path / f"{name}_{copy}.bin"
+            path.write_bytes(content)
+            result.append(SizedFile(str(path), len(content)))
+    # One more copy of large_a with a different name
+    extra = tmp_path / "zz_large_a.bin"
+    extra.write_bytes(contents["large_a"])
+    result.append(SizedFile(str(extra), len(contents["large_a"])))
+
+    rng.shuffle(result)
+    return result
+
+
+def test_staged_duplicates_match_full_hash(files):
+    report = find_duplicates(files)
+    assert report.duplicate_of == brute_force(files)
+    assert report.files == len(files)
+
+
+def test_staged_digests_are_full_content_digests(files):
+    report = find_duplicates(files)
+    for filepath, digest in report.digests.items():
+        with open(filepath, "rb") as f:
+            assert digest == hashlib.new(report.algorithm, f.read()).hexdigest()
+
+
+def test_copy_tracker_matches_full_hash(files):
+    expected = brute_force(files)
+    tracker = CopyTracker()
+    assert {f.filepath: tracker.original_of(f) for f in files} == {f.filepath: expected.get(f.filepath) for f in files}
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from PIL import Image
+
+from core.image_loader import open_image
+from core.inference import ClipInference
+
+
+@pytest.fixture(scope="module")
+def large_png(tmp_path_factory):
+    # 65.6 MP: over Pillow's warning threshold and the old 64 MP cap, but a valid image
+    path = tmp_path_factory.mktemp("large") / "panorama.png"
+    Image.new("RGB", (8200, 8000), (40, 120, 200)).save(path, compress_level=1)
+    return path
+
+
+def test_large_png_is_downscaled(large_png):
+    image = open_image(large_png)
+    assert image.mode == "RGB"
+    assert min(image.size) < 2 * 224
+
+
+def test_large_png_classifies(large_png):
+    # Random weights: only the decode path matters here, and no download is needed
+    inference = ClipInference(pretrained="", device="cpu", num_workers=1)
+    results = inference.classify_batch([large_png], ["sky", "food"], ["a photo of the sky", "a photo of food"])
+    assert results[0].suggested_category in {"sky", "food"}
+
+
+def test_decompression_bomb_is_refused(tmp_path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (100, 100)).save(path)
+    with pytest.raises(Image.DecompressionBombError):
+        open_image(path, max_pixels=5000)
+
+
+def test_pillow_bomb_check_stays_enabled(large_png):
+    open_image(large_png)
+    assert Image.MAX_IMAGE_PIXELS is not None
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.scan_index import ScanIndex
+from core.scanner import FileInfo, FileScanner
+
+
+@pytest.mark.parametrize("value", ["9f86d081884c7d65", "sha256:9f86d081", "9F86D081", "abc", ""])
+def test_content_hash_reads_back_unchanged(value):
+    file_info = FileInfo("/tmp/a.png")
+    file_info.content_hash = value
+    assert file_info.content_hash == value
+    assert FileInfo("/tmp/a.png", metadata={"hash": value}).content_hash == value
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "tree"
+    for relative in ["a.txt", "sub/b.txt", "sub/deep/c.txt", ".hidden/h.txt", "node_modules/n.txt", ".dotfile"]:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative)
+    return root
+
+
+def scan(root, index, **options):
+    scanner = FileScanner(recursive=True, index=index, use_ocr=False, metadata_workers=0, **options)
+    return scanner.scan(root).delta
+
+
+def relative(root, paths):
+    return sorted(os.path.relpath(path, root) for path in paths)
+
+
+def test_index_delta_added_modified_deleted(tree, tmp_path):
+    index = ScanIndex(tmp_path / "index.sqlite3")
+
+    delta = scan(tree, index)
+    assert relative(tree, delta.added) == ["a.txt", os.path.join("sub", "b.txt"), os.path.join("sub", "deep", "c.txt")]
+    assert delta.modified == [] and delta.deleted == []
+
+    delta = scan(tree, index)
+    assert (delta.added, delta.modified, delta.deleted, delta.unchanged_count) == ([], [], [], 3)
+
+    (tree / "a.txt").write_text("changed and longer")
+    (tree / "sub" / "new.txt").write_text("new")
+    # The only file of its directory: the walk never visits it again
+    (tree / "sub" / "deep" / "c.txt").unlink()
+    delta = scan(tree, index)
+    assert relative(tree, delta.added) == [os.path.join("sub", "new.txt")]
+    assert relative(tree, delta.modified) == ["a.txt"]
+    assert relative(tree, delta.deleted) == [os.path.join("sub", "deep", "c.txt")]
+    assert delta.unchanged_count == 1
+
+    delta = scan(tree, index)
+    assert (delta.added, delta.modified, delta.deleted, delta.unchanged_count) == ([], [], [], 3)
+    index.close()
+
+
+def test_index_keeps_rows_the_walk_skips(tree, tmp_path):
+    index = ScanIndex(tmp_path / "index.sqlite3")
+    delta = scan(tree, index, include_hidden=True)
+    assert os.path.join(".hidden", "h.txt") in relative(tree, delta.added)
+    assert os.path.join("node_modules", "n.txt") not in relative(tree, delta.added)
+
+    # Hidden files are outside this walk, not gone
+    delta = scan(tree, index)
+    assert delta.deleted == []
+
+    # Nor are subdirectories to a non-recursive walk
+    scanner = FileScanner(recursive=False, include_hidden=True, index=index, use_ocr=False, metadata_workers=0)
+    delta = scanner.scan(tree).delta
+    assert delta.deleted == []
+
+    (tree / ".hidden" / "h.txt").unlink()
+    (tree / ".dotfile").unlink()
+    delta = scan(tree, index, include_hidden=True)
+    assert relative(tree, delta.deleted) == [".dotfile", os.path.join(".hidden", "h.txt")]
+    index.close()
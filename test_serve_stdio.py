@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import json
+import os
+import select
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Runs the document metadata pool on a worker thread while the main thread is blocked reading
+# requests, the way serve_stdio does
+POOL_SCRIPT = """
+import sys, threading
+from core.doc_metadata import DocumentMetadataPool
+from core.server import detach_stdin
+
+requests = detach_stdin()
+
+def run():
+    pool = DocumentMetadataPool(1, timeout=10, use_ocr=False)
+    pool.submit(sys.argv[1])
+    result = pool.collect([sys.argv[1]])[sys.argv[1]]
+    pool.close()
+    print(result if isinstance(result, str) else "ok", flush=True)
+
+threading.Thread(target=run, daemon=True).start()
+for line in requests:
+    pass
+"""
+
+
+@pytest.fixture
+def pdf_dir(tmp_path):
+    Image.new("RGB", (64, 64), (255, 255, 255)).save(tmp_path / "scan.pdf")
+    return tmp_path
+
+
+def start(args, tmp_path):
+    env = {**os.environ, "PYTHONPATH": ROOT, "FILE_ORGANIZER_CACHE_DIR": str(tmp_path / "cache")}
+    (tmp_path / "cache").mkdir(exist_ok=True)
+    return subprocess.Popen(
+        [sys.executable, *args], cwd=ROOT, env=env, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+
+
+def read_line(process, timeout):
+    ready, _, _ = select.select([process.stdout], [], [], timeout)
+    assert ready, f"no output within {timeout}s"
+    return process.stdout.readline()
+
+
+def test_metadata_pool_with_main_thread_blocked_on_stdin(pdf_dir):
+    process = start(["-c", POOL_SCRIPT, str(pdf_dir / "scan.pdf")], pdf_dir)
+    try:
+        # Well under the pool timeout: a worker stuck at startup would only be reported after 10s
+        assert read_line(process, 8).strip() == "ok"
+    finally:
+        process.stdin.close()
+        process.wait(timeout=10)
+
+
+def test_serve_stdio_extracts_documents(pdf_dir):
+    process = start(["engine.py", "serve", "--idle-timeout", "0"], pdf_dir)
+    try:
+        assert json.loads(read_line(process, 60))["method"] == "ready"
+
+        request = {"jsonrpc": "2.0", "id": 1, "method": "analyze", "params": {"directory": str(pdf_dir)}}
+        process.stdin.write(json.dumps(request) + "\n")
+        process.stdin.flush()
+
+        response = json.loads(read_line(process, 20))
+        assert response["id"] == 1
+        assert response["result"]["documents"] == 1
+        assert response["result"]["scan_time"] < 10
+    finally:
+        process.stdin.close()
+        process.wait(timeout=30)
+
+
+def test_handler_errors_are_not_reported_as_invalid_params():
+    from core.server import INVALID_PARAMS, SERVER_ERROR, EngineServer
+
+    def broken(params, notify):
+        return {}["internal"]
+
+    server = EngineServer(inference=None)
+    server.register("broken", broken, required=("directory",))
+    responses = []
+    server.handle_request({"jsonrpc": "2.0", "id": 1, "method": "broken", "params": {}}, responses.append)
+    server.handle_request({"jsonrpc": "2.0", "id": 2, "method": "broken", "params": {"directory": "/"}}, responses.append)
+
+    assert responses[0]["error"]["code"] == INVALID_PARAMS
+    assert "directory" in responses[0]["error"]["message"]
+    assert responses[1]["error"]["code"] == SERVER_ERROR
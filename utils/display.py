@@ -45,7 +45,7 @@ class DisplayManager:
             self.console.print("[yellow]💻 Running on CPU (CUDA not available)[/yellow]")
         self.console.print()
     
-    def print_scan_summary(self, total_files: int, images: int, documents: int, other: int, errors: int, scan_time: float) -> None:
+    def print_scan_summary(self, total_files: int, images: int, documents: int, other: int, errors: int, scan_time: float, ocr_time: float = 0.0) -> None:
         table = Table(title="📂 Scan Summary", box=box.ROUNDED, header_style="bold magenta")
         table.add_column("Metric", style="cyan")
         table.add_column("Count", justify="right", style="green")
@@ -56,10 +56,18 @@ class DisplayManager:
         if errors > 0:
             table.add_row("❌ Errors", f"[red]{errors}[/red]")
         table.add_row("⏱️  Scan Time", f"{scan_time:.2f}s")
+        if ocr_time > 0:
+            table.add_row("🔤 OCR Time", f"{ocr_time:.2f}s")
         self.console.print()
         self.console.print(table)
         self.console.print()
     
+    def print_cache_summary(self, hits: int, misses: int) -> None:
+        total = hits + misses
+        if total == 0:
+            return
+        self.console.print(f"[blue]ℹ[/blue] Embedding cache: [green]{hits} hits[/green], [yellow]{misses} misses[/yellow] ({hits / total:.0%} reused)")
+    
     def print_classification_results(self, results: list[tuple[str, str, float]], show_index: bool = True) -> None:
         table = Table(title="🔍 Classification Results", box=box.ROUNDED, header_style="bold blue")
         if show_index: